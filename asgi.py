@@ -0,0 +1,303 @@
+"""Asyncio-native serving mode.
+
+`/predict` is served by an async handler that awaits the async Gemini client
+and the Translation API (one batched request via httpx), then journals the
+detection to the write-behind queue (or awaits the async MongoDB driver with
+WRITE_BEHIND=0), so a single process can hold hundreds of analyses in flight
+instead of parking one OS thread per request. Every other route is the existing Flask app,
+mounted unchanged behind a WSGI adapter.
+
+Run with:
+
+    pip install starlette python-multipart httpx asgiref uvicorn
+    uvicorn asgi:app --workers 1
+
+`python app.py` keeps using the threaded development server.
+"""
+import asyncio
+import time
+from datetime import datetime
+from io import BytesIO
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+import app as flask_app
+import idempotency
+import image_quality
+import knowledge_base
+import structured_output
+import metrics
+import negotiation
+import outbreak
+import profiling
+from metrics import stage
+import upload_sizing
+import write_behind
+from scheduler import scheduler, classify, QueueFull
+from disease_registry import condition_id
+from disease_schema import add_disease_async
+
+TRANSLATE_TIMEOUT = 10
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=TRANSLATE_TIMEOUT)
+    return _http_client
+
+
+async def translate_texts_async(texts, target_language):
+    """Translate several strings in one Translation v2 request.
+
+    Falls back to the original texts on any error, like `translate_text`.
+    """
+    if not texts:
+        return texts
+    try:
+        with stage("translate.call"):
+            resp = await get_http_client().post(
+                flask_app.GOOGLE_TRANSLATE_API_URL,
+                params={"key": flask_app.GOOGLE_TRANSLATE_API_KEY},
+                json={"q": texts, "target": target_language, "format": "text"}
+            )
+        resp.raise_for_status()
+        translations = [t.get("translatedText") for t in resp.json().get("data", {}).get("translations", [])]
+        translations += [None] * (len(texts) - len(translations))
+        return [translated or text for text, translated in zip(texts, translations)]
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"[warn] Async translation failed: {e}")
+        return texts
+
+
+async def translate_analysis_result_async(analysis_result, target_language='en'):
+    if target_language == 'en' or not flask_app.TRANSLATION_ENABLED:
+        return analysis_result
+    try:
+        with stage("translate.result"):
+            targets = flask_app._collect_translatable(analysis_result)
+            translations = await translate_texts_async([text for _, text in targets], target_language)
+            return flask_app._apply_translations(analysis_result, targets, translations)
+    except Exception as e:
+        print(f"[error] Failed to translate analysis result: {e}")
+        return analysis_result
+
+
+async def generate_content_async(contents, generation_config):
+    """Gemini call that does not block the event loop.
+
+    The REST transport used with GEMINI_API_ENDPOINT (e.g. the local fakes in
+    bench/fake_services.py) has no async client, so the blocking call runs in
+    a worker thread instead.
+    """
+    if flask_app.GEMINI_API_ENDPOINT:
+        def call():
+            response = flask_app.model.generate_content(contents, generation_config=generation_config)
+            response.resolve()
+            return response
+        return await asyncio.to_thread(call)
+    return await flask_app.model.generate_content_async(contents, generation_config=generation_config)
+
+
+async def analyze_with_gemini_async(image_bytes, category='skin', age=None, extra_info=None):
+    """Analyze one photo (bytes), or a list of photos of one case in a single call."""
+    if not flask_app.GEMINI_ENABLED:
+        return {"error": "Gemini AI not enabled"}
+
+    views = image_bytes if isinstance(image_bytes, (list, tuple)) else [image_bytes]
+    try:
+        # Decoding/re-encoding is CPU work; keep it off the event loop
+        with stage("image.prepare"):
+            image, images = await asyncio.to_thread(
+                flask_app.prepare_views, [BytesIO(data) for data in views]
+            )
+        prompt = flask_app.build_analysis_prompt(category, age, extra_info, views=len(images))
+
+        started = time.perf_counter()
+        with stage("gemini.generate"):
+            response = await generate_content_async(
+                [prompt] + [{"mime_type": "image/jpeg", "data": data} for data in images],
+                generation_config=flask_app.genai.types.GenerationConfig(
+                    **flask_app.GEMINI_GENERATION_CONFIG, **structured_output.generation_config(category)
+                )
+            )
+        generate_seconds = time.perf_counter() - started
+        with stage("gemini.parse"):
+            result = knowledge_base.enrich(flask_app.parse_gemini_response(response, image, category), category)
+        knowledge_base.record_generation(response, category, result, generate_seconds)
+        return flask_app.add_view_count(result, len(images))
+    except Exception as e:
+        print(f"[error] Gemini API failed: {e}")
+        return flask_app.analysis_error_result(e)
+
+
+async def predict(request):
+    """Async equivalent of the Flask `/predict` route (same form fields and responses).
+
+    Applies what the Flask app does through hooks and decorators: profiling,
+    Idempotency-Key handling, metrics and response negotiation.
+    """
+    start = time.perf_counter()
+    # Flask's before_request hooks do not run for this route
+    outbreak.start_warmup()
+    token = metrics.begin_request()
+    capture = profiling.start_capture(request.headers)
+    response = None
+    try:
+        response = await _idempotent_predict(request)
+    except HTTPException as e:
+        # Starlette rejects a malformed multipart body while reading the form
+        response = JSONResponse({'error': e.detail}, status_code=e.status_code)
+    except Exception as e:
+        print(f"[error] Exception while processing async predict: {e}")
+        response = JSONResponse({'error': str(e)}, status_code=500)
+    finally:
+        profiling.finish_capture(capture, 'predict')
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, 'predict', 'POST', str(response.status_code))
+    timing = metrics.end_request(token)
+    if timing:
+        response.headers['Server-Timing'] = timing
+    return negotiation.negotiate_asgi(response, request.headers)
+
+
+def _replayed(stored, outcome):
+    status, body, mimetype = stored
+    idempotency.IDEMPOTENCY_REQUESTS.inc('predict', outcome)
+    return Response(body, status_code=status, media_type=mimetype, headers={'Idempotent-Replayed': 'true'})
+
+
+async def _idempotent_predict(request):
+    """Same lead/wait/replay logic as idempotency.idempotent, sharing its store."""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return await _predict(request)
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        return JSONResponse({'error': f'Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters'},
+                            status_code=400)
+
+    # Starlette caches the parsed form, so _predict reads the same one
+    form = await request.form()
+    fields, files = [], []
+    for name, value in form.multi_items():
+        if hasattr(value, 'filename'):
+            files.append((name, value.filename, [await value.read()]))
+            await value.seek(0)
+        else:
+            fields.append((name, value))
+    fingerprint = idempotency.form_fingerprint(request.method, request.url.path, fields, files)
+    outcome, value = idempotency.store.begin(('predict', key), fingerprint)
+
+    if outcome == 'mismatch':
+        idempotency.IDEMPOTENCY_REQUESTS.inc('predict', 'mismatch')
+        return JSONResponse({'error': 'Idempotency-Key was already used with a different request'}, status_code=422)
+    if outcome == 'replay':
+        return _replayed(value, 'replayed')
+    if outcome == 'wait':
+        done = await asyncio.to_thread(value.done.wait, idempotency.IDEMPOTENCY_WAIT)
+        if not done or value.response is None:
+            idempotency.IDEMPOTENCY_REQUESTS.inc('predict', 'in_progress')
+            return JSONResponse({'error': 'A request with this Idempotency-Key is still in progress'},
+                                status_code=409, headers={'Retry-After': '5'})
+        return _replayed(value.response, 'coalesced')
+
+    flight, stored = value, None
+    try:
+        response = await _predict(request)
+        stored = (response.status_code, response.body, response.media_type)
+        idempotency.IDEMPOTENCY_REQUESTS.inc('predict', 'executed')
+        return response
+    finally:
+        idempotency.store.finish(('predict', key), flight, stored)
+
+
+async def _predict(request):
+    try:
+        form = await request.form()
+        files = [f for f in form.getlist('file') if hasattr(f, 'filename')]
+        if not files:
+            return JSONResponse({'error': 'No file provided'}, status_code=400)
+        if len(files) > flask_app.MAX_VIEWS:
+            return JSONResponse({'error': f'At most {flask_app.MAX_VIEWS} photos per analysis'}, status_code=400)
+
+        for file in files:
+            if not flask_app.is_valid_image(file):
+                return JSONResponse({'error': 'Invalid file type. Please upload an image (PNG, JPG, JPEG, GIF, WEBP)'}, status_code=400)
+
+        views = [await file.read() for file in files]
+        upload_sizing.record_upload('predict', sum(len(data) for data in views), form.get('original_bytes'))
+
+        category = form.get('category', 'skin')
+        language = form.get('language', 'en')
+        patient_name = form.get('patient_name')
+
+        quality = None
+        if image_quality.quality_enabled():
+            allow_reject = form.get('quality_override') != '1'
+            reports = await asyncio.to_thread(
+                lambda: [image_quality.assess_image(BytesIO(data), category, allow_reject) for data in views]
+            )
+            quality = image_quality.combine_reports(reports)
+            views = [data for data, report in zip(views, reports) if report['action'] != 'reject']
+            if not views:
+                guidance = ' '.join(i['guidance'] for i in quality['issues'] if i['severity'] == 'reject')
+                return JSONResponse({'error': guidance, 'retake': True, 'quality': quality}, status_code=422)
+
+        priority = classify(form.get('urgency'), form.get('extra_info'))
+        worker = form.get('asha_worker_id') or (request.client.host if request.client else None)
+        try:
+            async with scheduler.slot_async(priority, worker, cost=len(views)):
+                analysis_result = await analyze_with_gemini_async(
+                    views if len(views) > 1 else views[0],
+                    category=category, age=form.get('age'), extra_info=form.get('extra_info')
+                )
+        except QueueFull as e:
+            return JSONResponse(
+                {'error': 'The analysis service is busy, please try again shortly', 'retry_after': e.retry_after},
+                status_code=429, headers={'Retry-After': str(e.retry_after)}
+            )
+        if "error" in analysis_result:
+            return JSONResponse({'error': analysis_result["error"]}, status_code=500)
+
+        translated_result = await translate_analysis_result_async(analysis_result, language)
+        if quality and quality['action'] == 'warn':
+            translated_result['quality'] = quality
+
+        if patient_name:
+            asha_worker_info = None
+            if form.get('asha_worker_name') and form.get('asha_worker_id') and form.get('asha_worker_mobile'):
+                asha_worker_info = {
+                    "name": form.get('asha_worker_name'),
+                    "ashaId": form.get('asha_worker_id'),
+                    "mobile": form.get('asha_worker_mobile')
+                }
+            disease_name = analysis_result.get('disease', 'Unknown condition')
+            if write_behind.WRITE_BEHIND_ENABLED:
+                # A local journal append; MongoDB is written by the write-behind flusher
+                await asyncio.to_thread(
+                    write_behind.record_detection, patient_name, disease_name, asha_worker_info, category
+                )
+            else:
+                with stage("db.add_disease"):
+                    stored = await add_disease_async(patient_name, disease_name, asha_worker_info, category)
+                if stored.get("success"):
+                    # Same feed as write_behind.record_detection with WRITE_BEHIND=0
+                    await asyncio.to_thread(outbreak.observe_detections, [
+                        (patient_name, condition_id(disease_name, category), datetime.now())
+                    ])
+        return JSONResponse(flask_app.json_safe(translated_result))
+    except Exception as e:
+        print(f"[error] Exception while processing async predict: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+app = Starlette(routes=[
+    Route('/predict', predict, methods=['POST']),
+    # Everything else keeps running on the synchronous Flask app
+    Mount('/', app=WsgiToAsgi(flask_app.app)),
+])
@@ -1,14 +1,40 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from datetime import datetime
+from io import BytesIO
+import base64
+import binascii
+import hashlib
+import os
 import re
+from cache import TTLCache
+from metrics import timed
 
 # Connect to local MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+db = client[os.environ.get("MONGO_DB", "hospital_db")]
 
 # ASHA workers collection
 asha_workers = db["asha_workers"]
 
+# Profile photos live on disk, outside the worker document; the document only
+# keeps `photo_url`. Legacy documents may still carry a base64 `photo` field,
+# so reads project it out by default.
+PHOTO_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "uploads", "workers")
+PHOTO_URL_PREFIX = "/static/uploads/workers/"
+PHOTO_MAX_SIZE = 256
+PHOTO_QUALITY = 80
+WORKER_PROJECTION = {"photo": 0}
+
+# Read-through cache of worker profiles keyed by normalized mobile. Entries are
+# invalidated by add_asha_worker/update_asha_worker; the TTL bounds staleness
+# from writes made by other processes. The password is never cached:
+# verify_asha_worker always checks it against MongoDB, so a changed password
+# takes effect in every process at once.
+CACHED_PROJECTION = {"photo": 0, "password": 0}
+WORKER_CACHE_TTL = int(os.environ.get("WORKER_CACHE_TTL", "300"))
+WORKER_CACHE_SIZE = int(os.environ.get("WORKER_CACHE_SIZE", "1024"))
+worker_cache = TTLCache(maxsize=WORKER_CACHE_SIZE, ttl=WORKER_CACHE_TTL)
+
 
 def normalize_phone(phone: str) -> str:
     """Normalize phone by removing non-digit characters.
@@ -21,6 +47,64 @@ def normalize_phone(phone: str) -> str:
     return digits
 
 
+class InvalidPhoto(ValueError):
+    """A worker photo that is not valid base64 or not a readable image."""
+
+
+def encode_worker_photo(photo):
+    """Validate a worker photo and return it resized as JPEG bytes.
+
+    `photo` may be raw bytes, a file-like object or a `data:image/...;base64,`
+    URL (what the front end's `readAsDataURL` produces). Raises InvalidPhoto
+    before anything is written.
+    """
+    from PIL import Image
+
+    if isinstance(photo, str):
+        if photo.startswith("data:"):
+            photo = photo.split(",", 1)[1] if "," in photo else ""
+        try:
+            photo = base64.b64decode(photo, validate=True)
+        except (binascii.Error, ValueError):
+            raise InvalidPhoto("Photo is not valid base64")
+    elif hasattr(photo, "read"):
+        photo = photo.read()
+    if not photo:
+        raise InvalidPhoto("Photo is empty")
+
+    try:
+        image = Image.open(BytesIO(photo))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((PHOTO_MAX_SIZE, PHOTO_MAX_SIZE))
+        out = BytesIO()
+        image.save(out, format="JPEG", quality=PHOTO_QUALITY, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise InvalidPhoto("Photo is not a readable image")
+    return out.getvalue()
+
+
+def save_worker_photo(mobile, data):
+    """Write encoded photo bytes outside the worker document; returns the public URL."""
+    # Content-addressed name so the URL changes whenever the photo does
+    filename = f"{normalize_phone(mobile)}_{hashlib.sha256(data).hexdigest()[:12]}.jpg"
+    os.makedirs(PHOTO_FOLDER, exist_ok=True)
+    with open(os.path.join(PHOTO_FOLDER, filename), "wb") as f:
+        f.write(data)
+    return PHOTO_URL_PREFIX + filename
+
+
+def remove_worker_photo(url):
+    """Delete a stored photo by its public URL (other URLs are left alone)."""
+    if not url or not url.startswith(PHOTO_URL_PREFIX):
+        return
+    try:
+        os.remove(os.path.join(PHOTO_FOLDER, os.path.basename(url)))
+    except FileNotFoundError:
+        pass
+
+
+@timed("db.add_asha_worker")
 def add_asha_worker(name, asha_id, mobile, education, years, village, password):
     """Add a new ASHA worker.
 
@@ -59,12 +143,13 @@ def add_asha_worker(name, asha_id, mobile, education, years, village, password):
         "years": int(years) if years else 0,
         "village": village,
         "password": password,  # In production, this should be hashed
-        "photo": "",
+        "photo_url": "",
         "created": datetime.utcnow()
     }
     
     result = asha_workers.insert_one(worker)
     worker["_id"] = result.inserted_id
+    worker_cache.invalidate(mobile)
 
     return {
         "success": True,
@@ -73,52 +158,101 @@ def add_asha_worker(name, asha_id, mobile, education, years, village, password):
     }
 
 
-def find_asha_worker(mobile):
-    """Find an ASHA worker by mobile number."""
+@timed("db.find_asha_worker")
+def find_asha_worker(mobile, include_photo=False):
+    """Find an ASHA worker by mobile number.
+
+    The legacy inline `photo` field is projected out unless `include_photo` is set.
+    Projected lookups are served from `worker_cache` and carry no password; a
+    shallow copy is returned so callers can pop fields without touching the
+    cached entry.
+    """
     mobile = normalize_phone(mobile)
-    worker = asha_workers.find_one({"mobile": mobile})
-    return worker
+    if include_photo:
+        return asha_workers.find_one({"mobile": mobile})
+
+    worker = worker_cache.get_or_load(
+        mobile, lambda: asha_workers.find_one({"mobile": mobile}, CACHED_PROJECTION)
+    )
+    return worker.copy() if worker else None
 
 
+@timed("db.update_asha_worker")
 def update_asha_worker(mobile, updates):
     """Update an ASHA worker's information.
     
-    Updates can include: name, asha_id, education, years, village, photo, password
+    Updates can include: name, asha_id, education, years, village, photo, password.
+    A `photo` value (data URL or bytes) is validated first (InvalidPhoto is
+    raised for a bad one), then stored via `save_worker_photo` once the worker
+    is known to exist, and only its URL is written to the document. The
+    previous photo file is deleted after the update.
     """
     mobile = normalize_phone(mobile)
     
     # Normalize phone in updates if present
     if 'mobile' in updates:
         updates['mobile'] = normalize_phone(updates['mobile'])
+
+    operations = {}
+    new_photo = old_photo = None
+    if 'photo' in updates:
+        photo = updates.pop('photo')
+        if isinstance(photo, str) and (not photo or photo.startswith(PHOTO_URL_PREFIX)):
+            # No photo, or one already stored: keep the URL as it is
+            updates['photo_url'] = photo
+        else:
+            data = encode_worker_photo(photo)
+            current = asha_workers.find_one({"mobile": mobile}, {"photo_url": 1})
+            if not current:
+                return {
+                    "success": False,
+                    "message": "Worker not found",
+                    "worker": None
+                }
+            old_photo = current.get("photo_url")
+            updates['photo_url'] = new_photo = save_worker_photo(mobile, data)
+        operations["$unset"] = {"photo": ""}
     
     # Add updated timestamp
     updates['updated'] = datetime.utcnow()
+    operations["$set"] = updates
     
-    result = asha_workers.update_one(
+    # Single round trip: apply the update and get the new document back
+    updated_worker = asha_workers.find_one_and_update(
         {"mobile": mobile},
-        {"$set": updates}
+        operations,
+        projection=WORKER_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
+    worker_cache.invalidate(mobile, updates.get('mobile', mobile))
     
-    if result.modified_count > 0:
-        # Return updated worker
-        updated_worker = asha_workers.find_one({"mobile": mobile})
+    if updated_worker:
+        cached = updated_worker.copy()
+        cached.pop("password", None)
+        worker_cache.set(updated_worker["mobile"], cached)
+        if new_photo and old_photo != new_photo:
+            remove_worker_photo(old_photo)
         return {
             "success": True,
             "message": "Profile updated successfully",
             "worker": updated_worker
         }
     else:
+        # The worker went away after the photo was written
+        if new_photo and old_photo != new_photo:
+            remove_worker_photo(new_photo)
         return {
             "success": False,
-            "message": "Worker not found or no changes made",
+            "message": "Worker not found",
             "worker": None
         }
 
 
+@timed("db.verify_asha_worker")
 def verify_asha_worker(mobile, password):
-    """Verify ASHA worker credentials."""
+    """Verify ASHA worker credentials (always against MongoDB, never the cache)."""
     mobile = normalize_phone(mobile)
-    worker = asha_workers.find_one({"mobile": mobile})
+    worker = asha_workers.find_one({"mobile": mobile}, WORKER_PROJECTION)
     
     if not worker:
         return {
@@ -132,6 +266,7 @@ def verify_asha_worker(mobile, password):
         # Remove password from returned worker
         worker_copy = worker.copy()
         worker_copy.pop("password", None)
+        worker_cache.set(mobile, worker_copy.copy())
         return {
             "success": True,
             "message": "Login successful",
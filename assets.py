@@ -0,0 +1,216 @@
+"""Static asset build and serving helpers.
+
+The build step copies every CSS/JS file in ``static/`` to ``static/dist/``
+under a content-fingerprinted name (``home.3f9c2a1b7d.css``), writes gzip
+and (when the ``brotli`` package is installed) brotli siblings next to it,
+and records the mapping in ``static/dist/manifest.json``.
+
+Run it before deploying:
+
+    python assets.py
+
+At runtime ``asset_url()`` resolves a logical name through the manifest and
+``send_asset()`` serves the best precompressed variant with immutable cache
+headers. Page shells rendered from templates are cached in memory with an
+ETag so repeat visits are answered with 304.
+"""
+import os
+import json
+import gzip
+import hashlib
+from flask import request, url_for, current_app, render_template, abort, send_from_directory
+
+try:
+    import brotli
+    BROTLI_ENABLED = True
+except ImportError:
+    brotli = None
+    BROTLI_ENABLED = False
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Only text assets are worth fingerprinting/precompressing; uploads are skipped.
+ASSET_EXTENSIONS = {'.css', '.js'}
+SKIP_DIRS = {'dist', 'uploads'}
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+MIMETYPES = {
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+}
+
+_manifest = None
+_shell_cache = {}
+
+
+# ----------------- Build -----------------
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Fingerprint and precompress all CSS/JS assets under ``static_dir``.
+
+    Returns:
+        dict: manifest mapping logical names (``home.css``) to fingerprinted
+        names (``home.3f9c2a1b7d.css``).
+    """
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in sorted(files):
+            stem, ext = os.path.splitext(filename)
+            if ext not in ASSET_EXTENSIONS:
+                continue
+
+            src = os.path.join(root, filename)
+            logical = os.path.relpath(src, static_dir).replace(os.sep, '/')
+            with open(src, 'rb') as f:
+                data = f.read()
+
+            hashed = f"{stem}.{_fingerprint(data)}{ext}"
+            rel_dir = os.path.dirname(logical)
+            out_dir = os.path.join(dist_dir, rel_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            out_path = os.path.join(out_dir, hashed)
+
+            with open(out_path, 'wb') as f:
+                f.write(data)
+            # mtime=0 keeps the .gz output byte-identical between builds
+            with open(out_path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if BROTLI_ENABLED:
+                with open(out_path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+
+            manifest[logical] = f"{rel_dir}/{hashed}" if rel_dir else hashed
+            print(f"[info] {logical} -> {manifest[logical]} ({len(data)} bytes)")
+
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if not BROTLI_ENABLED:
+        print("[warn] brotli not installed; only gzip variants were written")
+    return manifest
+
+
+# ----------------- Runtime -----------------
+
+def load_manifest():
+    """Load (and memoize) the build manifest. Returns {} if assets were never built."""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH, 'r') as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(filename):
+    """URL for a static asset, fingerprinted when a build manifest exists.
+
+    Falls back to the plain ``/static/`` URL so development works without
+    running the build step.
+    """
+    hashed = load_manifest().get(filename)
+    if hashed:
+        return url_for('serve_asset', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+def _negotiate_encoding(path):
+    """Pick the best precompressed variant of ``path`` the client accepts."""
+    accepted = request.accept_encodings
+    if BROTLI_ENABLED and accepted['br'] and os.path.exists(path + '.br'):
+        return path + '.br', 'br'
+    if accepted['gzip'] and os.path.exists(path + '.gz'):
+        return path + '.gz', 'gzip'
+    return path, None
+
+
+def send_asset(filename):
+    """Serve a fingerprinted asset from ``static/dist`` with immutable caching."""
+    path = os.path.realpath(os.path.join(DIST_DIR, filename))
+    if not path.startswith(os.path.realpath(DIST_DIR) + os.sep) or not os.path.isfile(path):
+        abort(404)
+
+    ext = os.path.splitext(filename)[1]
+    body_path, encoding = _negotiate_encoding(path)
+    with open(body_path, 'rb') as f:
+        body = f.read()
+
+    response = current_app.response_class(body, mimetype=MIMETYPES.get(ext, 'application/octet-stream'))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    # The fingerprint already identifies the content; suffix it per encoding
+    response.set_etag(f"{os.path.basename(filename)}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+
+def _compress_variants(body):
+    variants = {None: body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if BROTLI_ENABLED:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+def render_shell(template_name):
+    """Render a static page shell once and serve it with ETag revalidation.
+
+    The templates behind ``/home`` and ``/detection`` do not depend on the
+    request, so the rendered HTML and its compressed variants are kept in
+    memory. Browsers revalidate (``Cache-Control: no-cache``) and get a 304
+    while the shell is unchanged. In debug mode every request re-renders.
+    """
+    entry = None if current_app.debug else _shell_cache.get(template_name)
+    if entry is None:
+        body = render_template(template_name).encode('utf-8')
+        entry = {'etag': _fingerprint(body), 'variants': _compress_variants(body)}
+        _shell_cache[template_name] = entry
+
+    accepted = request.accept_encodings
+    encoding = None
+    if 'br' in entry['variants'] and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+
+    response = current_app.response_class(entry['variants'][encoding], mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(f"{entry['etag']}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+
+def send_service_worker():
+    """Serve ``static/sw.js`` from the site root so its scope covers every page.
+
+    Not fingerprinted: browsers look for updates at a fixed URL, and
+    ``no-cache`` makes them see a new worker on the next visit.
+    """
+    response = send_from_directory(STATIC_DIR, 'sw.js', mimetype=MIMETYPES['.js'], max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def init_app(app):
+    """Register the asset and service worker routes and the ``asset_url`` template global."""
+    app.add_url_rule('/assets/<path:filename>', 'serve_asset', send_asset)
+    app.add_url_rule('/sw.js', 'service_worker', send_service_worker)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+if __name__ == '__main__':
+    build_assets()
@@ -0,0 +1,297 @@
+"""Tiered archival of old submissions and their uploads.
+
+Submissions, photos and reports start out as one file each under
+`uploads/`. Once a submission is older than ARCHIVE_AFTER_DAYS, `compact`
+moves its JSON record and the photos and reports it references into a
+monthly segment, `uploads/archive/segments/<YYYY-MM>.zip`. JSON is deflated;
+images are stored as they are, since they are already compressed. Each zip's
+central directory indexes its own members. `uploads/archive/index.json`
+maps each submission ID and file name to its segment.
+
+Reads go through `Archive`. `read_submission` and `read_file` open the
+segment (open handles are cached until the segment changes) and read a
+single member. `iter_submissions` walks the segments in order.
+
+Compaction is crash-safe in this order: the segment is copied to a temporary
+file, members are appended to the copy (skipping any already present), the
+copy is fsynced and renamed over the segment, the index is replaced
+atomically, and only then are the original files deleted. A live segment is
+never written in place, so a crash leaves either the old or the new segment
+whole, and a run interrupted at any point can simply be repeated.
+
+Usage (from backend/):
+    python archive.py compact [--older-than-days 90] [--dry-run]
+    python archive.py stats [--sample 200]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+# Already-compressed formats are stored rather than deflated again
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+def submission_time(submission_id, fallback_path=None):
+    """When a submission was made, from its timestamp ID (or the file's mtime)."""
+    try:
+        return datetime.strptime(submission_id, '%Y%m%d%H%M%S')
+    except (TypeError, ValueError):
+        if fallback_path and os.path.exists(fallback_path):
+            return datetime.fromtimestamp(os.path.getmtime(fallback_path))
+        return None
+
+
+def disk_usage(path):
+    """Bytes a file occupies on disk (allocated blocks, not just its length)."""
+    st = os.stat(path)
+    return getattr(st, 'st_blocks', 0) * 512 or st.st_size
+
+
+class Archive:
+    def __init__(self, upload_folder):
+        self.upload_folder = upload_folder
+        self.root = os.path.join(upload_folder, 'archive')
+        self.segments_dir = os.path.join(self.root, 'segments')
+        self.index_path = os.path.join(self.root, 'index.json')
+        self.index = {'submissions': {}, 'files': {}}
+        self._index_mtime = None
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._reload_index()
+
+    # --- index -----------------------------------------------------------
+
+    def _reload_index(self):
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+        with open(self.index_path, 'r') as f:
+            self.index = json.load(f)
+        self._index_mtime = mtime
+
+    def _write_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+        self._index_mtime = os.path.getmtime(self.index_path)
+
+    def segment_of(self, kind, name):
+        """Segment holding a submission ID (kind 'submissions') or file (kind 'photos'/'reports')."""
+        key = name if kind == 'submissions' else f'{kind}/{name}'
+        table = self.index['submissions' if kind == 'submissions' else 'files']
+        if key not in table:
+            # Another process (the compaction CLI) may have archived it since
+            with self._lock:
+                self._reload_index()
+            table = self.index['submissions' if kind == 'submissions' else 'files']
+        return table.get(key)
+
+    # --- reads -----------------------------------------------------------
+
+    def _open(self, segment):
+        path = os.path.join(self.segments_dir, segment + '.zip')
+        st = os.stat(path)
+        # Compaction renames a new file over the segment, so the inode changes
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._handles.get(segment)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            # A stale handle is dropped, not closed: another thread may still be reading it
+            handle = zipfile.ZipFile(path, 'r')
+            self._handles[segment] = (version, handle)
+            return handle
+
+    def read_submission(self, submission_id):
+        """Archived submission dict, or None if it is not archived."""
+        segment = self.segment_of('submissions', submission_id)
+        if segment is None:
+            return None
+        return json.loads(self._open(segment).read(f'submissions/submission_{submission_id}.json'))
+
+    def read_file(self, kind, filename):
+        """Bytes of an archived photo or report, or None."""
+        segment = self.segment_of(kind, filename)
+        if segment is None:
+            return None
+        return self._open(segment).read(f'{kind}/{filename}')
+
+    def iter_submissions(self):
+        """All archived submissions, segment by segment."""
+        self._reload_index()
+        segments = sorted(set(self.index['submissions'].values()))
+        for segment in segments:
+            handle = self._open(segment)
+            for name in handle.namelist():
+                if name.startswith('submissions/'):
+                    yield json.loads(handle.read(name))
+
+    # --- compaction ------------------------------------------------------
+
+    def candidates(self, older_than_days=ARCHIVE_AFTER_DAYS):
+        """(submission_id, path, segment) of live submissions old enough to archive."""
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        submissions_dir = os.path.join(self.upload_folder, 'submissions')
+        for filename in sorted(os.listdir(submissions_dir)):
+            if not (filename.startswith('submission_') and filename.endswith('.json')):
+                continue
+            submission_id = filename[len('submission_'):-len('.json')]
+            path = os.path.join(submissions_dir, filename)
+            made = submission_time(submission_id, path)
+            if made is not None and made < cutoff:
+                yield submission_id, path, made.strftime('%Y-%m')
+
+    def compact(self, older_than_days=ARCHIVE_AFTER_DAYS, dry_run=False):
+        """Move old submissions and their uploads into segments; returns a report dict."""
+        by_segment = {}
+        for submission_id, path, segment in self.candidates(older_than_days):
+            by_segment.setdefault(segment, []).append((submission_id, path))
+
+        report = {'submissions': 0, 'files': 0, 'bytes_before': 0, 'bytes_after': 0, 'segments': sorted(by_segment)}
+        if not by_segment:
+            return report
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+        to_delete = []
+        for segment, items in sorted(by_segment.items()):
+            segment_path = os.path.join(self.segments_dir, segment + '.zip')
+            size_before = disk_usage(segment_path) if os.path.exists(segment_path) else 0
+            members = []
+            for submission_id, path in items:
+                with open(path, 'r') as f:
+                    submission = json.load(f)
+                members.append((f'submissions/submission_{submission_id}.json', path, ('submissions', submission_id)))
+                for kind, field in (('photos', 'uploadedPhotos'), ('reports', 'uploadedReports')):
+                    for filename in submission.get(field, []):
+                        file_path = os.path.join(self.upload_folder, kind, filename)
+                        if os.path.exists(file_path):
+                            members.append((f'{kind}/{filename}', file_path, ('files', f'{kind}/{filename}')))
+            report['submissions'] += len(items)
+            report['files'] += len(members) - len(items)
+            report['bytes_before'] += sum(disk_usage(path) for _, path, _ in members)
+            if dry_run:
+                continue
+
+            self._rewrite_segment(segment_path, members)
+            report['bytes_after'] += disk_usage(segment_path) - size_before
+
+            for _, path, (table, key) in members:
+                self.index[table][key] = segment
+                to_delete.append(path)
+
+        if dry_run:
+            return report
+        # The index must name the segments before the originals disappear
+        self._write_index()
+        for path in to_delete:
+            os.remove(path)
+        return report
+
+    def _rewrite_segment(self, segment_path, members):
+        """Append `members` to a copy of the segment and rename it into place."""
+        tmp = segment_path + '.tmp'
+        if os.path.exists(segment_path):
+            shutil.copyfile(segment_path, tmp)
+        elif os.path.exists(tmp):
+            # Left over from an interrupted run that never got renamed
+            os.remove(tmp)
+        try:
+            with zipfile.ZipFile(tmp, 'a', compression=zipfile.ZIP_DEFLATED) as zf:
+                present = set(zf.namelist())
+                for arcname, path, _ in members:
+                    if arcname in present:
+                        continue
+                    stored = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+                    zf.write(path, arcname, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            with open(tmp, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp, segment_path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        # Make the rename itself durable before the originals are deleted
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.segments_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def archived_count(self):
+        self._reload_index()
+        return len(self.index['submissions'])
+
+    def measure_reads(self, sample=200):
+        """Latency (ms) of reading archived submissions through the index."""
+        ids = list(self.index['submissions'])
+        if not ids:
+            return None
+        chosen = random.sample(ids, min(sample, len(ids)))
+        timings = []
+        for submission_id in chosen:
+            started = time.perf_counter()
+            self.read_submission(submission_id)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'reads': len(timings),
+            'p50_ms': round(timings[len(timings) // 2], 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive old submissions into compressed segments')
+    parser.add_argument('--upload-folder', default='uploads')
+    sub = parser.add_subparsers(dest='command', required=True)
+    compact = sub.add_parser('compact', help='Move old submissions and uploads into segments')
+    compact.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    compact.add_argument('--dry-run', action='store_true')
+    stats = sub.add_parser('stats', help='Report archive size and read latency')
+    stats.add_argument('--sample', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    archive = Archive(args.upload_folder)
+    if args.command == 'compact':
+        started = time.perf_counter()
+        report = archive.compact(args.older_than_days, args.dry_run)
+        verb = 'Would archive' if args.dry_run else 'Archived'
+        print(f"{verb} {report['submissions']} submissions and {report['files']} files "
+              f"into {len(report['segments'])} segments in {time.perf_counter() - started:.1f}s")
+        if not args.dry_run:
+            reclaimed = report['bytes_before'] - report['bytes_after']
+            print(f"Disk usage: {report['bytes_before']} bytes in "
+                  f"{report['submissions'] + report['files']} files -> {report['bytes_after']} bytes "
+                  f"in segments ({reclaimed} bytes reclaimed)")
+        else:
+            print(f"Disk usage of those files: {report['bytes_before']} bytes")
+
+    segments = sorted(os.listdir(archive.segments_dir)) if os.path.isdir(archive.segments_dir) else []
+    total = sum(disk_usage(os.path.join(archive.segments_dir, s)) for s in segments)
+    print(f"Archive: {len(archive.index['submissions'])} submissions, {len(archive.index['files'])} files, "
+          f"{len(segments)} segments, {total} bytes")
+    latency = archive.measure_reads(getattr(args, 'sample', 50))
+    if latency:
+        print(f"Archived read latency over {latency['reads']} reads: p50 {latency['p50_ms']}ms, "
+              f"p95 {latency['p95_ms']}ms, max {latency['max_ms']}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
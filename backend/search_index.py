@@ -0,0 +1,290 @@
+"""In-memory full-text index over patient submissions and their PDF reports.
+
+The index is an inverted index: term -> {submission_id: weighted term
+frequency}, where a term found in `chiefComplaint` counts more than one in
+`additionalNotes` (FIELD_WEIGHTS). Each submission's terms are kept too, so
+re-indexing a submission (when its report text arrives) removes exactly its
+old postings. A sorted vocabulary gives prefix lookups by bisection.
+
+Queries match submissions containing every query word; the last word (and
+any word ending in `*`) also matches as a prefix, so "vom" finds "vomiting".
+Results are ranked with BM25, exact matches counting more than prefix
+expansions.
+
+Text is extracted from PDF reports by a background thread (needs `pypdf`)
+and cached next to the reports in `reports_text/`, so a restart only reads
+the cache. On startup the index is rebuilt from the submission JSON files
+and the archived submissions.
+"""
+import bisect
+import io
+import json
+import math
+import os
+import queue
+import re
+import threading
+from collections import Counter, defaultdict
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+FIELD_WEIGHTS = {
+    'chiefComplaint': 3.0,
+    'symptoms': 2.0,
+    'medicalConditions': 2.0,
+    'fullName': 2.0,
+    'affectedBodyPart': 1.5,
+    'additionalNotes': 1.0,
+    'reports': 1.0,
+}
+# Prefix expansions score this fraction of an exact match
+PREFIX_WEIGHT = 0.5
+# Cap on terms one prefix expands to, so "a" does not touch the whole vocabulary
+MAX_PREFIX_TERMS = 50
+MAX_REPORT_CHARS = 200000
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# \w misses the vowel signs and viramas of Indic scripts ("बुखार" would split
+# into single letters), so the Devanagari..Sinhala blocks count as word
+# characters too, except the danda punctuation marks
+_TOKEN = re.compile(r"[\w\u0900-\u0963\u0966-\u0dff]+", re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercase word tokens (any script); single characters are dropped."""
+    return [t for t in _TOKEN.findall(str(text or '').lower()) if len(t) > 1 or t.isdigit()]
+
+
+def extract_pdf_text(source):
+    """Plain text of a PDF (path or file object), whitespace-collapsed and capped at MAX_REPORT_CHARS."""
+    reader = PdfReader(source)
+    parts, size = [], 0
+    for page in reader.pages:
+        text = ' '.join((page.extract_text() or '').split())
+        parts.append(text)
+        size += len(text)
+        if size >= MAX_REPORT_CHARS:
+            break
+    return ' '.join(parts)[:MAX_REPORT_CHARS]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_fields = {}
+        self.doc_length = {}
+        self.total_length = 0.0
+        self.documents = {}
+        self.vocabulary = []
+        self._lock = threading.Lock()
+
+    def add(self, submission, report_text=''):
+        """Index (or re-index) one submission dict."""
+        doc_id = submission.get('submissionId')
+        if not doc_id:
+            return
+        weighted = Counter()
+        fields = defaultdict(set)
+        for field, weight in FIELD_WEIGHTS.items():
+            text = report_text if field == 'reports' else submission.get(field)
+            for term in tokenize(text):
+                weighted[term] += weight
+                fields[term].add(field)
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in weighted.items():
+                postings = self.postings[term]
+                if not postings:
+                    bisect.insort(self.vocabulary, term)
+                postings[doc_id] = tf
+            self.doc_terms[doc_id] = weighted
+            self.doc_fields[doc_id] = fields
+            self.doc_length[doc_id] = length = sum(weighted.values())
+            self.total_length += length
+            self.documents[doc_id] = {
+                'submissionId': doc_id,
+                'fullName': submission.get('fullName', ''),
+                'chiefComplaint': submission.get('chiefComplaint', ''),
+                'severity': submission.get('severity', ''),
+                'submissionTime': submission.get('submissionTime', ''),
+            }
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                i = bisect.bisect_left(self.vocabulary, term)
+                if i < len(self.vocabulary) and self.vocabulary[i] == term:
+                    del self.vocabulary[i]
+        self.total_length -= self.doc_length.pop(doc_id, 0.0)
+        self.doc_fields.pop(doc_id, None)
+        self.documents.pop(doc_id, None)
+
+    def _expand(self, word, prefix):
+        """(term, weight) pairs a query word matches."""
+        matches = [(word, 1.0)] if word in self.postings else []
+        if prefix:
+            start = bisect.bisect_left(self.vocabulary, word)
+            # One extra slot for the word itself, which sorts first
+            end = start + MAX_PREFIX_TERMS + (1 if matches else 0)
+            for term in self.vocabulary[start:end]:
+                if not term.startswith(word):
+                    break
+                if term != word:
+                    matches.append((term, PREFIX_WEIGHT))
+        return matches
+
+    def search(self, query, page=1, per_page=20):
+        """Return (total, results) for one page of ranked matches."""
+        words = query.strip().split()
+        parsed = []
+        for i, word in enumerate(words):
+            prefix = word.endswith('*') or i == len(words) - 1
+            for term in tokenize(word.rstrip('*')):
+                parsed.append((term, prefix))
+        if not parsed:
+            return 0, []
+
+        with self._lock:
+            count = len(self.doc_terms)
+            avg_length = self.total_length / count if count else 0.0
+            scores = None
+            matched_fields = defaultdict(set)
+            for term, prefix in parsed:
+                word_scores = {}
+                for expanded, weight in self._expand(term, prefix):
+                    postings = self.postings[expanded]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length[doc_id] / avg_length)
+                        score = weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                        # A word expanding to several terms counts its best one
+                        if score > word_scores.get(doc_id, 0.0):
+                            word_scores[doc_id] = score
+                        matched_fields[doc_id] |= self.doc_fields[doc_id][expanded]
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {d: s + word_scores[d] for d, s in scores.items() if d in word_scores}
+                if not scores:
+                    return 0, []
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            start = (page - 1) * per_page
+            results = []
+            for doc_id, score in ranked[start:start + per_page]:
+                result = dict(self.documents[doc_id])
+                result['score'] = round(score, 4)
+                result['matchedFields'] = sorted(matched_fields[doc_id])
+                results.append(result)
+        return len(ranked), results
+
+
+class ReportExtractor:
+    """Background thread extracting report text and re-indexing its submission."""
+
+    def __init__(self, index, reports_dir, text_dir, archive=None):
+        self.index = index
+        self.reports_dir = reports_dir
+        self.text_dir = text_dir
+        # Reports compacted into archive segments are read from there
+        self.archive = archive
+        self.jobs = queue.Queue()
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def cached_text(self, report):
+        path = os.path.join(self.text_dir, report + '.txt')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def report_text(self, submission):
+        """Cached text of the submission's reports, and the reports still missing."""
+        texts, missing = [], []
+        for report in submission.get('uploadedReports', []):
+            if not report.lower().endswith('.pdf'):
+                continue
+            text = self.cached_text(report)
+            if text is None:
+                missing.append(report)
+            else:
+                texts.append(text)
+        return ' '.join(texts), missing
+
+    def submit(self, submission):
+        """Queue a submission whose reports have no cached text yet."""
+        if PdfReader is None:
+            return
+        with self._lock:
+            self.pending += 1
+            if self._thread is None:
+                os.makedirs(self.text_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name='report-extractor', daemon=True)
+                self._thread.start()
+        self.jobs.put(submission)
+
+    def _run(self):
+        while True:
+            submission = self.jobs.get()
+            try:
+                _, missing = self.report_text(submission)
+                for report in missing:
+                    try:
+                        path = os.path.join(self.reports_dir, report)
+                        if not os.path.exists(path) and self.archive is not None:
+                            path = io.BytesIO(self.archive.read_file('reports', report) or b'')
+                        text = extract_pdf_text(path)
+                    except Exception as e:
+                        print(f"Could not extract text from report {report}: {e}")
+                        text = ''
+                    # Cache failures as empty text too, so they are not retried on every start
+                    tmp = os.path.join(self.text_dir, report + '.txt.tmp')
+                    with open(tmp, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                    os.replace(tmp, os.path.join(self.text_dir, report + '.txt'))
+                text, _ = self.report_text(submission)
+                self.index.add(submission, text)
+            except Exception as e:
+                print(f"Error indexing reports of submission {submission.get('submissionId')}: {e}")
+            finally:
+                with self._lock:
+                    self.pending -= 1
+
+
+def index_submission(index, extractor, submission):
+    """Index a submission now with whatever report text is cached; extract the rest in the background."""
+    text, missing = extractor.report_text(submission)
+    index.add(submission, text)
+    if missing:
+        extractor.submit(submission)
+
+
+def load_submissions(index, extractor, submissions_dir, archived=()):
+    """Index every stored submission (and the `archived` ones); returns how many were loaded."""
+    loaded = 0
+    for submission in archived:
+        index_submission(index, extractor, submission)
+        loaded += 1
+    for filename in os.listdir(submissions_dir):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(submissions_dir, filename), 'r') as f:
+                index_submission(index, extractor, json.load(f))
+            loaded += 1
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable submission {filename}: {e}")
+    return loaded
@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 import json
 from werkzeug.utils import secure_filename
+from search_index import SearchIndex, ReportExtractor, index_submission, load_submissions
+from archive import Archive
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -23,6 +25,20 @@ for subfolder in ['photos', 'reports', 'submissions']:
     if not os.path.exists(path):
         os.makedirs(path)
 
+# Old submissions are compacted into segments by `python archive.py compact`
+archive = Archive(UPLOAD_FOLDER)
+
+# Full-text search over submissions and report text (rebuilt from disk on start)
+MAX_SEARCH_PAGE_SIZE = 100
+search_index = SearchIndex()
+report_extractor = ReportExtractor(
+    search_index,
+    os.path.join(UPLOAD_FOLDER, 'reports'),
+    os.path.join(UPLOAD_FOLDER, 'reports_text'),
+    archive
+)
+load_submissions(search_index, report_extractor, os.path.join(UPLOAD_FOLDER, 'submissions'), archive.iter_submissions())
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -91,6 +107,9 @@ def submit_patient_data():
         with open(submission_file, 'w') as f:
             json.dump(form_data, f, indent=2)
         
+        # Make it searchable; report text is extracted in the background
+        index_submission(search_index, report_extractor, form_data)
+        
         # Log submission
         print(f"\n{'='*50}")
         print(f"New Patient Submission: {submission_id}")
@@ -146,12 +165,18 @@ def get_submissions():
                     data = json.load(f)
                     submissions.append(data)
         
+        # Archived submissions are only read from their segments on request;
+        # single ones stay reachable through /api/submission/<id>
+        if request.args.get('include_archived') == '1':
+            submissions.extend(archive.iter_submissions())
+        
         # Sort by submission time (newest first)
         submissions.sort(key=lambda x: x.get('submissionTime', ''), reverse=True)
         
         return jsonify({
             'success': True,
             'count': len(submissions),
+            'archivedCount': archive.archived_count(),
             'submissions': submissions
         }), 200
         
@@ -167,15 +192,19 @@ def get_submission(submission_id):
     try:
         filepath = os.path.join(UPLOAD_FOLDER, 'submissions', f'submission_{submission_id}.json')
         
-        if not os.path.exists(filepath):
+        if os.path.exists(filepath):
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+        else:
+            # Older submissions live in archive segments
+            data = archive.read_submission(submission_id)
+        
+        if data is None:
             return jsonify({
                 'success': False,
                 'error': 'Submission not found'
             }), 404
         
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
         return jsonify({
             'success': True,
             'submission': data
@@ -187,6 +216,36 @@ def get_submission(submission_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/search', methods=['GET'])
+def search_submissions():
+    """Ranked full-text search over submissions and their report text"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Query parameter q is required'
+        }), 400
+    
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(MAX_SEARCH_PAGE_SIZE, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'page and per_page must be integers'
+        }), 400
+    
+    total, results = search_index.search(query, page, per_page)
+    return jsonify({
+        'success': True,
+        'query': query,
+        'total': total,
+        'page': page,
+        'perPage': per_page,
+        'pendingReports': report_extractor.pending,
+        'results': results
+    }), 200
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🏥 AppAyu Healthcare Server Starting...")
@@ -195,6 +254,7 @@ if __name__ == '__main__':
     print(f"🌐 Server will run on: http://localhost:5000")
     print(f"✅ Health check: http://localhost:5000/api/health")
     print(f"📊 View submissions: http://localhost:5000/api/submissions")
+    print(f"🔎 Search submissions: http://localhost:5000/api/search?q=headache")
     print("="*60 + "\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""Local stand-ins for the Gemini and Google Translation REST APIs.
+
+Start both fakes, then point the app at them:
+
+    python bench/fake_services.py --latency-ms 1500 --jitter-ms 300 --error-rate 0.02
+    export GEMINI_API_ENDPOINT=http://127.0.0.1:8701
+    export GOOGLE_TRANSLATE_API_URL=http://127.0.0.1:8702/language/translate/v2
+    export GOOGLE_TRANSLATE_API_KEY=fake
+    python app.py
+
+The Gemini fake answers `generateContent` with a mix of canned replies: clean
+JSON, JSON wrapped in prose/markdown, truncated non-JSON text (a reply cut off
+at the token limit) and empty candidates, in proportions set on the command
+line. Requests in JSON mode (`responseMimeType: application/json`) never get
+the prose variant, like the real API. When the prompt lists knowledge-base conditions, replies for a
+listed condition omit description, severity and medicines, like the real model
+is asked to. Latency and HTTP error injection apply to both fakes.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_ANALYSES = [
+    {
+        "Disease name": "Tinea corporis",
+        "Confidence level": 82,
+        "Description": "Ring-shaped, scaly fungal infection of the skin.",
+        "Severity level": "Mild",
+        "List of recommended medicines": ["Clotrimazole 1% cream", "Keep the area dry"],
+        "Visual characteristics": {"color": "reddish", "texture": "scaly"}
+    },
+    {
+        "Disease name": "Conjunctivitis",
+        "Confidence level": 76,
+        "Description": "Inflammation of the conjunctiva with redness and discharge.",
+        "Severity level": "Moderate",
+        "List of recommended medicines": ["Lubricating eye drops", "Consult an eye specialist"],
+        "Visual characteristics": {"redness": "marked", "discharge": "watery", "swelling": "mild", "other": ""}
+    },
+    {
+        "Disease name": "Oral candidiasis",
+        "Confidence level": 68,
+        "Description": "White plaques on the oral mucosa caused by Candida.",
+        "Severity level": "Mild",
+        "List of recommended medicines": ["Clotrimazole troche", "Dental consultation"],
+        "Visual characteristics": {"color": "white", "texture": "creamy", "location": "tongue", "size": "small"}
+    },
+    {
+        "Disease name": "Seborrheic keratosis",
+        "Confidence level": 71,
+        "Description": "A common benign growth that looks waxy and stuck-on, often on the trunk of older adults.",
+        "Severity level": "Mild",
+        "List of recommended medicines": ["No treatment needed", "Cryotherapy if irritated", "Dermatology review if it changes"],
+        "Visual characteristics": {"color": "brown", "texture": "waxy"}
+    },
+]
+
+# Keys the app fills from its knowledge base when the prompt lists known conditions
+KB_KEYS = ("Description", "Severity level", "List of recommended medicines")
+
+
+class FakeConfig:
+    def __init__(self, args):
+        self.latency = args.latency_ms / 1000.0
+        self.jitter = args.jitter_ms / 1000.0
+        self.error_rate = args.error_rate
+        self.prose_rate = args.prose_rate
+        self.non_json_rate = args.non_json_rate
+        self.empty_rate = args.empty_rate
+        self.seed = args.seed
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(args.seed)
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def choice(self, seq):
+        with self._lock:
+            return self._random.choice(seq)
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def gemini_text(config, prompt=b"", json_mode=False):
+    """Pick a canned reply body (the model's text) and its kind."""
+    analysis = config.choice(CANNED_ANALYSES)
+    if b"Known conditions:" in prompt and analysis["Disease name"].encode() in prompt:
+        # Knowledge-base mode: a known condition gets the short answer
+        analysis = {k: v for k, v in analysis.items() if k not in KB_KEYS}
+    roll = config.random()
+    if roll < config.empty_rate:
+        return None, "empty"
+    roll -= config.empty_rate
+    if roll < config.non_json_rate:
+        # Truncated mid-object, as when the output token limit is hit
+        text = json.dumps(analysis, indent=2)
+        return text[: len(text) * 2 // 3], "non_json"
+    roll -= config.non_json_rate
+    if roll < config.prose_rate and not json_mode:
+        return "Here is my analysis:\n```json\n" + json.dumps(analysis, indent=2) + "\n```\nPlease consult a doctor.", "prose"
+    return json.dumps(analysis), "json"
+
+
+def make_handler(config, service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/stats"):
+                return self._send(200, {"service": service, "counts": config.counts})
+            self._send(404, {"error": {"code": 404, "message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+
+            delay = max(0.0, config.latency + (config.random() * 2 - 1) * config.jitter)
+            time.sleep(delay)
+
+            if config.random() < config.error_rate:
+                config.count("error")
+                return self._send(503, {"error": {"code": 503, "message": "injected failure", "status": "UNAVAILABLE"}})
+
+            if service == "gemini":
+                if not re.search(r":(stream)?[gG]enerateContent", self.path):
+                    return self._send(404, {"error": {"code": 404, "message": "not found"}})
+                try:
+                    generation = json.loads(raw or b"{}").get("generationConfig") or {}
+                except ValueError:
+                    generation = {}
+                json_mode = generation.get("responseMimeType") == "application/json"
+                text, kind = gemini_text(config, raw, json_mode)
+                config.count(kind)
+                candidate = {"finishReason": "STOP", "index": 0}
+                if text is not None:
+                    candidate["content"] = {"parts": [{"text": text}], "role": "model"}
+                prompt_tokens = len(raw) // 4
+                output_tokens = len(text or "") // 4
+                return self._send(200, {
+                    "candidates": [candidate],
+                    "usageMetadata": {
+                        "promptTokenCount": prompt_tokens,
+                        "candidatesTokenCount": output_tokens,
+                        "totalTokenCount": prompt_tokens + output_tokens
+                    }
+                })
+
+            try:
+                payload = json.loads(raw or b"{}")
+            except ValueError:
+                return self._send(400, {"error": {"code": 400, "message": "invalid JSON"}})
+            texts = payload.get("q") or []
+            if isinstance(texts, str):
+                texts = [texts]
+            target = payload.get("target", "hi")
+            config.count("translate")
+            self._send(200, {"data": {"translations": [
+                {"translatedText": f"[{target}] {t}", "detectedSourceLanguage": "en"} for t in texts
+            ]}})
+
+    return Handler
+
+
+def serve(config, host, gemini_port, translate_port):
+    servers = [
+        ThreadingHTTPServer((host, gemini_port), make_handler(config, "gemini")),
+        ThreadingHTTPServer((host, translate_port), make_handler(config, "translate")),
+    ]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini and Translation API servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--gemini-port", type=int, default=8701)
+    parser.add_argument("--translate-port", type=int, default=8702)
+    parser.add_argument("--latency-ms", type=float, default=1500.0, help="Mean injected latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--prose-rate", type=float, default=0.2, help="Fraction of JSON-in-prose replies")
+    parser.add_argument("--non-json-rate", type=float, default=0.1, help="Fraction of truncated, non-JSON replies")
+    parser.add_argument("--empty-rate", type=float, default=0.02, help="Fraction of replies without text")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    config = FakeConfig(args)
+    serve(config, args.host, args.gemini_port, args.translate_port)
+    print(f"[info] fake Gemini on http://{args.host}:{args.gemini_port}")
+    print(f"[info] fake Translation on http://{args.host}:{args.translate_port}/language/translate/v2")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Concurrency load test for /predict.
+
+Fires `--requests` uploads at each target with increasing concurrency and
+reports throughput and latency percentiles, so the threaded Flask server and
+the ASGI mode can be compared side by side:
+
+    python app.py                                  # threaded, :5000
+    uvicorn asgi:app --port 8000                   # async, :8000
+    python bench/predict_load.py --image sample.jpg \
+        --target threaded=http://localhost:5000 --target asgi=http://localhost:8000
+
+Point both servers at the same (fake or real) Gemini/Translation backends so
+the comparison measures the serving model, not the upstream.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    # nearest-rank
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100.0 * len(values)) - 1)]
+
+
+async def run_level(base_url, image, filename, concurrency, total, form, timeout):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    resp = await client.post('/predict', data=form, files={'file': (filename, image, 'image/jpeg')})
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+async def main_async(args):
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    filename = os.path.basename(args.image)
+    form = {'category': args.category, 'language': args.language}
+
+    report = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        url = url or name
+        report[name] = []
+        for level in args.concurrency:
+            total = max(args.requests, level)
+            result = await run_level(url, image, filename, level, total, form, args.timeout)
+            report[name].append(result)
+            print(f"[info] {name:>10} c={level:<4} {result['throughput_rps']:>8} req/s  "
+                  f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency load test for /predict")
+    parser.add_argument('--image', required=True, help="Image file to upload")
+    parser.add_argument('--target', action='append', required=True,
+                        help="name=base_url (repeat to compare servers)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128, 256])
+    parser.add_argument('--requests', type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument('--category', default='skin')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
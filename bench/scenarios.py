@@ -0,0 +1,156 @@
+"""Scripted load scenarios with run-over-run comparison.
+
+Typical setup (everything local, no API keys or production data):
+
+    python bench/fake_services.py --latency-ms 1500 --jitter-ms 300 &
+    python bench/seed_data.py --db appayu_bench --patients 50000 --drop
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8701 \\
+    GOOGLE_TRANSLATE_API_URL=http://127.0.0.1:8702/language/translate/v2 \\
+    GOOGLE_TRANSLATE_API_KEY=fake MONGO_DB=appayu_bench python app.py &
+
+    python bench/scenarios.py predict add_patient disease_stats --output results/after.json \\
+        --baseline results/before.json
+
+Each scenario reports throughput, error count and latency percentiles. With
+--baseline the report prints the change against a previous run.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+
+import httpx
+
+from predict_load import percentile
+
+
+def make_image(rng, size=(1024, 768)):
+    """A noisy JPEG roughly the size of a phone photo after downscaling."""
+    from PIL import Image
+    image = Image.effect_noise(size, 40 + rng.random() * 30).convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def predict_request(rng, state):
+    return ("POST", "/predict", {
+        "data": {"category": rng.choice(["skin", "eye", "oral"]), "language": rng.choice(["en", "en", "hi"])},
+        "files": {"file": ("capture.jpg", state["image"], "image/jpeg")},
+    })
+
+
+def add_patient_request(rng, state):
+    # Mix of existing (found) and new (created) patients
+    name = f"Bench Patient {rng.randint(0, state['patient_space'])}"
+    return ("POST", "/add_patient", {"json": {"name": name, "phone": f"9{rng.randint(100000000, 999999999)}"}})
+
+
+def disease_stats_request(rng, state):
+    return ("GET", "/get_disease_statistics", {})
+
+
+SCENARIOS = {
+    "predict": predict_request,
+    "add_patient": add_patient_request,
+    "disease_stats": disease_stats_request,
+}
+
+
+async def run_scenario(base_url, name, concurrency, total, timeout, seed):
+    rng = random.Random(seed)
+    state = {"image": make_image(rng), "patient_space": total * 2}
+    make_request = SCENARIOS[name]
+    latencies, statuses = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one():
+            method, path, kwargs = make_request(rng, state)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, **kwargs)
+                    status = str(resp.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(n for s, n in statuses.items() if not s.startswith("2")),
+        "statuses": statuses,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        before = previous.get(result["scenario"])
+        if not before:
+            continue
+        for key in ("throughput_rps", "p50_ms", "p99_ms"):
+            old, new = before[key], result[key]
+            change = ((new - old) / old * 100) if old else 0.0
+            print(f"[info] {result['scenario']:>14} {key:<15} {old:>9} -> {new:<9} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scripted load scenarios against the app")
+    parser.add_argument("scenarios", nargs="+", choices=sorted(SCENARIOS))
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "started": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "base_url": args.base_url,
+        "results": [],
+    }
+    for name in args.scenarios:
+        result = asyncio.run(run_scenario(args.base_url, name, args.concurrency, args.requests, args.timeout, args.seed))
+        report["results"].append(result)
+        print(f"[info] {name:>14} {result['throughput_rps']:>8} req/s  p50={result['p50_ms']}ms "
+              f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Seed a MongoDB database with a reproducible synthetic dataset.
+
+    python bench/seed_data.py --db appayu_bench --patients 50000 --drop
+    MONGO_DB=appayu_bench python app.py
+
+Patients are spread over villages with a skewed distribution and carry a few
+detections each. Disease names deliberately include the free-text variants the
+app stores today (e.g. "Fungal Infection (83% confidence)"), so aggregation
+benchmarks see realistic data. The same --seed always produces the same data.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+FIRST_NAMES = ["Ramesh", "Suresh", "Lakshmi", "Anita", "Manjunath", "Kavya", "Raju", "Savitha",
+               "Prakash", "Geeta", "Mahesh", "Shanthi", "Ravi", "Asha", "Naveen", "Pooja"]
+LAST_NAMES = ["Kumar", "Gowda", "Reddy", "Naik", "Shetty", "Patil", "Rao", "Devi", "K", ""]
+DISEASES = ["Tinea corporis", "Scabies", "Conjunctivitis", "Oral candidiasis", "Eczema",
+            "Melanocytic nevus", "Seborrheic keratosis", "Stye", "Gingivitis", "Fungal Infection"]
+EDUCATION = ["10th", "12th", "Graduate"]
+
+
+def village_names(count):
+    return [f"Village-{i:03d}" for i in range(count)]
+
+
+def make_worker(rng, i, villages):
+    return {
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".strip(),
+        "asha_id": f"ASHA{i:05d}",
+        "mobile": f"9{rng.randint(100000000, 999999999)}",
+        "education": rng.choice(EDUCATION),
+        "years": rng.randint(0, 20),
+        "village": villages[i % len(villages)],
+        "password": "bench",
+        "photo_url": "",
+        "created": datetime.utcnow()
+    }
+
+
+def make_patient(rng, i, villages, workers, now):
+    # Skewed village sizes: low-numbered villages are bigger
+    village = villages[min(int(rng.expovariate(1.0 / (len(villages) / 4))), len(villages) - 1)]
+    diseases = []
+    for _ in range(rng.choice([0, 0, 1, 1, 1, 2, 3, 5])):
+        worker = rng.choice(workers)
+        name = rng.choice(DISEASES)
+        if rng.random() < 0.3:
+            name = f"{name} ({rng.randint(40, 99)}% confidence)"
+        diseases.append({
+            "name": name,
+            "detected_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+            "checked_by": {"name": worker["name"], "asha_id": worker["asha_id"], "mobile": worker["mobile"]}
+        })
+    created = now - timedelta(days=rng.randint(0, 730))
+    return {
+        "username": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}".replace("  ", " "),
+        "phone": f"{rng.choice('6789')}{rng.randint(100000000, 999999999)}",
+        "village": village,
+        "diseases": diseases,
+        "created": created,
+        "updated_at": max([created] + [d["detected_at"] for d in diseases])
+    }
+
+
+def seed(db, patients, villages_count, workers_count, seed_value, batch_size=5000, drop=False):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    villages = village_names(villages_count)
+
+    if drop:
+        db["users"].drop()
+        db["asha_workers"].drop()
+
+    workers = [make_worker(rng, i, villages) for i in range(workers_count)]
+    db["asha_workers"].insert_many([dict(w) for w in workers])
+
+    started = time.perf_counter()
+    batch = []
+    for i in range(patients):
+        batch.append(make_patient(rng, i, villages, workers, now))
+        if len(batch) >= batch_size:
+            db["users"].insert_many(batch, ordered=False)
+            batch = []
+            print(f"[info] inserted {i + 1}/{patients} patients", file=sys.stderr)
+    if batch:
+        db["users"].insert_many(batch, ordered=False)
+
+    elapsed = time.perf_counter() - started
+    print(f"[info] seeded {patients} patients, {workers_count} workers, {villages_count} villages "
+          f"in {elapsed:.1f}s", file=sys.stderr)
+    # Credentials the scenarios can log in with
+    return [w["mobile"] for w in workers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed MongoDB with a synthetic AppAyu dataset")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="appayu_bench")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--villages", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--drop", action="store_true", help="Drop existing users/asha_workers first")
+    args = parser.parse_args()
+
+    if args.db == "hospital_db" and args.drop:
+        parser.error("refusing to --drop the production database name")
+
+    db = MongoClient(args.uri)[args.db]
+    seed(db, args.patients, args.villages, args.workers, args.seed, drop=args.drop)
+
+
+if __name__ == "__main__":
+    main()
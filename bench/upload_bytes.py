@@ -0,0 +1,85 @@
+"""Estimate upload bytes saved by client-side downscaling.
+
+    python bench/upload_bytes.py photos/ --output results/upload.json
+    python bench/upload_bytes.py photos/ --base-url http://localhost:5000
+
+Applies the same transform as `static/upload.js` (fit the longest side to
+the advertised max_side, re-encode in the first advertised format at the
+advertised quality, keep the original if that is not smaller) to every image
+in the given directories, and reports original vs sent bytes. Parameters
+come from a running server's /upload_config when --base-url is given,
+otherwise from upload_sizing.py. Live totals from real uploads are on
+/metrics as appayu_upload_bytes_total.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+
+from PIL import Image, ImageOps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+PIL_FORMATS = {"image/webp": "WEBP", "image/jpeg": "JPEG"}
+
+
+def load_config(base_url):
+    if base_url:
+        import httpx
+        return httpx.get(base_url.rstrip("/") + "/upload_config", timeout=10).json()
+    from upload_sizing import UPLOAD_MAX_SIDE, UPLOAD_QUALITY, UPLOAD_FORMATS
+    return {"max_side": UPLOAD_MAX_SIDE, "quality": UPLOAD_QUALITY, "formats": UPLOAD_FORMATS}
+
+
+def downscale(path, config):
+    """Bytes the browser would send for `path`."""
+    original = os.path.getsize(path)
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((config["max_side"], config["max_side"]), Image.LANCZOS)
+        out = io.BytesIO()
+        fmt = PIL_FORMATS.get(config["formats"][0], "JPEG")
+        image.save(out, format=fmt, quality=round(config["quality"] * 100))
+    return min(original, out.tell()), image.size
+
+
+def iter_images(paths):
+    for root in paths:
+        for dirpath, _, files in os.walk(root):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.join(dirpath, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate client-side downscaling savings")
+    parser.add_argument("paths", nargs="+", help="Directories of sample photos")
+    parser.add_argument("--base-url", help="Read parameters from this server's /upload_config")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    config = load_config(args.base_url)
+    report = {"config": config, "results": []}
+    for path in iter_images(args.paths):
+        original = os.path.getsize(path)
+        sent, size = downscale(path, config)
+        report["results"].append({"path": path, "original_bytes": original, "sent_bytes": sent, "size": size})
+        print(f"[info] {os.path.basename(path):<40} {original:>9} B -> {sent:>8} B  {size[0]}x{size[1]}")
+
+    original = sum(r["original_bytes"] for r in report["results"])
+    sent = sum(r["sent_bytes"] for r in report["results"])
+    report.update({"original_bytes": original, "sent_bytes": sent})
+    if original:
+        print(f"[info] {len(report['results'])} photos: {original} B -> {sent} B "
+              f"({100.0 * (1 - sent / original):.1f}% saved)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
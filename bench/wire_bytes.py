@@ -0,0 +1,81 @@
+"""Compare response sizes on the wire across formats and encodings.
+
+    python bench/seed_data.py --db appayu_bench --patients 50000 --drop
+    MONGO_DB=appayu_bench python app.py &
+    python bench/wire_bytes.py --roster-mobile <worker mobile> --output results/wire.json
+
+For each endpoint every Accept / Accept-Encoding combination is requested
+once. The report lists the bytes received (the compressed body, as on the
+network), the decoded size and the request time. Variants the server cannot
+produce (e.g. msgpack without the package installed) show up with the
+Content-Type that was actually returned.
+"""
+import argparse
+import json
+import os
+import time
+
+import httpx
+
+VARIANTS = [
+    ("json", "application/json", "identity"),
+    ("json+gzip", "application/json", "gzip"),
+    ("json+br", "application/json", "br"),
+    ("msgpack", "application/msgpack", "identity"),
+    ("msgpack+br", "application/msgpack", "br"),
+    ("cbor", "application/cbor", "identity"),
+    ("cbor+gzip", "application/cbor", "gzip"),
+]
+
+
+def endpoints(args):
+    yield "disease_stats", "GET", "/get_disease_statistics", None
+    if args.roster_mobile:
+        yield "roster", "POST", "/roster", {"mobile": args.roster_mobile}
+    yield "metrics", "GET", "/metrics", None
+
+
+def measure(client, method, path, body, accept, encoding):
+    started = time.perf_counter()
+    with client.stream(method, path, json=body, headers={"Accept": accept, "Accept-Encoding": encoding}) as resp:
+        decoded = resp.read()
+        wire = resp.num_bytes_downloaded
+    return {
+        "status": resp.status_code,
+        "content_type": resp.headers.get("Content-Type", "").split(";")[0],
+        "content_encoding": resp.headers.get("Content-Encoding", "identity"),
+        "wire_bytes": wire,
+        "decoded_bytes": len(decoded),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure response bytes per format/encoding")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--roster-mobile", help="Worker mobile for the /roster request")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = {"base_url": args.base_url, "results": []}
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        for name, method, path, body in endpoints(args):
+            baseline = None
+            for variant, accept, encoding in VARIANTS:
+                result = measure(client, method, path, body, accept, encoding)
+                result.update({"endpoint": name, "variant": variant})
+                baseline = baseline or result["wire_bytes"]
+                saved = 100.0 * (1 - result["wire_bytes"] / baseline) if baseline else 0.0
+                print(f"[info] {name:>14} {variant:<11} {result['wire_bytes']:>9} B "
+                      f"({saved:5.1f}% smaller than json)  {result['content_type']} "
+                      f"{result['content_encoding']}  {result['ms']}ms")
+                report["results"].append(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Streaming bulk import/export of patients and their detection history.
+
+Import reads CSV or NDJSON one record at a time and writes batched, unordered
+upserts keyed on username (the patient identity used by `add_user`), so a
+district's existing records can be loaded without a round trip per patient.
+Export pages a Mongo cursor through a generator, so the collection is never
+held in memory.
+
+CSV columns:   username, phone, village, disease, detected_at, asha_id, category
+               (one detection per row; repeat the patient for more)
+NDJSON fields: username, phone, village, diseases: [{name, detected_at, checked_by, category, client_id}]
+
+A detection is only added if the patient has none with the same `client_id`
+or, without one, the same name and `detected_at`. Importing a file again, or
+importing an export, therefore adds nothing. Usernames merged into another
+patient (patient_linkage.py) are imported onto the survivor.
+
+Usage:
+    python bulk_io.py import patients.csv
+    python bulk_io.py export patients.ndjson --village Hosur
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from user_schema import users, normalize_phone, ensure_client_id_index, resolve_usernames
+from disease_registry import condition_id
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+CSV_FIELDS = ["username", "phone", "village", "disease", "detected_at", "asha_id", "category"]
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename, default="ndjson"):
+    """Guess the import/export format from a file name."""
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return default
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        # detections are stored as naive local time (see add_disease)
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _detection(name, detected_at=None, checked_by=None, client_id=None, category=None):
+    """A detection to import; `detected_at` stays None until import_patients fills it."""
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("disease name must be a non-empty string")
+    if checked_by is not None and not isinstance(checked_by, dict):
+        raise ValueError("checked_by must be an object")
+    name = name.strip()
+    record = {"name": name, "condition_id": condition_id(name, category), "detected_at": _parse_time(detected_at)}
+    if category:
+        record["category"] = category
+    if checked_by:
+        record["checked_by"] = checked_by
+    if client_id:
+        record["client_id"] = str(client_id)
+    return record
+
+
+def _undated_client_id(username, detection, occurrence):
+    """Stable ID for a detection without a timestamp: the same row gets the same ID on every import."""
+    asha_id = (detection.get("checked_by") or {}).get("asha_id") or ""
+    key = "\x1f".join((username, detection["name"], str(asha_id), str(occurrence)))
+    return "import-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def iter_records(stream, fmt):
+    """Yield `(line_number, record_or_None, error_or_None)` from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            try:
+                username = (row.get("username") or row.get("name") or "").strip()
+                if not username:
+                    raise ValueError("username is required")
+                diseases = []
+                if row.get("disease"):
+                    checked_by = {"asha_id": row["asha_id"]} if row.get("asha_id") else None
+                    diseases.append(_detection(row["disease"], row.get("detected_at"), checked_by,
+                                               category=(row.get("category") or "").strip() or None))
+                yield reader.line_num, {
+                    "username": username,
+                    "phone": normalize_phone(row.get("phone") or ""),
+                    "village": (row.get("village") or "").strip() or None,
+                    "diseases": diseases
+                }, None
+            except ValueError as e:
+                yield reader.line_num, None, str(e)
+        return
+
+    for number, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+            username = (data.get("username") or data.get("name") or "").strip()
+            if not username:
+                raise ValueError("username is required")
+            diseases = []
+            for d in data.get("diseases") or []:
+                if isinstance(d, dict):
+                    # Exported records keep their client_id, so re-importing them is a no-op
+                    diseases.append(_detection(d.get("name"), d.get("detected_at"), d.get("checked_by"),
+                                               d.get("client_id"), d.get("category")))
+                else:
+                    diseases.append(_detection(d))
+            yield number, {
+                "username": username,
+                "phone": normalize_phone(data.get("phone") or ""),
+                "village": data.get("village"),
+                "diseases": diseases
+            }, None
+        except (ValueError, AttributeError) as e:
+            yield number, None, str(e)
+
+
+def _dedup_key(detection):
+    """Filter matching a stored copy of `detection` inside the diseases array."""
+    if detection.get("client_id"):
+        return {"client_id": detection["client_id"]}
+    return {"name": detection["name"], "detected_at": detection["detected_at"]}
+
+
+def _write(requests, labels, report):
+    """Run unordered writes, adding the outcome to the report."""
+    if not requests:
+        return None
+    try:
+        result = users.bulk_write(requests, ordered=False)
+        return result.bulk_api_result
+    except BulkWriteError as bwe:
+        for err in bwe.details.get("writeErrors", []):
+            _add_error(report, None, f"{labels[err['index']]}: {err.get('errmsg', 'write failed')}")
+        return bwe.details
+
+
+def _flush(batch, now, report):
+    """Write one batch of merged records: patient upserts, then guarded detection pushes."""
+    if not batch:
+        return
+    ensure_client_id_index()
+    # Names merged into another patient are imported onto the survivor
+    resolved = resolve_usernames(batch.keys())
+    patients = {}
+    for record in batch.values():
+        username = resolved.get(record["username"], record["username"])
+        merged = patients.get(username)
+        if merged:
+            merged["diseases"].extend(record["diseases"])
+            merged["phone"] = record["phone"] or merged["phone"]
+            merged["village"] = record["village"] or merged["village"]
+        else:
+            patients[username] = dict(record, username=username)
+
+    requests = []
+    for record in patients.values():
+        update = {
+            "$setOnInsert": {"created": now, "diseases": []},
+            "$set": {"updated_at": now}
+        }
+        if record["phone"]:
+            update["$set"]["phone"] = record["phone"]
+        if record["village"]:
+            update["$set"]["village"] = record["village"]
+        requests.append(UpdateOne({"username": record["username"]}, update, upsert=True))
+    details = _write(requests, list(patients), report)
+    if details:
+        report["upserted"] += details.get("nUpserted", 0)
+        report["matched"] += details.get("nMatched", 0)
+
+    # One guarded push per detection: skipped if the patient already has it,
+    # including a copy pushed earlier in this same batch
+    requests, labels = [], []
+    for record in patients.values():
+        for detection in record["diseases"]:
+            requests.append(UpdateOne(
+                {"username": record["username"], "diseases": {"$not": {"$elemMatch": _dedup_key(detection)}}},
+                {"$push": {"diseases": detection}}
+            ))
+            labels.append(record["username"])
+    details = _write(requests, labels, report)
+    if details:
+        report["detections_added"] += details.get("nModified", 0)
+
+
+def _add_error(report, line, message):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line, "message": message})
+
+
+def import_patients(stream, fmt="ndjson", batch_size=IMPORT_BATCH_SIZE):
+    """Import patients from a text stream, yielding a progress report per batch.
+
+    Rows for the same username within a batch are merged into one upsert.
+    The last yielded report has `done` set and holds the final totals.
+    """
+    now = datetime.utcnow()
+    imported_at = datetime.now()
+    report = {"processed": 0, "upserted": 0, "matched": 0, "detections_added": 0, "failed": 0,
+              "errors": [], "done": False}
+    batch = {}
+    occurrences = {}
+
+    for line, record, error in iter_records(stream, fmt):
+        report["processed"] += 1
+        if error:
+            _add_error(report, line, error)
+            continue
+        for d in record["diseases"]:
+            if d["detected_at"] is None:
+                # Undated rows are dated to this import and keyed by their content and
+                # position, so importing the same file again does not add them twice
+                d["detected_at"] = imported_at
+                if not d.get("client_id"):
+                    key = (record["username"], d["name"], (d.get("checked_by") or {}).get("asha_id"))
+                    occurrences[key] = occurrences.get(key, 0) + 1
+                    d["client_id"] = _undated_client_id(record["username"], d, occurrences[key])
+        merged = batch.get(record["username"])
+        if merged:
+            merged["diseases"].extend(record["diseases"])
+            merged["phone"] = record["phone"] or merged["phone"]
+            merged["village"] = record["village"] or merged["village"]
+        else:
+            batch[record["username"]] = record
+        if len(batch) >= batch_size:
+            _flush(batch, now, report)
+            batch = {}
+            yield dict(report)
+
+    _flush(batch, now, report)
+    report["done"] = True
+    yield report
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def export_patients(fmt="ndjson", village=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield patients as NDJSON lines or CSV rows, paging through a cursor."""
+    query = {"village": village} if village else {}
+    cursor = users.find(query, {"_id": 0}).batch_size(batch_size)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_FIELDS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        for patient in cursor:
+            base = [patient.get("username"), patient.get("phone"), patient.get("village")]
+            rows = [
+                base + [
+                    d.get("name"),
+                    _json_default(d["detected_at"]) if d.get("detected_at") else "",
+                    (d.get("checked_by") or {}).get("asha_id"),
+                    d.get("category")
+                ]
+                for d in patient.get("diseases", []) if isinstance(d, dict)
+            ] or [base + ["", "", "", ""]]
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        return
+
+    for patient in cursor:
+        yield json.dumps(patient, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of patients")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Import patients from CSV/NDJSON")
+    imp.add_argument("path", help="Input file ('-' for stdin)")
+    imp.add_argument("--format", choices=FORMATS)
+    imp.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    exp = sub.add_parser("export", help="Export patients to CSV/NDJSON")
+    exp.add_argument("path", help="Output file ('-' for stdout)")
+    exp.add_argument("--format", choices=FORMATS)
+    exp.add_argument("--village")
+
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+
+    if args.command == "import":
+        stream = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8", newline="")
+        with stream:
+            for report in import_patients(stream, fmt, args.batch_size):
+                print(f"[info] processed={report['processed']} upserted={report['upserted']} "
+                      f"matched={report['matched']} detections_added={report['detections_added']} "
+                      f"failed={report['failed']}", file=sys.stderr)
+        for err in report["errors"]:
+            print(f"[warn] line {err['line']}: {err['message']}", file=sys.stderr)
+        return 1 if report["failed"] else 0
+
+    out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+    count = -1 if fmt == "csv" else 0  # first CSV chunk is the header
+    with out:
+        for chunk in export_patients(fmt, args.village):
+            out.write(chunk)
+            count += 1
+    print(f"[info] exported {count} patients", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""Canonical disease registry and name matcher.
+
+Detections arrive as free text: whatever Gemini answered ("Tinea Corporis
+(Ringworm)", "Possible conjunctivitis") or strings such as
+"Fungal Infection (83% confidence)" from the dashboard. Every condition the
+app knows has a small, stable integer ID; `match_condition` maps a raw name to
+one at write time, so statistics and indexes work on `diseases.condition_id`
+instead of re-cleaning strings on every read. ID 0 means "not recognised";
+such records keep only their raw `name`.
+
+Matching runs in stages, cheapest first:
+  1. exact lookup of the normalized name (lowercased, confidence and
+     filler words stripped) in the alias table
+  2. token overlap against the aliases sharing at least one token, where a
+     token of six or more letters also matches a registry token within a
+     small edit distance (a symmetric-delete index finds those without
+     scanning the vocabulary). Negated clauses ("not melanoma", "no signs of
+     scabies") are dropped first. The score is the share of the name's words
+     an alias covers, with typo matches counting for less than exact ones,
+     so one loosely matching word in a longer phrase is not enough.
+With a photo category ("skin", "eye", "oral"), only that category's
+conditions can match. Results are memoized, since the same few dozen strings
+repeat constantly.
+
+IDs are part of the stored data: never renumber or reuse them; append new
+conditions with new IDs.
+
+    python disease_registry.py backfill              # add condition_id to older records
+    python disease_registry.py backfill --rematch    # recompute all after matcher changes
+"""
+import argparse
+import functools
+import re
+
+from disease_info import DISEASE_INFO
+
+UNKNOWN_ID = 0
+# Share of the name's words an alias must cover
+MATCH_THRESHOLD = 0.5
+# A token matched through a typo counts for this much of an exact match
+FUZZY_WEIGHT = 0.75
+
+# (id, canonical name, category, aliases)
+CONDITIONS = [
+    # Skin classes with curated entries in disease_info.DISEASE_INFO
+    (1, "Actinic keratosis", "skin", ("solar keratosis",)),
+    (2, "Basal cell carcinoma", "skin", ("bcc", "rodent ulcer")),
+    (3, "Dermatofibroma", "skin", ()),
+    (4, "Melanocytic nevus", "skin", ("mole", "nevus", "naevus", "nevi", "naevi")),
+    (5, "Pigmented benign keratosis", "skin", ("benign keratosis",)),
+    (6, "Seborrheic keratosis", "skin", ("seborrhoeic keratosis", "seb k")),
+    (7, "Squamous cell carcinoma", "skin", ("scc",)),
+    (8, "Vascular lesion", "skin", ("hemangioma", "angioma")),
+    (9, "Melanoma", "skin", ("malignant melanoma",)),
+    # Common field skin conditions
+    (20, "Fungal infection", "skin", ("tinea", "tinea corporis", "ringworm", "dermatophytosis", "tinea cruris")),
+    (21, "Scabies", "skin", ("sarcoptes scabiei",)),
+    (22, "Eczema", "skin", ("atopic dermatitis", "dermatitis", "contact dermatitis")),
+    (23, "Bacterial infection", "skin", ("impetigo", "cellulitis", "pyoderma", "boil", "furuncle")),
+    (24, "Viral rash", "skin", ("viral exanthem", "measles", "chickenpox", "varicella")),
+    (25, "Allergic reaction", "skin", ("urticaria", "hives", "allergic rash")),
+    (26, "Psoriasis", "skin", ("plaque psoriasis",)),
+    (27, "Acne", "skin", ("acne vulgaris", "pimples")),
+    (28, "Vitiligo", "skin", ("leukoderma",)),
+    (29, "Leprosy", "skin", ("hansen disease", "hansens disease")),
+    (30, "Normal skin", "skin", ("healthy skin", "no disease", "normal")),
+    # Eye
+    (40, "Conjunctivitis", "eye", ("pink eye", "red eye", "viral conjunctivitis", "bacterial conjunctivitis",
+                                   "allergic conjunctivitis")),
+    (41, "Stye", "eye", ("hordeolum",)),
+    (42, "Chalazion", "eye", ()),
+    (43, "Pterygium", "eye", ()),
+    (44, "Keratitis", "eye", ("corneal ulcer",)),
+    (45, "Cataract", "eye", ()),
+    (46, "Blepharitis", "eye", ()),
+    (47, "Trachoma", "eye", ()),
+    (48, "Subconjunctival hemorrhage", "eye", ("subconjunctival haemorrhage",)),
+    (49, "Normal eye", "eye", ("healthy eye",)),
+    # Oral
+    (60, "Oral ulcer", "oral", ("aphthous ulcer", "mouth ulcer", "canker sore", "aphthous stomatitis")),
+    (61, "Oral candidiasis", "oral", ("thrush", "oral thrush", "candidiasis")),
+    (62, "Leukoplakia", "oral", ("oral leukoplakia",)),
+    (63, "Gingivitis", "oral", ("gum inflammation",)),
+    (64, "Periodontitis", "oral", ("periodontal disease", "gum disease")),
+    (65, "Dental caries", "oral", ("tooth decay", "cavity", "caries")),
+    (66, "Oral submucous fibrosis", "oral", ("osmf",)),
+    (67, "Oral cancer", "oral", ("oral squamous cell carcinoma", "mouth cancer")),
+    (68, "Normal oral cavity", "oral", ("healthy mouth",)),
+]
+
+_FILLER = {
+    "possible", "probable", "likely", "suspected", "suggestive", "early", "mild", "moderate",
+    "severe", "acute", "chronic", "of", "the", "a", "an", "with", "and", "or", "condition", "stage",
+    # Where on the body: says nothing about which condition it is
+    "on", "in", "at", "over", "near", "left", "right", "both", "area", "region",
+    "arm", "arms", "leg", "legs", "hand", "hands", "foot", "feet", "face", "neck", "chest", "back",
+    "scalp", "trunk", "body",
+}
+# A negation cue drops the rest of its clause ("not melanoma", "ruled out scabies")
+_NEGATIONS = {"no", "not", "non", "without", "negative", "absence", "absent", "excluded", "ruled"}
+_CLAUSE = re.compile(r"[,;.:/()]|\bbut\b")
+_CONFIDENCE = re.compile(r"\(?\s*\d+(\.\d+)?\s*%\s*(confidence)?\s*\)?", re.IGNORECASE)
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _register_knowledge_base():
+    """Give any DISEASE_INFO entry missing from CONDITIONS an ID of its own."""
+    known = {name.lower() for _, name, _, _ in CONDITIONS}
+    next_id = max(cid for cid, _, _, _ in CONDITIONS) + 1
+    for name in DISEASE_INFO:
+        if name.lower() not in known:
+            print(f"[warn] '{name}' is in DISEASE_INFO but not in the disease registry; assigning id {next_id}")
+            CONDITIONS.append((next_id, name, "skin", ()))
+            next_id += 1
+
+
+_register_knowledge_base()
+
+CONDITION_NAMES = {cid: name for cid, name, _, _ in CONDITIONS}
+CONDITION_NAMES[UNKNOWN_ID] = "Unknown"
+CONDITION_CATEGORIES = {cid: category for cid, _, category, _ in CONDITIONS}
+CATEGORIES = set(CONDITION_CATEGORIES.values())
+
+
+def normalize(raw):
+    """Lowercase, drop confidence annotations, punctuation and filler words."""
+    text = _CONFIDENCE.sub(" ", str(raw or "").lower())
+    return " ".join(t for t in _NON_WORD.split(text) if t and t not in _FILLER)
+
+
+def affirmed(raw):
+    """The raw name without negated clauses."""
+    kept = []
+    for clause in _CLAUSE.split(_CONFIDENCE.sub(" ", str(raw or "").lower())):
+        for word in _NON_WORD.split(clause):
+            if word in _NEGATIONS:
+                break
+            kept.append(word)
+    return " ".join(kept)
+
+
+def _deletes(token, distance):
+    """All strings reachable from `token` by deleting up to `distance` characters."""
+    result = {token}
+    frontier = {token}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def _max_typos(token):
+    # Short words are too close to each other ("mode"/"mole", "soil"/"boil")
+    if len(token) >= 10:
+        return 2
+    return 1 if len(token) >= 6 else 0
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is certainly above `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _Index:
+    def __init__(self, conditions):
+        self.exact = {}         # normalized alias -> [ids]
+        self.aliases = []       # (id, frozenset of tokens)
+        self.by_token = {}      # token -> [alias index]
+        self.deletes = {}       # deleted form -> {vocabulary token}
+        for cid, name, _, aliases in conditions:
+            for alias in (name,) + tuple(aliases):
+                key = normalize(alias)
+                if not key:
+                    continue
+                if cid not in self.exact.setdefault(key, []):
+                    self.exact[key].append(cid)
+                tokens = frozenset(key.split())
+                for token in tokens:
+                    self.by_token.setdefault(token, []).append(len(self.aliases))
+                self.aliases.append((cid, tokens))
+        for token in self.by_token:
+            for form in _deletes(token, _max_typos(token)):
+                self.deletes.setdefault(form, set()).add(token)
+
+    def similar_tokens(self, token):
+        """Vocabulary tokens within the allowed edit distance of `token`."""
+        if token in self.by_token:
+            return {token}
+        limit = _max_typos(token)
+        if not limit:
+            return set()
+        candidates = set()
+        for form in _deletes(token, limit):
+            candidates |= self.deletes.get(form, set())
+        return {c for c in candidates if _edit_distance(token, c, limit) <= limit}
+
+    def match(self, key, affirmed_key, category=None):
+        def allowed(cid):
+            return category is None or CONDITION_CATEGORIES.get(cid) == category
+
+        for cid in self.exact.get(key, ()):
+            if allowed(cid):
+                return cid, 1.0
+
+        tokens = affirmed_key.split()
+        mapped = {}             # vocabulary token -> (input token, exact?)
+        for token in tokens:
+            for similar in self.similar_tokens(token):
+                if similar not in mapped or (similar == token and not mapped[similar][1]):
+                    mapped[similar] = (token, similar == token)
+
+        best, best_rank = UNKNOWN_ID, (0.0, 0)
+        seen = set()
+        for vocab_token in mapped:
+            for alias_index in self.by_token[vocab_token]:
+                if alias_index in seen:
+                    continue
+                seen.add(alias_index)
+                cid, alias_tokens = self.aliases[alias_index]
+                # Every alias token must be present; extra words in the raw
+                # name lower the score
+                if not allowed(cid) or not all(t in mapped for t in alias_tokens):
+                    continue
+                exact = sum(1 for t in alias_tokens if mapped[t][1])
+                covered = exact + FUZZY_WEIGHT * (len(alias_tokens) - exact)
+                score = round(min(1.0, covered / len(tokens)), 3)
+                # Ties go to the alias matched with fewer typos
+                if (score, exact) > best_rank:
+                    best, best_rank = cid, (score, exact)
+        if best_rank[0] < MATCH_THRESHOLD:
+            return UNKNOWN_ID, best_rank[0]
+        return best, best_rank[0]
+
+
+_index = _Index(CONDITIONS)
+
+
+@functools.lru_cache(maxsize=4096)
+def _match_normalized(key, affirmed_key, category):
+    return _index.match(key, affirmed_key, category)
+
+
+def match_condition(raw_name, category=None):
+    """Map a raw disease name to `(condition_id, score)`; `(0, score)` if unknown.
+
+    `category` is the photo category; "other" (or None) allows every condition.
+    """
+    key = normalize(raw_name)
+    if not key:
+        return UNKNOWN_ID, 0.0
+    if category not in CATEGORIES:
+        category = None
+    return _match_normalized(key, normalize(affirmed(raw_name)), category)
+
+
+def condition_id(raw_name, category=None):
+    return match_condition(raw_name, category)[0]
+
+
+def condition_name(cid):
+    return CONDITION_NAMES.get(cid, CONDITION_NAMES[UNKNOWN_ID])
+
+
+def display_name(detection):
+    """Canonical name of a stored detection, or its cleaned raw name if unrecognised."""
+    cid = detection.get("condition_id")
+    if cid is None:
+        cid = condition_id(detection.get("name"))
+    if cid != UNKNOWN_ID:
+        return condition_name(cid)
+    return _CONFIDENCE.sub(" ", str(detection.get("name") or "")).strip()
+
+
+def backfill(collection, batch_size=500, rematch=False):
+    """Add `condition_id` to detections stored before the registry existed.
+
+    With `rematch`, every stored detection is matched again (after matcher
+    changes); only patients whose IDs change are rewritten.
+    """
+    from pymongo import UpdateOne
+
+    pending, updated = [], 0
+    query = {} if rematch else {"diseases": {"$elemMatch": {"condition_id": {"$exists": False}}}}
+    cursor = collection.find(query, {"diseases": 1})
+    for patient in cursor:
+        # New IDs per (name, category); entries are updated in place with
+        # arrayFilters, so detections pushed after this read are left alone
+        changes = {}
+        for d in patient.get("diseases", []):
+            if isinstance(d, dict) and (rematch or "condition_id" not in d):
+                cid = condition_id(d.get("name"), d.get("category"))
+                if d.get("condition_id") != cid:
+                    changes[(d.get("name"), d.get("category"))] = cid
+        if not changes:
+            continue
+        update, array_filters = {}, []
+        for i, ((name, category), cid) in enumerate(changes.items()):
+            update[f"diseases.$[d{i}].condition_id"] = cid
+            entry = {f"d{i}.name": name, f"d{i}.category": category}
+            if not rematch:
+                entry[f"d{i}.condition_id"] = {"$exists": False}
+            array_filters.append(entry)
+        pending.append(UpdateOne({"_id": patient["_id"]}, {"$set": update}, array_filters=array_filters))
+        if len(pending) >= batch_size:
+            updated += collection.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += collection.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canonical disease registry tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = sub.add_parser("backfill", help="Add condition_id to existing detections")
+    backfill_parser.add_argument("--rematch", action="store_true", help="Recompute every stored condition_id")
+    match_parser = sub.add_parser("match", help="Show the canonical match for raw names")
+    match_parser.add_argument("names", nargs="+")
+    match_parser.add_argument("--category", help="Photo category (skin, eye, oral)")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        from disease_schema import users
+        print(f"[info] Updated {backfill(users, rematch=args.rematch)} patients")
+    else:
+        for name in args.names:
+            cid, score = match_condition(name, args.category)
+            print(f"{name!r} -> {cid} {condition_name(cid)} ({score:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,48 @@
 from pymongo import MongoClient
 from datetime import datetime
+import os
+from metrics import timed
+from disease_registry import condition_id
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.10
+    AsyncMongoClient = None
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB = os.environ.get("MONGO_DB", "hospital_db")
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 users = db["users"]
 diseases = db["diseases"]
 
-# Function to log disease detection
-def add_disease(username, disease_name, asha_worker_info=None):
+# Async client for the ASGI serving mode (see asgi.py). Created lazily because
+# it binds to the running event loop on first use.
+_async_users = None
+
+
+def get_async_users():
+    global _async_users
+    if _async_users is None:
+        if AsyncMongoClient is None:
+            raise RuntimeError("Async MongoDB driver not available (requires pymongo>=4.10)")
+        _async_users = AsyncMongoClient(MONGO_URI)[MONGO_DB]["users"]
+    return _async_users
+
+def build_disease_record(disease_name, asha_worker_info=None, detected_at=None, category=None):
+    """Build the disease entry stored in a patient's `diseases` array.
+
+    `category` is the photo category, which limits the registry match.
+    """
     disease_record = {
         "name": disease_name,
-        "detected_at": datetime.now()
+        # Canonical registry ID (0 = unrecognised), used for aggregation
+        "condition_id": condition_id(disease_name, category),
+        "detected_at": detected_at or datetime.now()
     }
-    
-
+    if category:
+        disease_record["category"] = category
 
     # Add ASHA worker information if provided
     if asha_worker_info:
@@ -22,12 +51,39 @@ def add_disease(username, disease_name, asha_worker_info=None):
             "asha_id": asha_worker_info.get("ashaId") or asha_worker_info.get("asha_id"),
             "mobile": asha_worker_info.get("mobile")
         }
+    return disease_record
+
+
+# Function to log disease detection
+@timed("db.add_disease")
+def add_disease(username, disease_name, asha_worker_info=None, category=None):
+    disease_record = build_disease_record(disease_name, asha_worker_info, category=category)
+
+    update = {"$addToSet": {"diseases": disease_record}, "$set": {"updated_at": datetime.utcnow()}}
+    result = users.update_one({"username": username}, update)
+    if result.matched_count == 0:
+        # The patient may have been merged into another record (patient_linkage.py)
+        survivor = users.find_one({"aliases": username}, {"_id": 1})
+        if survivor is not None:
+            result = users.update_one({"_id": survivor["_id"]}, update)
+
+    if result.modified_count > 0:
+        return {"success": True, "message": f"Added disease '{disease_name}' for {username}"}
+    else:
+        return {"success": False, "message": "User not found"}
+
 
+async def add_disease_async(username, disease_name, asha_worker_info=None, category=None):
+    """Async variant of add_disease using the async MongoDB driver."""
+    disease_record = build_disease_record(disease_name, asha_worker_info, category=category)
 
-    result = users.update_one(
-        {"username": username},
-        {"$addToSet": {"diseases": disease_record}}
-    )
+    collection = get_async_users()
+    update = {"$addToSet": {"diseases": disease_record}, "$set": {"updated_at": datetime.utcnow()}}
+    result = await collection.update_one({"username": username}, update)
+    if result.matched_count == 0:
+        survivor = await collection.find_one({"aliases": username}, {"_id": 1})
+        if survivor is not None:
+            result = await collection.update_one({"_id": survivor["_id"]}, update)
 
     if result.modified_count > 0:
         return {"success": True, "message": f"Added disease '{disease_name}' for {username}"}
@@ -0,0 +1,178 @@
+"""`Idempotency-Key` support for `/predict` and the write routes.
+
+A client that times out and retries sends the same `Idempotency-Key` header
+with the retry. For a given (route, key):
+
+  - the first request runs normally and its response is kept for
+    IDEMPOTENCY_TTL seconds. Only 2xx/3xx responses are kept: 4xx
+    rejections (e.g. a 422 from the photo quality gate) and 5xx errors can
+    be retried with the same key, whether the request changed in between
+    (a retake, `quality_override`) or not;
+  - a retry after completion gets the stored response back with
+    `Idempotent-Replayed: true`, without running the handler again;
+  - a duplicate that arrives while the first is still running waits for it
+    (single flight), so only one model call or write happens and every
+    waiter receives the same result;
+  - reusing a key with a different request body is answered with 422.
+
+Requests without the header are not affected. The store is in-process,
+which matches the single-process deployments (threaded Flask server, or
+uvicorn with one worker); asgi.py applies the same store to its async
+`/predict`.
+"""
+import functools
+import hashlib
+import os
+import threading
+
+import metrics
+from cache import TTLCache
+
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000"))
+# How long a duplicate waits for the original before giving up with 409
+IDEMPOTENCY_WAIT = float(os.environ.get("IDEMPOTENCY_WAIT", "120"))
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_REQUESTS = metrics.register(metrics.Counter(
+    "appayu_idempotency_requests_total", "Requests carrying an Idempotency-Key by outcome",
+    ("endpoint", "outcome")
+))
+
+
+class Flight:
+    """One in-progress request; duplicates wait on `done`."""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyStore:
+    def __init__(self, ttl=IDEMPOTENCY_TTL, maxsize=IDEMPOTENCY_MAX_KEYS):
+        # key -> (fingerprint, (status, body, mimetype))
+        self.completed = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.in_flight = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint):
+        """Claim `key`.
+
+        Returns one of ("lead", flight), ("wait", flight), ("replay", response)
+        or ("mismatch", None).
+        """
+        with self._lock:
+            stored = self.completed.get(key)
+            if stored is not None:
+                if stored[0] != fingerprint:
+                    return "mismatch", None
+                return "replay", stored[1]
+            flight = self.in_flight.get(key)
+            if flight is not None:
+                if flight.fingerprint != fingerprint:
+                    return "mismatch", None
+                return "wait", flight
+            flight = self.in_flight[key] = Flight(fingerprint)
+            return "lead", flight
+
+    def finish(self, key, flight, response):
+        """Publish the leader's response to waiters and keep it if it succeeded."""
+        with self._lock:
+            flight.response = response
+            if response is not None and response[0] < 400:
+                self.completed.set(key, (flight.fingerprint, response))
+            self.in_flight.pop(key, None)
+        flight.done.set()
+
+
+store = IdempotencyStore()
+
+
+def form_fingerprint(method, path, fields, files):
+    """Hash a form: `fields` are (name, value) pairs, `files` (name, filename, chunks).
+
+    Shared by the Flask decorator and the ASGI `/predict`, so both modes
+    agree on what counts as the same request.
+    """
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    for name, value in sorted(fields):
+        digest.update(f"{name}={value}\n".encode())
+    for name, filename, chunks in sorted(files, key=lambda item: item[0]):
+        digest.update(f"{name}:{filename}:".encode())
+        for chunk in chunks:
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def request_fingerprint(request):
+    """Hash what identifies a request's content.
+
+    Multipart bodies differ between retries (random boundary), so forms are
+    hashed field by field, with uploaded files hashed by content.
+    """
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        files = [(name, file.filename, iter(lambda f=file: f.stream.read(65536), b""))
+                 for name, file in request.files.items(multi=True)]
+        fingerprint = form_fingerprint(request.method, request.path, request.form.items(multi=True), files)
+        for _, file in request.files.items(multi=True):
+            file.stream.seek(0)
+        return fingerprint
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _error(status, message, retry_after=None):
+    from flask import jsonify
+    response = jsonify({"error": message})
+    response.status_code = status
+    if retry_after:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _replay(stored, outcome, endpoint):
+    from flask import current_app
+    status, body, mimetype = stored
+    IDEMPOTENCY_REQUESTS.inc(endpoint, outcome)
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """Decorate a Flask view to honour the `Idempotency-Key` header."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import request, make_response
+
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+        endpoint = request.endpoint
+        outcome, value = store.begin((endpoint, key), request_fingerprint(request))
+
+        if outcome == "mismatch":
+            IDEMPOTENCY_REQUESTS.inc(endpoint, "mismatch")
+            return _error(422, "Idempotency-Key was already used with a different request")
+        if outcome == "replay":
+            return _replay(value, "replayed", endpoint)
+        if outcome == "wait":
+            if not value.done.wait(IDEMPOTENCY_WAIT) or value.response is None:
+                IDEMPOTENCY_REQUESTS.inc(endpoint, "in_progress")
+                return _error(409, "A request with this Idempotency-Key is still in progress", retry_after=5)
+            return _replay(value.response, "coalesced", endpoint)
+
+        flight, stored = value, None
+        try:
+            response = make_response(view(*args, **kwargs))
+            stored = (response.status_code, response.get_data(), response.mimetype)
+            IDEMPOTENCY_REQUESTS.inc(endpoint, "executed")
+            return response
+        finally:
+            store.finish((endpoint, key), flight, stored)
+    return wrapper
@@ -0,0 +1,234 @@
+"""Fast local photo quality gate, run before an image is sent to Gemini.
+
+Blurred, dark or far-away field photos only produce low-confidence answers
+after a multi-second model call. `assess_image` decodes a downscaled grayscale
+copy and checks, with a few vectorized NumPy passes:
+
+  - sharpness: variance of the 4-neighbour Laplacian over the central region,
+    where the affected area is normally framed
+  - exposure: mean brightness and the share of crushed/clipped pixels from
+    the 256-bin histogram
+  - resolution: size of that central region in the original photo
+
+Each check has a warn and a reject threshold per category (eye and oral
+photos are taken closer and in darker conditions than skin photos). Override
+them with IMAGE_QUALITY_THRESHOLDS, a JSON object such as
+`{"skin": {"min_sharpness": 30}}`. IMAGE_QUALITY_MODE is `enforce` (default),
+`warn` (never reject) or `off`.
+"""
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+# Longest side of the grayscale copy the checks run on
+ANALYSIS_SIZE = 512
+# Central share of each dimension treated as the lesion region
+REGION_FRACTION = 0.6
+DARK_LEVEL = 16
+BRIGHT_LEVEL = 240
+
+DEFAULT_THRESHOLDS = {
+    "default": {
+        "min_region_px": 180, "warn_region_px": 320,
+        "min_sharpness": 15.0, "warn_sharpness": 50.0,
+        "min_brightness": 40, "max_brightness": 225,
+        "max_clipped": 0.45, "warn_clipped": 0.2,
+    },
+    "eye": {
+        "min_region_px": 240, "warn_region_px": 400,
+        "min_sharpness": 25.0, "warn_sharpness": 70.0,
+    },
+    "oral": {
+        # Mouth interiors are dark even in good light
+        "min_brightness": 28, "max_clipped": 0.55, "warn_clipped": 0.3,
+    },
+}
+
+GUIDANCE = {
+    "resolution": "The affected area is too small in the photo. Move closer (about 10-15 cm) or use a higher camera resolution and retake.",
+    "blur": "The photo is blurred. Hold the phone steady with both hands, tap the affected area to focus, and retake.",
+    "dark": "The photo is too dark. Move to daylight or turn on the flash and retake.",
+    "bright": "The photo is overexposed. Avoid direct sunlight or flash glare on the area and retake.",
+    "contrast": "Large parts of the photo are completely black or white. Change the angle or lighting and retake.",
+}
+
+QUALITY_MODE = os.environ.get("IMAGE_QUALITY_MODE", "enforce")
+
+# Category label values on /metrics; anything else a client posts counts as "other"
+METRIC_CATEGORIES = ("skin", "eye", "oral", "other")
+
+QUALITY_CHECKS = metrics.register(metrics.Counter(
+    "appayu_image_quality_checks_total", "Photos checked by the local quality gate by outcome",
+    ("category", "action")
+))
+QUALITY_ISSUES = metrics.register(metrics.Counter(
+    "appayu_image_quality_issues_total", "Quality problems found by check and severity",
+    ("category", "check", "severity")
+))
+MODEL_CALLS_SAVED = metrics.register(metrics.Counter(
+    "appayu_model_calls_saved_total", "Gemini calls skipped because a request was answered locally",
+    ("reason",)
+))
+
+
+def _load_thresholds():
+    thresholds = {name: dict(values) for name, values in DEFAULT_THRESHOLDS.items()}
+    raw = os.environ.get("IMAGE_QUALITY_THRESHOLDS")
+    if raw:
+        try:
+            for name, values in json.loads(raw).items():
+                thresholds.setdefault(name, {}).update(values)
+        except (ValueError, AttributeError) as e:
+            print(f"[warn] Ignoring invalid IMAGE_QUALITY_THRESHOLDS: {e}")
+    return thresholds
+
+
+THRESHOLDS = _load_thresholds()
+
+
+def thresholds_for(category):
+    merged = dict(THRESHOLDS["default"])
+    merged.update(THRESHOLDS.get(category, {}))
+    return merged
+
+
+def _metric_category(category):
+    return category if category in METRIC_CATEGORIES else "other"
+
+
+def _grayscale(source):
+    """Open `source` (path or file object) as a small grayscale array.
+
+    Returns the array and the original (width, height). For JPEGs, `draft`
+    lets the decoder scale by 1/2..1/8 so large photos are never fully decoded.
+    """
+    image = Image.open(source)
+    original_size = image.size
+    image.draft("L", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+    image = image.convert("L")
+    image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    return np.asarray(image, dtype=np.float32), original_size
+
+
+def _central_region(gray):
+    h, w = gray.shape
+    dh, dw = int(h * (1 - REGION_FRACTION) / 2), int(w * (1 - REGION_FRACTION) / 2)
+    return gray[dh:h - dh, dw:w - dw]
+
+
+def measure(gray, original_size):
+    """Compute the raw quality measurements for a grayscale array."""
+    region = _central_region(gray)
+    laplacian = (
+        region[:-2, 1:-1] + region[2:, 1:-1] + region[1:-1, :-2] + region[1:-1, 2:]
+        - 4 * region[1:-1, 1:-1]
+    )
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    total = histogram.sum() or 1
+    return {
+        "region_px": int(min(original_size) * REGION_FRACTION),
+        "sharpness": float(laplacian.var()) if laplacian.size else 0.0,
+        "brightness": float(np.dot(histogram, np.arange(256)) / total),
+        "clipped": float((histogram[:DARK_LEVEL].sum() + histogram[BRIGHT_LEVEL:].sum()) / total),
+    }
+
+
+def evaluate(values, limits):
+    """Return the list of issues for a set of measurements and thresholds."""
+    issues = []
+
+    def add(check, severity, value, threshold):
+        issues.append({
+            "check": check, "severity": severity,
+            "value": round(value, 2), "threshold": threshold,
+            "guidance": GUIDANCE[check]
+        })
+
+    if values["region_px"] < limits["min_region_px"]:
+        add("resolution", "reject", values["region_px"], limits["min_region_px"])
+    elif values["region_px"] < limits["warn_region_px"]:
+        add("resolution", "warn", values["region_px"], limits["warn_region_px"])
+
+    if values["sharpness"] < limits["min_sharpness"]:
+        add("blur", "reject", values["sharpness"], limits["min_sharpness"])
+    elif values["sharpness"] < limits["warn_sharpness"]:
+        add("blur", "warn", values["sharpness"], limits["warn_sharpness"])
+
+    if values["brightness"] < limits["min_brightness"]:
+        add("dark", "reject", values["brightness"], limits["min_brightness"])
+    elif values["brightness"] > limits["max_brightness"]:
+        add("bright", "reject", values["brightness"], limits["max_brightness"])
+
+    if values["clipped"] > limits["max_clipped"]:
+        add("contrast", "reject", values["clipped"], limits["max_clipped"])
+    elif values["clipped"] > limits["warn_clipped"]:
+        add("contrast", "warn", values["clipped"], limits["warn_clipped"])
+    return issues
+
+
+def assess_image(source, category="skin", allow_reject=True):
+    """Check a photo and decide whether it is worth a model call.
+
+    Returns a dict with `action` ("pass", "warn" or "reject"), the `issues`
+    found (each with retake `guidance`), the raw `measurements` and the time
+    the check took. With `allow_reject=False` (or IMAGE_QUALITY_MODE=warn)
+    rejections are reported as warnings.
+    """
+    start = time.perf_counter()
+    with metrics.stage("image.quality"):
+        gray, original_size = _grayscale(source)
+        values = measure(gray, original_size)
+        issues = evaluate(values, thresholds_for(category))
+
+    if any(i["severity"] == "reject" for i in issues):
+        action = "reject" if allow_reject and QUALITY_MODE == "enforce" else "warn"
+    else:
+        action = "warn" if issues else "pass"
+
+    label = _metric_category(category)
+    QUALITY_CHECKS.inc(label, action)
+    for issue in issues:
+        QUALITY_ISSUES.inc(label, issue["check"], issue["severity"])
+
+    return {
+        "action": action,
+        "issues": issues,
+        "measurements": {k: round(v, 2) for k, v in values.items()},
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def combine_reports(reports):
+    """Merge the per-photo reports of one request.
+
+    The request is rejected only when every photo is; otherwise the rejected
+    photos are dropped and their issues are returned as warnings (tagged with
+    the photo's `view` index when there are several).
+    """
+    if len(reports) == 1:
+        combined = dict(reports[0])
+    else:
+        actions = [r["action"] for r in reports]
+        issues = [dict(issue, view=i) for i, r in enumerate(reports) for issue in r["issues"]]
+        if all(a == "reject" for a in actions):
+            action = "reject"
+        else:
+            action = "warn" if issues else "pass"
+        combined = {
+            "action": action,
+            "issues": issues,
+            "views": actions,
+            "elapsed_ms": round(sum(r["elapsed_ms"] for r in reports), 1),
+        }
+    if combined["action"] == "reject":
+        MODEL_CALLS_SAVED.inc("quality")
+    return combined
+
+
+def quality_enabled():
+    return QUALITY_MODE != "off"
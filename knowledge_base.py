@@ -0,0 +1,107 @@
+"""Knowledge-base enrichment of Gemini analyses.
+
+`disease_info.DISEASE_INFO` holds curated descriptions, treatments and
+severity for the skin classes. In knowledge-base mode the prompt lists those
+conditions and tells the model to answer with only the label, confidence and
+visual characteristics when it recognises one of them; `enrich` then fills in
+description, severity and medicines locally. For anything else the model
+still writes the full answer, so unknown conditions lose nothing.
+
+Output tokens and generation time are recorded per mode and per source of the
+text, so the savings show up on /metrics:
+
+    appayu_gemini_output_tokens{mode="kb",source="knowledge_base"}
+    appayu_gemini_output_tokens{mode="full",source="model"}
+
+GEMINI_KB_MODE=0 turns the mode off (full answers from the model).
+"""
+import os
+
+import metrics
+from disease_info import DISEASE_INFO
+from disease_registry import match_condition, condition_name, UNKNOWN_ID
+
+KB_MODE = os.environ.get("GEMINI_KB_MODE", "1") != "0"
+# Categories whose conditions DISEASE_INFO covers
+KB_CATEGORIES = ("skin",)
+
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 384, 512, 768, 1024, 1536, 2048)
+
+OUTPUT_TOKENS = metrics.register(metrics.Histogram(
+    "appayu_gemini_output_tokens", "Gemini output tokens per analysis", ("mode", "source"),
+    buckets=TOKEN_BUCKETS
+))
+GENERATE_SECONDS = metrics.register(metrics.Histogram(
+    "appayu_gemini_generate_seconds", "Gemini generation time per analysis", ("mode", "source")
+))
+
+# DISEASE_INFO rates severity in free text ("High - requires medical attention");
+# results use the same Mild/Moderate/Severe scale as the model's answers
+# (structured_output.SEVERITIES), with the rest of the text in the description
+SEVERITY_LEVELS = {"low": "Mild", "moderate": "Moderate", "varies": "Moderate", "high": "Severe"}
+
+# Registry ID -> DISEASE_INFO entry, so label variants still hit
+_ENTRIES = {match_condition(name)[0]: entry for name, entry in DISEASE_INFO.items()}
+
+
+def kb_enabled(category):
+    return KB_MODE and category in KB_CATEGORIES
+
+
+def prompt_suffix(category):
+    """Instructions appended to the analysis prompt in knowledge-base mode."""
+    if not kb_enabled(category):
+        return ""
+    known = ", ".join(DISEASE_INFO)
+    return (
+        "\n\nKnown conditions: " + known + ".\n"
+        "If the condition is one of the known conditions, use its exact name and return ONLY "
+        "\"Disease name\", \"Confidence level\" and \"Visual characteristics\"; description, severity "
+        "and medicines are filled in from our own reference. Otherwise return all keys.\n"
+    )
+
+
+def lookup(disease_name, category=None):
+    """Return `(canonical_name, DISEASE_INFO entry)` for a label, or `(None, None)`."""
+    cid, _ = match_condition(disease_name, category)
+    entry = _ENTRIES.get(cid) if cid != UNKNOWN_ID else None
+    return (condition_name(cid), entry) if entry else (None, None)
+
+
+def severity_level(text):
+    """Split a DISEASE_INFO severity into (level, note), e.g. ("Severe", "requires medical attention")."""
+    head, _, note = str(text or "").partition(" - ")
+    return SEVERITY_LEVELS.get(head.strip().lower(), "Moderate"), note.strip()
+
+
+def enrich(result, category):
+    """Fill description, severity and medicines of a parsed result from DISEASE_INFO.
+
+    Sets `result["source"]` to "knowledge_base" on a hit and "model" otherwise.
+    """
+    if not kb_enabled(category) or not isinstance(result, dict) or "error" in result:
+        return result
+    name, entry = lookup(result.get("disease"), category)
+    if entry is None:
+        result["source"] = "model"
+        return result
+    result["disease"] = name
+    level, note = severity_level(entry["severity"])
+    result["description"] = entry["description"]
+    if note:
+        result["description"] += f" {note[0].upper()}{note[1:]}."
+    result["severity"] = level
+    result["medicines"] = [f"• {treatment}" for treatment in entry["treatments"]]
+    result["source"] = "knowledge_base"
+    return result
+
+
+def record_generation(response, category, result, seconds):
+    """Record output tokens and generation time for one analysis."""
+    mode = "kb" if kb_enabled(category) else "full"
+    source = result.get("source", "model") if isinstance(result, dict) else "model"
+    GENERATE_SECONDS.observe(seconds, mode, source)
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "candidates_token_count", None) if usage is not None else None
+    if tokens:
+        OUTPUT_TOKENS.observe(tokens, mode, source)
@@ -0,0 +1,208 @@
+"""Per-stage latency instrumentation.
+
+Wrap a step in `with stage("gemini.generate"):` (or decorate a function with
+`@timed("db.add_disease")`) to record its duration in a histogram exported
+on `/metrics` in Prometheus text format. Stages recorded while handling a
+request are also echoed back in a `Server-Timing` header, so a slow `/predict`
+can be broken down from the browser's network panel.
+
+Request scope is tracked with a ContextVar, which works both for the threaded
+Flask server and for asyncio tasks in the ASGI mode.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds in seconds; model calls routinely take several seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def _labels(self, labels, extra=None):
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{self._labels(labels, le)} {count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, inf)} {series['count']}")
+                lines.append(f"{self.name}_sum{self._labels(labels)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{self._labels(labels)} {series['count']}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+                lines.append(f"{self.name}{{{pairs}}} {value}" if pairs else f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+class Gauge(Counter):
+    """Point-in-time value; `set` replaces, `inc` adjusts."""
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        return super().render().replace(f"# TYPE {self.name} counter", f"# TYPE {self.name} gauge")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+STAGE_SECONDS = register(Histogram(
+    "appayu_stage_duration_seconds", "Duration of instrumented processing stages", ("stage",)
+))
+REQUEST_SECONDS = register(Histogram(
+    "appayu_request_duration_seconds", "HTTP request duration by endpoint", ("endpoint", "method", "status")
+))
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of `stage` for whole functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_request():
+    """Start collecting stages for the current request; returns a reset token."""
+    return _request_stages.set([])
+
+
+def end_request(token=None):
+    """Stop collecting and return the `Server-Timing` header value (or "")."""
+    stages = _request_stages.get() or []
+    try:
+        _request_stages.reset(token)
+    except (TypeError, ValueError):
+        # no token, or created in another context
+        _request_stages.set(None)
+
+    # Repeated stages (e.g. one per translation call) are summed
+    totals = {}
+    for name, seconds in stages:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, count + 1)
+    parts = []
+    for name, (total, count) in totals.items():
+        part = f"{name};dur={total * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def init_app(app):
+    """Hook request timing into a Flask app and expose `/metrics`."""
+    from flask import request, g
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_token = begin_request()
+
+    @app.after_request
+    def _finish_timer(response):
+        start = getattr(g, "_metrics_start", None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                request.endpoint or "unknown", request.method, str(response.status_code)
+            )
+        header = end_request(getattr(g, "_metrics_token", None))
+        if header:
+            response.headers["Server-Timing"] = header
+        return response
+
+    def metrics_endpoint():
+        return app.response_class(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
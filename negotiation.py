@@ -0,0 +1,125 @@
+"""Response content negotiation for API responses.
+
+An after-request hook that, for buffered API responses:
+
+  - re-encodes JSON bodies as MessagePack (``application/msgpack``, needs
+    the ``msgpack`` package) or CBOR (``application/cbor``, needs ``cbor2``)
+    when the client's ``Accept`` header prefers them over JSON;
+  - compresses bodies of at least COMPRESS_MIN_BYTES with brotli (when the
+    ``brotli`` package is installed) or gzip, following ``Accept-Encoding``.
+
+Browsers send ``Accept-Encoding: gzip, deflate, br`` on every fetch and
+decode transparently, so the web pages get compression for free and keep
+receiving JSON. The binary formats are for programmatic clients (sync tools,
+``bench/wire_bytes.py``). Streamed responses, files and responses that are
+already encoded (precompressed assets and page shells) are left alone.
+``negotiate_asgi`` does the same for the async ``/predict`` in asgi.py.
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+# Dynamic responses: favour speed over the last few percent of ratio
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/msgpack", "application/cbor",
+    "application/x-ndjson", "text/plain", "text/csv",
+}
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _binary_encoders():
+    encoders = {}
+    if msgpack is not None:
+        for mimetype in MSGPACK_TYPES:
+            encoders[mimetype] = lambda obj: msgpack.packb(obj, use_bin_type=True)
+    if cbor2 is not None:
+        encoders["application/cbor"] = cbor2.dumps
+    return encoders
+
+
+BINARY_ENCODERS = _binary_encoders()
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_format(accept_mimetypes):
+    """Pick the response mimetype for a JSON body; JSON wins ties."""
+    if not BINARY_ENCODERS:
+        return "application/json"
+    return accept_mimetypes.best_match(["application/json"] + list(BINARY_ENCODERS), default="application/json")
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def negotiate(response, request):
+    """Apply format conversion and compression to a Flask response in place."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers):
+        return response
+
+    if response.mimetype == "application/json":
+        response.vary.add("Accept")
+        target = negotiate_format(request.accept_mimetypes)
+        if target != "application/json":
+            payload = response.get_json(silent=True)
+            if payload is not None:
+                response.set_data(BINARY_ENCODERS[target](payload))
+                response.mimetype = target
+
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def negotiate_asgi(response, headers):
+    """`negotiate` for a buffered Starlette response; `headers` are the request's."""
+    from types import SimpleNamespace
+    from starlette.responses import Response as AsgiResponse
+    from werkzeug.datastructures import Accept, MIMEAccept
+    from werkzeug.http import parse_accept_header
+    from werkzeug.wrappers import Response
+
+    wrapped = Response(response.body, status=response.status_code, headers=list(response.headers.items()))
+    accepts = SimpleNamespace(
+        accept_mimetypes=parse_accept_header(headers.get("accept"), MIMEAccept),
+        accept_encodings=parse_accept_header(headers.get("accept-encoding"), Accept),
+    )
+    negotiate(wrapped, accepts)
+    return AsgiResponse(wrapped.get_data(), status_code=wrapped.status_code, headers=dict(wrapped.headers))
+
+
+def init_app(app):
+    from flask import request
+
+    @app.after_request
+    def _negotiate(response):
+        return negotiate(response, request)
@@ -0,0 +1,275 @@
+"""Incremental outbreak detection per (village, canonical disease).
+
+Every stored detection is fed to `observe_detections`. For each
+(village, condition_id) the detector keeps a ring buffer of daily counts
+covering the current window (WINDOW_DAYS, including today) and the baseline
+period before it (BASELINE_DAYS), plus running sums of the window count and
+of the baseline's daily counts and their squares. A detection, or a day
+rolling over, updates those in O(1), so nothing ever rescans the patients
+collection.
+
+A series is in alert when its window count reaches MIN_CASES and exceeds
+
+    expected + Z_THRESHOLD * sqrt(max(variance, expected))
+
+where `expected` is the baseline daily mean times WINDOW_DAYS and `variance`
+is the baseline daily variance scaled to the window (Poisson variance as a
+floor for sparse villages). Active alerts are served by `/outbreak_alerts`.
+
+With the first request served (or the first detection observed) the ring
+buffers are rebuilt from the last WINDOW_DAYS + BASELINE_DAYS of detections
+with one aggregation, in the background. The aggregation stops at the time
+the warm-up started; until it finishes, live detections older than that are
+skipped, since the aggregation counts them already.
+"""
+import math
+import os
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+
+import metrics
+from cache import TTLCache
+from disease_registry import UNKNOWN_ID, condition_name
+from user_schema import users
+
+WINDOW_DAYS = int(os.environ.get("OUTBREAK_WINDOW_DAYS", "7"))
+BASELINE_DAYS = int(os.environ.get("OUTBREAK_BASELINE_DAYS", "28"))
+MIN_CASES = int(os.environ.get("OUTBREAK_MIN_CASES", "3"))
+Z_THRESHOLD = float(os.environ.get("OUTBREAK_Z", "3.0"))
+SPAN_DAYS = WINDOW_DAYS + BASELINE_DAYS
+
+ACTIVE_ALERTS = metrics.register(metrics.Gauge(
+    "appayu_outbreak_alerts_active", "Village/disease series currently above their outbreak threshold"
+))
+ALERTS_RAISED = metrics.register(metrics.Counter(
+    "appayu_outbreak_alerts_total", "Outbreak alerts raised"
+))
+
+# username -> village; patients rarely move
+_villages = TTLCache(maxsize=50000, ttl=3600)
+
+# Warm-up state: the aggregation counts detections before `_warm_cutoff`
+_warm_lock = threading.Lock()
+_warm_cutoff = None
+_warm_done = threading.Event()
+
+
+def _day(when):
+    """Calendar day number of a detection time (stored as naive local time)."""
+    return when.toordinal()
+
+
+class Series:
+    """Daily counts of one (village, condition) over the window and baseline."""
+
+    __slots__ = ("ring", "head", "window", "base_sum", "base_sq")
+
+    def __init__(self, day):
+        self.ring = array("I", [0] * SPAN_DAYS)
+        self.head = day
+        self.window = 0
+        self.base_sum = 0
+        self.base_sq = 0
+
+    def advance(self, day):
+        """Roll the buffer forward so `day` is the newest bucket."""
+        if day - self.head >= SPAN_DAYS:
+            self.__init__(day)
+            return
+        ring = self.ring
+        for d in range(self.head + 1, day + 1):
+            # The bucket from SPAN_DAYS ago leaves the baseline...
+            slot = d % SPAN_DAYS
+            c = ring[slot]
+            self.base_sum -= c
+            self.base_sq -= c * c
+            ring[slot] = 0
+            # ...and the one from WINDOW_DAYS ago moves from window to baseline
+            c = ring[(d - WINDOW_DAYS) % SPAN_DAYS]
+            self.window -= c
+            self.base_sum += c
+            self.base_sq += c * c
+        self.head = max(self.head, day)
+
+    def add(self, day, count=1):
+        if day > self.head:
+            self.advance(day)
+        age = self.head - day
+        if age >= SPAN_DAYS:
+            return
+        slot = day % SPAN_DAYS
+        c = self.ring[slot]
+        self.ring[slot] = c + count
+        if age < WINDOW_DAYS:
+            self.window += count
+        else:
+            self.base_sum += count
+            self.base_sq += (c + count) ** 2 - c * c
+
+    def score(self):
+        """Return (window_count, expected, threshold)."""
+        mean = self.base_sum / BASELINE_DAYS
+        variance = max(0.0, self.base_sq / BASELINE_DAYS - mean * mean)
+        expected = mean * WINDOW_DAYS
+        spread = math.sqrt(max(variance * WINDOW_DAYS, expected, 1e-9))
+        return self.window, expected, expected + Z_THRESHOLD * spread
+
+
+class OutbreakDetector:
+    def __init__(self):
+        self.series = {}
+        self.alerts = {}
+        self._lock = threading.Lock()
+
+    def add(self, village, cid, when, count=1):
+        key = (village, cid)
+        day = _day(when)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series(day)
+            series.add(day, count)
+            self._evaluate(key, series)
+
+    def _evaluate(self, key, series):
+        count, expected, threshold = series.score()
+        if count >= MIN_CASES and count > threshold:
+            alert = self.alerts.get(key)
+            if alert is None:
+                ALERTS_RAISED.inc()
+                alert = self.alerts[key] = {
+                    "village": key[0],
+                    "condition_id": key[1],
+                    "condition": condition_name(key[1]),
+                    "raised_at": datetime.now(),
+                }
+            alert.update({
+                "window_days": WINDOW_DAYS,
+                "cases": count,
+                "expected": round(expected, 2),
+                "threshold": round(threshold, 2),
+                "updated_at": datetime.now(),
+            })
+        else:
+            self.alerts.pop(key, None)
+        ACTIVE_ALERTS.set(len(self.alerts))
+
+    def active_alerts(self, village=None):
+        """Current alerts, after rolling their series forward to today."""
+        today = _day(datetime.now())
+        with self._lock:
+            for key in list(self.alerts):
+                series = self.series[key]
+                series.advance(today)
+                self._evaluate(key, series)
+            alerts = [dict(a) for k, a in self.alerts.items() if village is None or k[0] == village]
+        return sorted(alerts, key=lambda a: a["cases"] - a["threshold"], reverse=True)
+
+
+detector = OutbreakDetector()
+
+
+def _resolve_villages(usernames):
+    missing = [u for u in set(usernames) if _villages.get(u) is None]
+    if missing:
+        found = {}
+        for doc in users.find({"username": {"$in": missing}}, {"username": 1, "village": 1}):
+            found[doc["username"]] = doc.get("village") or ""
+        for username in missing:
+            # Cache "no village" too, as "", so unknown patients are not re-queried
+            _villages.set(username, found.get(username, ""))
+    return {u: _villages.get(u) for u in usernames}
+
+
+def observe_detections(entries):
+    """Feed stored detections, as (username, condition_id, detected_at) tuples."""
+    start_warmup()
+    entries = [e for e in entries if e[1] != UNKNOWN_ID]
+    if not _warm_done.is_set():
+        entries = [e for e in entries if e[2] >= _warm_cutoff]
+    if not entries:
+        return
+    try:
+        villages = _resolve_villages([username for username, _, _ in entries])
+    except Exception as e:
+        print(f"[warn] Outbreak detector could not resolve villages: {e}")
+        return
+    for username, cid, detected_at in entries:
+        village = villages.get(username)
+        if village:
+            detector.add(village, cid, detected_at)
+
+
+def load_history(collection=users, until=None):
+    """Rebuild the ring buffers from recent detections (one aggregation).
+
+    Only detections before `until` (default: now) are counted.
+    """
+    until = until or datetime.now()
+    window = {"$gte": until - timedelta(days=SPAN_DAYS), "$lt": until}
+    pipeline = [
+        {"$match": {"village": {"$nin": [None, ""]}, "diseases.detected_at": window}},
+        {"$project": {"village": 1, "diseases.condition_id": 1, "diseases.detected_at": 1}},
+        {"$unwind": "$diseases"},
+        {"$match": {"diseases.detected_at": window, "diseases.condition_id": {"$gt": UNKNOWN_ID}}},
+        {"$group": {
+            "_id": {
+                "village": "$village",
+                "condition_id": "$diseases.condition_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$diseases.detected_at"}},
+            },
+            "count": {"$sum": 1}
+        }},
+    ]
+    loaded = 0
+    for group in collection.aggregate(pipeline):
+        key = group["_id"]
+        detector.add(key["village"], key["condition_id"], datetime.strptime(key["day"], "%Y-%m-%d"), group["count"])
+        loaded += group["count"]
+    return loaded
+
+
+def _warm(cutoff):
+    try:
+        started = time.perf_counter()
+        loaded = load_history(until=cutoff)
+        print(f"[info] Outbreak detector loaded {loaded} detections in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"[warn] Outbreak detector history not loaded: {e}")
+    finally:
+        _warm_done.set()
+
+
+def start_warmup():
+    """Load the detection history in the background, once per process."""
+    global _warm_cutoff
+    if _warm_cutoff is not None:
+        return
+    with _warm_lock:
+        if _warm_cutoff is None:
+            _warm_cutoff = datetime.now()
+            threading.Thread(target=_warm, args=(_warm_cutoff,), name="outbreak-warmup", daemon=True).start()
+
+
+def init_app(app):
+    """Warm the detector with the first request (not in the reloader parent) and expose `/outbreak_alerts`."""
+    from flask import request, jsonify
+
+    @app.before_request
+    def _start_warmup():
+        start_warmup()
+
+    @app.route("/outbreak_alerts")
+    def outbreak_alerts():
+        alerts = detector.active_alerts(request.args.get("village") or None)
+        for alert in alerts:
+            alert["raised_at"] = alert["raised_at"].isoformat()
+            alert["updated_at"] = alert["updated_at"].isoformat()
+        return jsonify({
+            "success": True,
+            "window_days": WINDOW_DAYS,
+            "baseline_days": BASELINE_DAYS,
+            "alerts": alerts
+        })
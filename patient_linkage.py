@@ -0,0 +1,388 @@
+"""Offline duplicate-patient detection and merge.
+
+`add_user` keys patients on username and allows shared phones, so the same
+person can end up as "Ramesh K", "Ramesh Kumar" and "ramesh", each holding
+part of their history. This job finds such records without comparing every
+pair of patients:
+
+  1. One projection pass over `users` loads username, phone, village,
+     created time and the number of detections.
+  2. Blocking: records are grouped by phone, and by (village, phonetic code
+     of the first name). Only records sharing a block are compared. Blocks
+     larger than FULL_BLOCK_SIZE are sorted by name and compared within a
+     sliding window of WINDOW records.
+  3. Scoring: names must be compatible token by token (same first name up to
+     spelling, initials may stand for words, missing surnames allowed);
+     agreeing phones and villages add to the score, conflicting ones
+     subtract. Pairs at or above REVIEW_SCORE are kept.
+  4. Pairs are joined into clusters by complete linkage: every pair in a
+     cluster must score at least REVIEW_SCORE. Each cluster names a survivor
+     (most detections, then oldest) and is written to an NDJSON report with
+     `"approved": false`.
+  5. `merge` applies approved clusters (edited to `"approved": true`, or all
+     clusters at or above `--min-score`). Each duplicate is backed up to a
+     file, its detections are copied to the survivor, whose `aliases` keep
+     the old usernames, and only then is it deleted, leaving a tombstone so
+     village rosters drop it. Detections sent later under an old username
+     are written to the survivor (see `user_schema.resolve_usernames`).
+
+Usage:
+    python patient_linkage.py scan duplicates.ndjson [--village Hosur]
+    python patient_linkage.py merge duplicates.ndjson --backup merged.ndjson [--min-score 0.95]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from user_schema import users, tombstones, normalize_phone, record_tombstone
+
+MATCH_SCORE = 0.9
+REVIEW_SCORE = 0.7
+FULL_BLOCK_SIZE = 50
+WINDOW = 20
+
+_NON_LETTER = re.compile(r"[^a-z]+")
+_HONORIFICS = {"mr", "mrs", "ms", "smt", "shri", "sri", "shrimati", "kumari", "kum", "dr", "baby", "master"}
+# Common spelling variants in romanised Indian names ("Lakshmi"/"Laxmi",
+# "Geeta"/"Gita"), folded before comparing or coding tokens
+_SPELLINGS = [("aa", "a"), ("ee", "i"), ("oo", "u"), ("th", "t"), ("dh", "d"), ("bh", "b"),
+              ("kh", "k"), ("gh", "g"), ("ph", "f"), ("sh", "s"), ("x", "ks"), ("w", "v"), ("z", "j")]
+_SOUNDEX = {c: str(d) for d, letters in enumerate(["aeiouyh", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in letters}
+
+
+def name_tokens(name):
+    """Lowercase letter-only tokens of a name, without honorifics."""
+    tokens = _NON_LETTER.split(str(name or "").lower())
+    return [t for t in tokens if t and t not in _HONORIFICS]
+
+
+def fold(token):
+    for old, new in _SPELLINGS:
+        token = token.replace(old, new)
+    return token
+
+
+def phonetic(token):
+    """Soundex-style code of a token, after folding common spelling variants."""
+    if not token:
+        return ""
+    token = fold(token)
+    code, last = token[0], _SOUNDEX.get(token[0], "")
+    for c in token[1:]:
+        digit = _SOUNDEX.get(c, "")
+        if digit and digit != last and digit != "0":
+            code += digit
+        last = digit
+    return (code + "000")[:4]
+
+
+def jaro_winkler(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    reach = max(len(a), len(b)) // 2 - 1
+    used = [False] * len(b)
+    matches_a = []
+    for i, c in enumerate(a):
+        for j in range(max(0, i - reach), min(len(b), i + reach + 1)):
+            if not used[j] and b[j] == c:
+                used[j] = True
+                matches_a.append(c)
+                break
+    if not matches_a:
+        return 0.0
+    matches_b = [c for j, c in enumerate(b) if used[j]]
+    m = len(matches_a)
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def _tokens_compatible(a, b):
+    """Same word up to spelling, or one is the other's initial."""
+    if a == b:
+        return True
+    if len(a) == 1 or len(b) == 1:
+        return a[0] == b[0]
+    # The phonetic code alone is too coarse: "Mohan" and "Mohini" share one
+    return phonetic(a) == phonetic(b) and jaro_winkler(fold(a), fold(b)) >= 0.9
+
+
+def name_score(tokens_a, tokens_b):
+    """0 when the names cannot belong to the same person, else the first-name similarity."""
+    if not tokens_a or not tokens_b or not _tokens_compatible(tokens_a[0], tokens_b[0]):
+        return 0.0
+    shorter, longer = sorted((tokens_a[1:], tokens_b[1:]), key=len)
+    remaining = list(longer)
+    for token in shorter:
+        for i, other in enumerate(remaining):
+            if _tokens_compatible(token, other):
+                del remaining[i]
+                break
+        else:
+            return 0.0
+    score = jaro_winkler(fold(tokens_a[0]), fold(tokens_b[0]))
+    # An initial-only first name ("R Kumar") is weaker evidence
+    if min(len(tokens_a[0]), len(tokens_b[0])) == 1:
+        score *= 0.85
+    return score
+
+
+def score_pair(a, b):
+    """Score two patient records; returns (score, reasons)."""
+    name = name_score(a["tokens"], b["tokens"])
+    if name == 0.0:
+        return 0.0, ["name"]
+    score, reasons = 0.65 * name, [f"name:{name:.2f}"]
+    if a["phone"] and b["phone"]:
+        if a["phone"] == b["phone"]:
+            score, reasons = score + 0.25, reasons + ["phone"]
+        else:
+            score, reasons = score - 0.25, reasons + ["phone_conflict"]
+    if a["village"] and b["village"]:
+        if a["village"] == b["village"]:
+            score, reasons = score + 0.1, reasons + ["village"]
+        else:
+            score, reasons = score - 0.3, reasons + ["village_conflict"]
+    return round(score, 3), reasons
+
+
+def load_patients(collection=users, village=None):
+    """Project the fields linkage needs; one pass over the collection."""
+    pipeline = [{"$match": {"village": village}}] if village else []
+    pipeline.append({"$project": {
+        "username": 1, "phone": 1, "village": 1, "created": 1,
+        "detections": {"$size": {"$ifNull": ["$diseases", []]}},
+    }})
+    records = []
+    for doc in collection.aggregate(pipeline, allowDiskUse=True):
+        phone = normalize_phone(doc.get("phone") or "")
+        records.append({
+            "_id": doc["_id"],
+            "username": doc.get("username") or "",
+            "tokens": name_tokens(doc.get("username")),
+            # Last ten digits, so +91/0 prefixes do not split a block
+            "phone": phone[-10:] if phone else "",
+            "village": (doc.get("village") or "").strip().lower(),
+            "created": doc.get("created"),
+            "detections": doc.get("detections", 0),
+        })
+    return records
+
+
+def blocks(records):
+    """Yield lists of record indexes that share a blocking key."""
+    keyed = defaultdict(list)
+    for i, r in enumerate(records):
+        if r["phone"]:
+            keyed["p:" + r["phone"]].append(i)
+        if r["tokens"]:
+            keyed[f"v:{r['village']}:{phonetic(r['tokens'][0])}"].append(i)
+    for members in keyed.values():
+        if len(members) > 1:
+            yield members
+
+
+def candidate_pairs(records):
+    """Distinct (i, j) index pairs worth scoring."""
+    seen = set()
+    for members in blocks(records):
+        if len(members) <= FULL_BLOCK_SIZE:
+            pairs = ((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+        else:
+            # Sorted neighbourhood: similar names end up close together
+            members = sorted(members, key=lambda i: " ".join(records[i]["tokens"]))
+            pairs = ((a, b) for n, a in enumerate(members) for b in members[n + 1:n + WINDOW])
+        for a, b in pairs:
+            pair = (a, b) if a < b else (b, a)
+            if pair not in seen:
+                seen.add(pair)
+                yield pair
+
+
+def _survivor_key(record):
+    created = record["created"] or datetime.max
+    return (-record["detections"], created, -len(record["username"]))
+
+
+def find_duplicates(records, review_score=REVIEW_SCORE):
+    """Score candidate pairs and group them into clusters (report dicts).
+
+    Clustering is complete-linkage: two clusters are joined only when every
+    pair across them scores at least `review_score`. "Rajesh Kumar" and
+    "Ramesh Kumar" therefore never end up together through "R Kumar", which
+    is compatible with both. Pairs that blocking did not produce are scored
+    when a join needs them.
+    """
+    scored = {}
+    kept, compared = [], 0
+    for a, b in candidate_pairs(records):
+        compared += 1
+        score, reasons = score_pair(records[a], records[b])
+        scored[(a, b)] = (score, reasons)
+        if score >= review_score:
+            kept.append((score, a, b))
+
+    def pair_score(a, b):
+        pair = (a, b) if a < b else (b, a)
+        if pair not in scored:
+            scored[pair] = score_pair(records[pair[0]], records[pair[1]])
+        return scored[pair][0]
+
+    # Strongest links first, so each record joins its best-matching cluster
+    kept.sort(key=lambda k: (-k[0], k[1], k[2]))
+    cluster_of = {}
+    for _, a, b in kept:
+        cluster_a, cluster_b = cluster_of.get(a, frozenset((a,))), cluster_of.get(b, frozenset((b,)))
+        if cluster_a is cluster_b:
+            continue
+        if all(pair_score(x, y) >= review_score for x in cluster_a for y in cluster_b):
+            joined = cluster_a | cluster_b
+            for i in joined:
+                cluster_of[i] = joined
+
+    report = []
+    for cluster in {id(c): c for c in cluster_of.values()}.values():
+        members = sorted(cluster, key=lambda i: _survivor_key(records[i]))
+        pairs = []
+        for n, a in enumerate(members):
+            for b in members[n + 1:]:
+                pair_score(a, b)
+                score, reasons = scored[(a, b) if a < b else (b, a)]
+                pairs.append({"a": records[a]["username"], "b": records[b]["username"],
+                              "score": score, "reasons": reasons})
+        survivor = records[members[0]]
+        report.append({
+            "survivor": {"id": str(survivor["_id"]), "username": survivor["username"]},
+            "duplicates": [{"id": str(records[i]["_id"]), "username": records[i]["username"],
+                            "phone": records[i]["phone"], "village": records[i]["village"],
+                            "detections": records[i]["detections"]} for i in members[1:]],
+            # A cluster is only as certain as its weakest pair
+            "score": min(p["score"] for p in pairs),
+            "pairs": pairs,
+            "approved": False,
+        })
+    report.sort(key=lambda c: c["score"], reverse=True)
+    return report, compared
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def merge_cluster(cluster, backup, collection=users, tombstones=tombstones):
+    """Fold a cluster's duplicates into its survivor; returns detections moved.
+
+    Each duplicate's detections and usernames are copied to the survivor
+    before the duplicate is deleted, so a crash in between leaves them in
+    both records (and a rerun finishes the merge) rather than in neither.
+    """
+    from bson import ObjectId
+
+    survivor_id = ObjectId(cluster["survivor"]["id"])
+    survivor = collection.find_one({"_id": survivor_id}, {"diseases.client_id": 1})
+    if survivor is None:
+        raise LookupError(f"survivor {cluster['survivor']['username']!r} no longer exists")
+    known = {d.get("client_id") for d in survivor.get("diseases", []) if d.get("client_id")}
+
+    moved = 0
+    for duplicate in cluster["duplicates"]:
+        duplicate_id = ObjectId(duplicate["id"])
+        backed_up = False
+        while True:
+            doc = collection.find_one({"_id": duplicate_id})
+            if doc is None:
+                break
+            if not backed_up:
+                backup.write(json.dumps(doc, default=_json_default, ensure_ascii=False) + "\n")
+                backup.flush()
+                backed_up = True
+            diseases = [d for d in doc.get("diseases", []) if not d.get("client_id") or d["client_id"] not in known]
+            # $addToSet, so copying again after an interrupted run adds nothing twice
+            collection.update_one({"_id": survivor_id}, {
+                "$addToSet": {
+                    "aliases": {"$each": [doc["username"]] + doc.get("aliases", [])},
+                    "diseases": {"$each": diseases},
+                },
+                "$set": {"updated_at": datetime.utcnow()},
+            })
+            known.update(d["client_id"] for d in diseases if d.get("client_id"))
+            record_tombstone(doc, merged_into=survivor_id, collection=tombstones)
+            # Every write to a patient pushes a detection and bumps updated_at;
+            # if one landed since the read, copy again before deleting
+            deleted = collection.delete_one({
+                "_id": duplicate_id,
+                "updated_at": doc.get("updated_at"),
+                "diseases": {"$size": len(doc.get("diseases", []))},
+            })
+            if deleted.deleted_count:
+                moved += len(diseases)
+                break
+    return moved
+
+
+def read_report(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and merge duplicate patients")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="Write a report of likely duplicates")
+    scan.add_argument("report", help="Output NDJSON report")
+    scan.add_argument("--village")
+    scan.add_argument("--review-score", type=float, default=REVIEW_SCORE)
+
+    merge = sub.add_parser("merge", help="Merge approved clusters from a report")
+    merge.add_argument("report")
+    merge.add_argument("--backup", required=True, help="NDJSON file receiving the removed records")
+    merge.add_argument("--min-score", type=float,
+                       help=f"Also merge unapproved clusters scoring at least this (e.g. {MATCH_SCORE})")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "scan":
+        started = time.perf_counter()
+        records = load_patients(village=args.village)
+        loaded = time.perf_counter()
+        report, compared = find_duplicates(records, args.review_score)
+        with open(args.report, "w", encoding="utf-8") as out:
+            for cluster in report:
+                out.write(json.dumps(cluster, ensure_ascii=False) + "\n")
+        likely = sum(1 for c in report if c["score"] >= MATCH_SCORE)
+        print(f"[info] {len(records)} patients loaded in {loaded - started:.1f}s, {compared} pairs compared, "
+              f"{len(report)} clusters ({likely} >= {MATCH_SCORE}) in {time.perf_counter() - loaded:.1f}s",
+              file=sys.stderr)
+        return 0
+
+    merged = moved = failed = 0
+    with open(args.backup, "a", encoding="utf-8") as backup:
+        for cluster in read_report(args.report):
+            if not (cluster.get("approved") or (args.min_score is not None and cluster["score"] >= args.min_score)):
+                continue
+            try:
+                moved += merge_cluster(cluster, backup)
+                merged += 1
+            except LookupError as e:
+                failed += 1
+                print(f"[warn] skipped cluster: {e}", file=sys.stderr)
+    print(f"[info] merged {merged} clusters, moved {moved} detections, {failed} skipped", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""On-demand request profiling with sampled flamegraph capture.
+
+A request is profiled when either
+  - it carries `X-Profile: <PROFILE_TOKEN>` (the token guards the feature;
+    profiling by header is disabled while PROFILE_TOKEN is unset), or
+  - it is picked by the random PROFILE_SAMPLE_RATE (0.0 disables sampling).
+
+While the request runs, a background thread samples the handling thread's
+Python stack every PROFILE_INTERVAL_MS and counts identical stacks. The result
+is written to PROFILE_DIR in collapsed-stack format, which flamegraph.pl,
+speedscope and inferno read directly. With `X-Profile-Memory: 1` (or
+PROFILE_MEMORY=1) a tracemalloc diff of the request is written next to it.
+
+`/profiles` lists the latest captures and `/profiles/<name>` returns one; both
+require the token as `?token=` or in the X-Profile header.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MEMORY = os.environ.get("PROFILE_MEMORY") == "1"
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))
+PROFILE_INDEX_LIMIT = 50
+TRACEMALLOC_TOP = 30
+
+_memory_lock = threading.Lock()
+
+
+class StackSampler:
+    """Sample one thread's Python stack on a timer and count collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+def _authorized(token):
+    return bool(PROFILE_TOKEN) and token == PROFILE_TOKEN
+
+
+def should_profile(headers):
+    if _authorized(headers.get("X-Profile")):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _capture_name(endpoint):
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return f"{stamp}_{endpoint or 'unknown'}_{uuid.uuid4().hex[:6]}"
+
+
+def _prune():
+    """Keep only the newest PROFILE_KEEP captures."""
+    files = sorted(
+        (f for f in os.listdir(PROFILE_DIR) if f.endswith(".collapsed")),
+        reverse=True
+    )
+    for stale in files[PROFILE_KEEP:]:
+        base = stale[:-len(".collapsed")]
+        for suffix in (".collapsed", ".alloc.txt"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, base + suffix))
+            except OSError:
+                pass
+
+
+def write_capture(endpoint, elapsed, sampler, alloc_stats=None):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = _capture_name(endpoint)
+    with open(os.path.join(PROFILE_DIR, name + ".collapsed"), "w") as f:
+        f.write(sampler.collapsed())
+    if alloc_stats is not None:
+        with open(os.path.join(PROFILE_DIR, name + ".alloc.txt"), "w") as f:
+            f.write(f"# top {TRACEMALLOC_TOP} allocation sites by size delta during the request\n")
+            for stat in alloc_stats[:TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+    _prune()
+    print(f"[info] Profiled {endpoint}: {elapsed * 1000:.0f}ms, {sampler.samples} samples -> {name}")
+    return name
+
+
+def list_captures(limit=PROFILE_INDEX_LIMIT):
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    captures = []
+    for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not filename.endswith(".collapsed"):
+            continue
+        base = filename[:-len(".collapsed")]
+        path = os.path.join(PROFILE_DIR, filename)
+        with open(path) as f:
+            samples = sum(int(line.rsplit(" ", 1)[1]) for line in f if line.strip())
+        captures.append({
+            "name": base,
+            "samples": samples,
+            "collapsed": filename,
+            "alloc": base + ".alloc.txt" if os.path.exists(os.path.join(PROFILE_DIR, base + ".alloc.txt")) else None,
+        })
+        if len(captures) >= limit:
+            break
+    return captures
+
+
+def start_capture(headers):
+    """Start profiling the current thread if the request asks for it.
+
+    Returns a capture handle for `finish_capture`, or None. Under asgi.py the
+    current thread is the event loop's, so other requests served meanwhile
+    show up in the samples too.
+    """
+    if not should_profile(headers):
+        return None
+    capture = {
+        "sampler": StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0),
+        "start": time.perf_counter(),
+        "snapshot": None,
+    }
+    memory = PROFILE_MEMORY or headers.get("X-Profile-Memory") == "1"
+    # tracemalloc is process-wide; only one request traces at a time
+    if memory and not tracemalloc.is_tracing() and _memory_lock.acquire(blocking=False):
+        tracemalloc.start(10)
+        capture["snapshot"] = tracemalloc.take_snapshot()
+    capture["sampler"].start()
+    return capture
+
+
+def finish_capture(capture, endpoint):
+    """Stop a capture from `start_capture` and write it to PROFILE_DIR."""
+    if capture is None:
+        return
+    sampler = capture["sampler"]
+    sampler.stop()
+    elapsed = time.perf_counter() - capture["start"]
+    alloc_stats = None
+    if capture["snapshot"] is not None:
+        try:
+            alloc_stats = tracemalloc.take_snapshot().compare_to(capture["snapshot"], "lineno")
+        finally:
+            tracemalloc.stop()
+            _memory_lock.release()
+    try:
+        write_capture(endpoint, elapsed, sampler, alloc_stats)
+    except OSError as e:
+        print(f"[warn] Failed to write profile capture: {e}")
+
+
+def init_app(app):
+    """Register profiling hooks and the capture index routes on a Flask app."""
+    from flask import request, g, jsonify, send_from_directory, abort
+
+    @app.before_request
+    def _start_profile():
+        g._profile_capture = start_capture(request.headers)
+
+    @app.teardown_request
+    def _finish_profile(exc=None):
+        finish_capture(g.pop("_profile_capture", None), request.endpoint)
+
+    def _check_token():
+        if not _authorized(request.args.get("token") or request.headers.get("X-Profile")):
+            abort(404)
+
+    @app.route("/profiles")
+    def profile_index():
+        _check_token()
+        return jsonify({"success": True, "captures": list_captures()})
+
+    @app.route("/profiles/<path:filename>")
+    def profile_file(filename):
+        _check_token()
+        if not filename.endswith((".collapsed", ".alloc.txt")):
+            abort(404)
+        return send_from_directory(PROFILE_DIR, filename, mimetype="text/plain")
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from user_schema import users, tombstones
+from sync_schema import make_change_token, parse_change_token
+from metrics import timed
+
+# Village roster download for offline lookups on the dashboard.
+#
+# The first request (no token) returns a snapshot of every patient in the
+# worker's village; later requests pass the returned `change_token` and only
+# get patients whose `updated_at` moved since then, plus the ids of patients
+# deleted or merged away since then (`deleted`, from patient_tombstones).
+# Rows are positional arrays (see ROSTER_FIELDS) with epoch-millisecond
+# timestamps, which keeps the payload small and maps directly onto
+# MessagePack/CBOR if the client asks for a binary encoding.
+
+ROSTER_VERSION = 1
+ROSTER_FIELDS = ["id", "name", "phone", "updated", "detections"]
+DETECTION_FIELDS = ["name", "detected", "asha_id"]
+# Only recent detections are shipped; full history stays a /search_patient away
+ROSTER_DETECTION_DAYS = 90
+# Re-send a few seconds before the token to cover writes that were in flight
+# when the previous token was issued. Clients upsert rows by id, so the
+# overlap is harmless.
+ROSTER_TOKEN_OVERLAP = timedelta(seconds=5)
+
+_indexes_ready = False
+
+
+def ensure_roster_indexes():
+    """Create the (village, updated_at) index that roster queries rely on."""
+    global _indexes_ready
+    if not _indexes_ready:
+        users.create_index([("village", ASCENDING), ("updated_at", ASCENDING)])
+        tombstones.create_index([("village", ASCENDING), ("deleted_at", ASCENDING)])
+        _indexes_ready = True
+
+
+def _epoch_ms(value, local=False):
+    """Epoch milliseconds of a naive datetime stored as UTC, or as local time
+    with `local` (detections keep add_disease's `datetime.now()`)."""
+    if not isinstance(value, datetime):
+        return None
+    if local:
+        return int(value.timestamp() * 1000)
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _patient_row(patient, detections_since):
+    detections = []
+    for d in patient.get("diseases", []):
+        if not isinstance(d, dict):
+            continue
+        detected = d.get("detected_at")
+        if isinstance(detected, datetime) and detected < detections_since:
+            continue
+        detections.append([
+            d.get("name"),
+            _epoch_ms(detected, local=True),
+            (d.get("checked_by") or {}).get("asha_id")
+        ])
+    return [
+        str(patient["_id"]),
+        patient.get("username"),
+        patient.get("phone"),
+        _epoch_ms(patient.get("updated_at")),
+        detections
+    ]
+
+
+@timed("db.get_village_roster")
+def get_village_roster(village, since_token=None):
+    """Return a snapshot (no token) or delta (with token) of a village roster.
+
+    Args:
+        village (str): Village of the requesting ASHA worker
+        since_token (str): `change_token` from a previous roster response
+
+    Returns:
+        dict: `full` flag, `fields`/`detection_fields` describing the row
+        layout, `patients` rows, `deleted` patient ids (deltas only) and the
+        next `change_token`.
+    """
+    ensure_roster_indexes()
+
+    now = datetime.utcnow()
+    since = parse_change_token(since_token)
+    query = {"village": village}
+    if since is not None:
+        query["updated_at"] = {"$gte": since - ROSTER_TOKEN_OVERLAP}
+
+    cursor = users.find(
+        query, {"username": 1, "phone": 1, "updated_at": 1, "diseases": 1}
+    ).sort("updated_at", ASCENDING)
+    detections_since = datetime.now() - timedelta(days=ROSTER_DETECTION_DAYS)
+    rows = [_patient_row(p, detections_since) for p in cursor]
+
+    # A snapshot replaces the client's roster, so only deltas need tombstones
+    deleted = []
+    if since is not None:
+        deleted = [str(t["_id"]) for t in tombstones.find(
+            {"village": village, "deleted_at": {"$gte": since - ROSTER_TOKEN_OVERLAP}}, {"_id": 1}
+        )]
+
+    return {
+        "success": True,
+        "v": ROSTER_VERSION,
+        "village": village,
+        "full": since is None,
+        "fields": ROSTER_FIELDS,
+        "detection_fields": DETECTION_FIELDS,
+        "patients": rows,
+        "deleted": deleted,
+        "change_token": make_change_token(now)
+    }
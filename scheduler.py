@@ -0,0 +1,263 @@
+"""Priority and fair-share scheduling of Gemini analyses.
+
+`/predict` holds one of MODEL_CONCURRENCY slots while it talks to the model.
+Requests that find every slot busy queue here instead of piling onto the API:
+
+  - Priority classes are served in order: "urgent" before "routine" before
+    "bulk". A request is urgent when the form says `urgency=urgent` or
+    `extra_info` contains a red-flag word (RED_FLAG_TERMS); `urgency=bulk`
+    marks camp uploads that can wait. So that a steady stream of routine
+    cases cannot starve bulk forever, waiting bulk requests get at least
+    MODEL_QUEUE_BULK_SHARE (default 0.1) of the dispatches.
+  - Within a class, workers share the slots by weighted fair queuing on
+    `asha_worker_id`: each request gets a virtual finish time of
+    max(class clock, worker's last finish) + views / weight (weights default
+    to 1 and can be set with MODEL_WORKER_WEIGHTS, e.g. `{"ASHA042": 2}`),
+    and the smallest finish time goes next. A worker uploading fifty photos only
+    delays a colleague's single case by one analysis, not fifty.
+  - When MODEL_QUEUE_MAX requests are already waiting (URGENT_RESERVE more
+    for urgent ones), or a request has waited MODEL_QUEUE_TIMEOUT seconds,
+    `QueueFull` is raised; the routes answer 429 with a Retry-After estimated
+    from the queue length and the recent analysis time.
+
+Queue wait per class is exported as `appayu_model_queue_wait_seconds`.
+Both the threaded Flask server (`slot`) and the ASGI handler (`slot_async`)
+go through the same queue.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import metrics
+
+MODEL_CONCURRENCY = int(os.environ.get("MODEL_CONCURRENCY", "4"))
+MODEL_QUEUE_MAX = int(os.environ.get("MODEL_QUEUE_MAX", "32"))
+URGENT_RESERVE = int(os.environ.get("MODEL_QUEUE_URGENT_RESERVE", "8"))
+MODEL_QUEUE_TIMEOUT = float(os.environ.get("MODEL_QUEUE_TIMEOUT", "60"))
+BULK_SHARE = float(os.environ.get("MODEL_QUEUE_BULK_SHARE", "0.1"))
+
+PRIORITIES = ("urgent", "routine", "bulk")
+DEFAULT_PRIORITY = "routine"
+
+# Words and phrases of `extra_info` that make a case urgent. They match whole
+# words, plural included ("burns" but not "burning", "pus" but not "campus")
+RED_FLAG_TERMS = (
+    "bleeding", "fever", "pus", "spreading fast", "rapidly spreading", "swelling",
+    "vision loss", "loss of vision", "eye pain", "blister", "breathing",
+    "unconscious", "infant", "newborn", "pregnant", "snake", "dog bite", "burn",
+)
+_RED_FLAG = re.compile(
+    r"\b(?:" + "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in RED_FLAG_TERMS) + r")(?:e?s)?\b"
+)
+
+
+def _load_weights():
+    raw = os.environ.get("MODEL_WORKER_WEIGHTS")
+    if not raw:
+        return {}
+    try:
+        return {str(worker): float(weight) for worker, weight in json.loads(raw).items() if float(weight) > 0}
+    except (ValueError, AttributeError, TypeError) as e:
+        print(f"[warn] Ignoring invalid MODEL_WORKER_WEIGHTS: {e}")
+        return {}
+
+
+QUEUE_WAIT = metrics.register(metrics.Histogram(
+    "appayu_model_queue_wait_seconds", "Time /predict waited for a model slot", ("priority",)
+))
+QUEUE_DEPTH = metrics.register(metrics.Gauge(
+    "appayu_model_queue_depth", "Analyses waiting for a model slot", ("priority",)
+))
+QUEUE_REJECTED = metrics.register(metrics.Counter(
+    "appayu_model_queue_rejected_total", "Analyses turned away with 429", ("priority", "reason")
+))
+
+
+class QueueFull(Exception):
+    """No model slot could be given; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after, reason="full"):
+        super().__init__(f"Model queue {reason}; retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def classify(urgency=None, extra_info=None):
+    """Priority class of a request from its form fields."""
+    urgency = (urgency or "").strip().lower()
+    if urgency in PRIORITIES:
+        return urgency
+    text = (extra_info or "").lower()
+    if _RED_FLAG.search(text):
+        return "urgent"
+    return DEFAULT_PRIORITY
+
+
+class Ticket:
+    __slots__ = ("priority", "worker", "finish", "enqueued", "wake", "granted", "cancelled")
+
+    def __init__(self, priority, worker, finish, wake):
+        self.priority = priority
+        self.worker = worker
+        self.finish = finish
+        self.enqueued = time.monotonic()
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class FairScheduler:
+    def __init__(self, capacity=MODEL_CONCURRENCY, queue_max=MODEL_QUEUE_MAX,
+                 urgent_reserve=URGENT_RESERVE, weights=None, bulk_share=BULK_SHARE):
+        self.capacity = capacity
+        self.queue_max = queue_max
+        self.urgent_reserve = urgent_reserve
+        # Every bulk_every-th dispatch goes to bulk while bulk is waiting
+        self.bulk_every = math.ceil(1 / bulk_share) if bulk_share > 0 else 0
+        self._since_bulk = 0
+        # asha_worker_id -> weight (default 1)
+        self.weights = _load_weights() if weights is None else weights
+        self.running = 0
+        self.queues = {p: [] for p in PRIORITIES}
+        self.waiting = {p: 0 for p in PRIORITIES}
+        # Per class: virtual clock and each worker's last virtual finish
+        self.clock = {p: 0.0 for p in PRIORITIES}
+        self.last_finish = {p: {} for p in PRIORITIES}
+        # Moving average of how long one analysis holds a slot
+        self.service_seconds = 5.0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _retry_after(self, queued):
+        rounds = (queued + self.capacity) / max(self.capacity, 1)
+        return max(1, math.ceil(rounds * self.service_seconds))
+
+    def submit(self, priority, worker, cost, wake):
+        """Take a slot now (returns a granted ticket) or join the queue.
+
+        Raises QueueFull when the queue is at its limit for this class.
+        """
+        with self._lock:
+            queued = sum(self.waiting.values())
+            if self.running < self.capacity and queued == 0:
+                self.running += 1
+                ticket = Ticket(priority, worker, 0.0, wake)
+                ticket.granted = True
+                return ticket
+            limit = self.queue_max + (self.urgent_reserve if priority == "urgent" else 0)
+            if queued >= limit:
+                QUEUE_REJECTED.inc(priority, "full")
+                raise QueueFull(self._retry_after(queued))
+            finishes = self.last_finish[priority]
+            start = max(self.clock[priority], finishes.get(worker, 0.0))
+            finish = finishes[worker] = start + cost / self.weights.get(worker, 1.0)
+            ticket = Ticket(priority, worker, finish, wake)
+            heapq.heappush(self.queues[priority], (finish, next(self._seq), ticket))
+            self.waiting[priority] += 1
+            QUEUE_DEPTH.set(self.waiting[priority], priority)
+            return ticket
+
+    def cancel(self, ticket):
+        """Give up a queued ticket; returns False if it was granted meanwhile."""
+        with self._lock:
+            if ticket.granted:
+                return False
+            ticket.cancelled = True
+            self.waiting[ticket.priority] -= 1
+            QUEUE_DEPTH.set(self.waiting[ticket.priority], ticket.priority)
+            return True
+
+    def release(self, seconds=None):
+        """Free a slot after an analysis that held it for `seconds`."""
+        with self._lock:
+            if seconds is not None:
+                self.service_seconds += 0.2 * (seconds - self.service_seconds)
+            self.running -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.capacity:
+            ticket = self._pop()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self.running += 1
+            ticket.wake()
+
+    def _pop(self):
+        order = PRIORITIES
+        if self.waiting["bulk"] and self.bulk_every:
+            self._since_bulk += 1
+            if self._since_bulk >= self.bulk_every:
+                order = ("bulk",) + PRIORITIES[:-1]
+        for priority in order:
+            queue = self.queues[priority]
+            while queue:
+                finish, _, ticket = heapq.heappop(queue)
+                if ticket.cancelled:
+                    continue
+                self.waiting[priority] -= 1
+                QUEUE_DEPTH.set(self.waiting[priority], priority)
+                self.clock[priority] = finish
+                if priority == "bulk":
+                    self._since_bulk = 0
+                if not queue:
+                    # Class went idle: forget old finish times so they cannot
+                    # penalise or favour anyone in the next busy period
+                    self.last_finish[priority].clear()
+                return ticket
+        return None
+
+    @contextmanager
+    def slot(self, priority, worker, cost=1, timeout=MODEL_QUEUE_TIMEOUT):
+        """Hold a model slot for the duration of the block (threads)."""
+        event = threading.Event()
+        ticket = self.submit(priority, worker, cost, event.set)
+        if not ticket.granted and not event.wait(timeout) and self.cancel(ticket):
+            QUEUE_REJECTED.inc(priority, "timeout")
+            raise QueueFull(self._retry_after(sum(self.waiting.values())), "timeout")
+        QUEUE_WAIT.observe(time.monotonic() - ticket.enqueued, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def slot_async(self, priority, worker, cost=1, timeout=MODEL_QUEUE_TIMEOUT):
+        """Hold a model slot for the duration of the block (asyncio)."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        ticket = self.submit(priority, worker, cost, wake)
+        if not ticket.granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), timeout)
+            except asyncio.TimeoutError:
+                if self.cancel(ticket):
+                    QUEUE_REJECTED.inc(priority, "timeout")
+                    raise QueueFull(self._retry_after(sum(self.waiting.values())), "timeout")
+            except asyncio.CancelledError:
+                # Client went away; hand the slot on if it was granted meanwhile
+                if not self.cancel(ticket):
+                    self.release()
+                raise
+        QUEUE_WAIT.observe(time.monotonic() - ticket.enqueued, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+scheduler = FairScheduler()
@@ -0,0 +1,317 @@
+  let currentPatient = null;
+  let currentAshaWorker = null;
+
+  // Load patient info and ASHA worker info from localStorage
+  window.addEventListener('DOMContentLoaded', () => {
+    const patientJson = localStorage.getItem('currentPatient');
+    if (!patientJson) {
+      // No patient selected -> go back to home to select/create
+      window.location.href = '/';
+      return;
+    }
+
+    try {
+      const parsed = JSON.parse(patientJson);
+      // Normalize name field (backend may return `username` or `name`)
+      const displayName = parsed.name || parsed.username || parsed.username || parsed.fullname || 'Unknown';
+      const phone = parsed.phone || parsed.phone || 'Unknown';
+      currentPatient = { name: displayName, phone };
+
+      const detailsEl = document.getElementById('patientDetails');
+      // Replace content (prevents accidental duplicated append)
+      detailsEl.innerHTML = `\n          <p><strong>Name:</strong> ${currentPatient.name}</p>\n          <p><strong>Phone:</strong> ${currentPatient.phone}</p>\n        `;
+    } catch (err) {
+      console.error('Failed to parse patient data from storage', err);
+      window.location.href = '/';
+      return;
+    }
+
+    // Load ASHA worker info from localStorage
+    try {
+      const currentUserMobile = localStorage.getItem('ayuscan_current_user_v1');
+      if (!currentUserMobile) {
+        alert('No ASHA worker logged in. Please login first.');
+        window.location.href = '/';
+        return;
+      }
+
+      const users = JSON.parse(localStorage.getItem('ayuscan_users_v1') || '{}');
+      const ashaWorker = users[currentUserMobile];
+
+      if (!ashaWorker) {
+        alert('ASHA worker information not found. Please login again.');
+        window.location.href = '/';
+        return;
+      }
+
+      // Store ASHA worker info for later use
+      currentAshaWorker = {
+        name: ashaWorker.name,
+        ashaId: ashaWorker.ashaId,
+        mobile: ashaWorker.mobile
+      };
+
+      console.log('Logged in ASHA Worker:', currentAshaWorker);
+    } catch (err) {
+      console.error('Failed to load ASHA worker data from storage', err);
+      alert('Error loading ASHA worker information. Please login again.');
+      window.location.href = '/';
+    }
+  });
+
+  const fileInput = document.getElementById('fileInput');
+  const preview = document.getElementById('preview');
+  const detectBtn = document.getElementById('detectBtn');
+  const resultBox = document.getElementById('result');
+const diseaseText = document.getElementById('disease');
+  // const confidenceText = document.getElementById('confidence');
+  const descriptionText = document.getElementById('description');
+  const severityText = document.getElementById('severity');
+  const treatmentsList = document.getElementById('treatments');
+  const colorToneText = document.getElementById('colorTone');
+  const textureText = document.getElementById('texture');
+  const imageSizeText = document.getElementById('imageSize');
+const ageInput = document.getElementById('ageInput');
+const extraInfo = document.getElementById('extraInfo');
+const urgentCase = document.getElementById('urgentCase');
+
+let selectedFiles = [];
+// Downscaled copies of selectedFiles (see upload.js), prepared on selection
+let preparedFiles = Promise.resolve([]);
+let previewUrl = null;
+// Photos of the same case from different angles are analysed together
+const MAX_VIEWS = 4;
+const categorySelect = document.getElementById('categorySelect');
+const previewHint = document.getElementById('previewHint');
+const resultPlaceholder = document.getElementById('resultPlaceholder');
+
+  fileInput.addEventListener('change', () => {
+    selectedFiles = Array.from(fileInput.files).slice(0, MAX_VIEWS);
+    if (fileInput.files.length > MAX_VIEWS) {
+      alert(`Only the first ${MAX_VIEWS} photos will be analysed.`);
+    }
+    preparedFiles = Promise.all(selectedFiles.map(file => prepareUpload(file, 'scan')));
+    if (selectedFiles.length) {
+      preparedFiles.then(prepared => {
+        // Preview the small copy; a data URL of the camera file can be many MB
+        if (previewUrl) URL.revokeObjectURL(previewUrl);
+        previewUrl = URL.createObjectURL(prepared[0].file);
+        preview.src = previewUrl;
+        preview.style.display = 'block';
+        previewHint.style.display = 'block';
+        previewHint.textContent = selectedFiles.length > 1
+          ? `🖼️ Image Preview (1 of ${selectedFiles.length} views)`
+          : '🖼️ Image Preview';
+      });
+    }
+  });
+
+  detectBtn.addEventListener('click', async () => {
+    if (!selectedFiles.length) {
+      alert('Please upload an image first!');
+      return;
+    }
+
+    const prepared = await preparedFiles;
+    const languageSelect = document.getElementById('languageSelect');
+    // Everything /predict needs, captured now so a queued analysis keeps this
+    // patient's context even if the page moves on to another patient
+    const fields = {
+      original_bytes: prepared.reduce((sum, item) => sum + item.originalBytes, 0),
+      category: categorySelect ? categorySelect.value : 'skin',
+      language: languageSelect ? languageSelect.value : 'en',
+      patient_name: currentPatient.name,
+      patient_phone: currentPatient.phone,
+      age: ageInput && ageInput.value,
+      extra_info: extraInfo && extraInfo.value,
+      urgency: urgentCase && urgentCase.checked ? 'urgent' : ''
+    };
+    if (currentAshaWorker) {
+      fields.asha_worker_name = currentAshaWorker.name;
+      fields.asha_worker_id = currentAshaWorker.ashaId;
+      fields.asha_worker_mobile = currentAshaWorker.mobile;
+    }
+
+    detectBtn.innerHTML = '<span class="loading"></span> Analyzing...';
+    detectBtn.disabled = true;
+
+    try {
+      // Saved locally first, so nothing is lost if the upload fails
+      const entry = await Outbox.upload(await Outbox.add(fields, prepared.map(item => item.file)));
+      detectBtn.innerHTML = '🔍 Analyze Image';
+      detectBtn.disabled = false;
+
+      if (entry.status === 'pending') {
+        scheduleOutboxFlush();
+        alert('📥 Saved on this phone: ' + entry.error + '.\n\nThe analysis will be uploaded automatically and its result will appear below when it is ready.');
+        return;
+      }
+      await Outbox.remove(entry.id);
+      renderOutbox();
+      const data = entry.result || {};
+      if (data.retake) {
+        // Rejected by the local quality check: no analysis was run
+        alert('📷 Please retake the photo.\n\n' + data.error);
+        return;
+      }
+      if (entry.status === 'failed') {
+        throw new Error(entry.error);
+      }
+      showResult(data);
+    } catch (error) {
+      detectBtn.innerHTML = '🔍 Analyze Image';
+      detectBtn.disabled = false;
+      alert('❌ Error analyzing image: ' + error.message);
+    }
+  });
+
+function showResult(data) {
+      // Update basic information with fallbacks
+      diseaseText.textContent = data.disease || 'Unknown';
+      // confidenceText.textContent = data.confidence || 0;
+      descriptionText.textContent = data.description || 'No description available';
+      if (data.quality && data.quality.issues.length) {
+        // Analysed anyway, but the photo was borderline: suggest a better one
+        descriptionText.textContent += '\n\n📷 ' + data.quality.issues.map(i => i.guidance).join(' ');
+      }
+      // severity text and color
+      const severityValue = data.severity || 'Unknown';
+      severityText.textContent = severityValue;
+      // set color class depending on severity
+      const sev = (severityValue || '').toString().toLowerCase();
+      severityText.className = '';
+      if (sev.includes('high') || sev.includes('severe')) {
+        severityText.classList.add('severity-high');
+      } else if (sev.includes('medium') || sev.includes('moderate')) {
+        severityText.classList.add('severity-medium');
+      } else {
+        // default: low/very low/unknown -> green
+        severityText.classList.add('severity-low');
+      }
+
+      // Check if severity is severe and show alert
+      const isSevere = sev.includes('severe');
+      const severeAlert = document.getElementById('severeAlert');
+      const treatmentsContainer = treatmentsList.closest('.treatments');
+
+      if (isSevere) {
+        // Show severe alert
+        severeAlert.classList.remove('hidden');
+
+        // Hide and replace treatments with contact doctor message
+        treatmentsContainer.innerHTML = '';
+        const contactDoctorDiv = document.createElement('div');
+        contactDoctorDiv.className = 'contact-doctor-message';
+        contactDoctorDiv.innerHTML = `
+          <p><strong style="color: #dc2626; font-size: 1.2rem;">⚠️ Medical Attention Required</strong></p>
+          <p style="color: #991b1b; font-weight: 600;">Please contact a doctor immediately for proper diagnosis and treatment.</p>
+          <p style="margin-top: 10px; color: #b91c1c;">This condition requires immediate professional medical care.</p>
+        `;
+        treatmentsContainer.appendChild(contactDoctorDiv);
+
+        // Add click handler to close the alert
+        severeAlert.addEventListener('click', function(e) {
+          if (e.target === severeAlert) {
+            severeAlert.classList.add('hidden');
+          }
+        });
+      } else {
+        // Hide severe alert and show normal treatments
+        severeAlert.classList.add('hidden');
+
+        treatmentsContainer.innerHTML = '<p><strong>Recommended Medicines:</strong></p><ul id="treatments"></ul>';
+        const treatmentsList = document.getElementById('treatments');
+
+        // Clear and update medicines list with fallback
+        treatmentsList.innerHTML = '';
+        if (Array.isArray(data.medicines) && data.medicines.length > 0) {
+          data.medicines.forEach(medicine => {
+            const li = document.createElement('li');
+            li.textContent = medicine;
+            treatmentsList.appendChild(li);
+          });
+        } else {
+          const li = document.createElement('li');
+          li.textContent = 'No specific medicines provided';
+          treatmentsList.appendChild(li);
+        }
+      }
+
+      // Update analysis information with fallbacks
+      if (data.analysis) {
+        colorToneText.textContent = data.analysis.color_tone || 'Not analyzed';
+        textureText.textContent = data.analysis.texture || 'Not analyzed';
+        imageSizeText.textContent = data.analysis.size || 'Not analyzed';
+      } else {
+        colorToneText.textContent = 'Not analyzed';
+        textureText.textContent = 'Not analyzed';
+        imageSizeText.textContent = 'Not analyzed';
+      }
+resultBox.classList.remove('hidden');
+if (resultPlaceholder) resultPlaceholder.style.display = 'none';
+}
+
+// ---------- Offline outbox (see outbox.js and sw.js) ----------
+const outboxPanel = document.getElementById('outboxPanel');
+const outboxList = document.getElementById('outboxList');
+let outboxTimer = null;
+
+async function renderOutbox() {
+  if (!outboxPanel) return;
+  const entries = await Outbox.list();
+  outboxPanel.classList.toggle('hidden', entries.length === 0);
+  outboxList.innerHTML = '';
+  entries.forEach(entry => {
+    const li = document.createElement('li');
+    const who = entry.fields.patient_name || 'Patient';
+    const when = new Date(entry.createdAt).toLocaleTimeString();
+    if (entry.status === 'done') {
+      li.textContent = `✅ ${who} (${when}): ${entry.result.disease || 'Result ready'}, tap to view`;
+      li.className = 'outbox-done';
+      li.addEventListener('click', async () => {
+        showResult(entry.result);
+        await Outbox.remove(entry.id);
+        renderOutbox();
+      });
+    } else if (entry.status === 'failed') {
+      li.textContent = `⚠️ ${who} (${when}): ${entry.error}, tap to dismiss`;
+      li.className = 'outbox-failed';
+      li.addEventListener('click', async () => {
+        await Outbox.remove(entry.id);
+        renderOutbox();
+      });
+    } else {
+      li.textContent = `⏳ ${who} (${when}): ${entry.error || 'Uploading'}`;
+    }
+    outboxList.appendChild(li);
+  });
+}
+
+// Retry queued analyses when they are due (backoff) or when the network returns
+async function scheduleOutboxFlush() {
+  clearTimeout(outboxTimer);
+  const due = await Outbox.nextDue();
+  if (due === null) return;
+  if ('serviceWorker' in navigator && 'SyncManager' in window) {
+    const registration = await navigator.serviceWorker.ready;
+    registration.sync.register('outbox').catch(() => null);
+  }
+  outboxTimer = setTimeout(async () => {
+    await Outbox.flush();
+    scheduleOutboxFlush();
+  }, Math.max(0, due - Date.now()));
+}
+
+window.addEventListener('online', async () => {
+  await Outbox.flush(true);
+  scheduleOutboxFlush();
+});
+window.addEventListener('outbox-updated', renderOutbox);
+if ('serviceWorker' in navigator) {
+  navigator.serviceWorker.register('/sw.js').catch(err => console.warn('Service worker not registered', err));
+  navigator.serviceWorker.addEventListener('message', event => {
+    if (event.data && event.data.type === 'outbox-updated') renderOutbox();
+  });
+}
+renderOutbox();
+scheduleOutboxFlush();
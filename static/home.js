@@ -0,0 +1,1061 @@
+// ---------- Language Support ----------
+const translations = {
+  en: {
+    // Header
+    brand: "AyuScan",
+    tagline: "Village → ASHA → Scan → Doctor Cloud",
+
+    // Navigation
+    navProfile: "Profile",
+    navDashboard: "Dashboard",
+    navLogout: "Logout",
+
+    // Login
+    loginTitle: "Login – Mobile OTP",
+    loginDesc: "Enter your mobile number. We'll send a one-time PIN (simulated for demo).",
+    mobileLabel: "Mobile Number",
+    otpLabel: "Enter OTP",
+    sendOtpBtn: "Send OTP",
+    verifyOtpBtn: "Verify OTP",
+    newUserText: "New here?",
+    createAccountLink: "Create an account",
+
+    // Signup
+    signupTitle: "Create ASHA Account",
+    signupDesc: "Fill details to register.",
+    nameLabel: "Full Name",
+    ashaIdLabel: "ASHA Worker ID",
+    educationLabel: "Education Qualification",
+    yearsLabel: "Years of Service",
+    villageLabel: "Village / PHC Assigned",
+    passwordLabel: "Password",
+    confirmPasswordLabel: "Confirm Password",
+    createAccountBtn: "Create Account",
+    backToLoginBtn: "Back to login",
+
+    // Profile
+    goToDashboardBtn: "Go to Dashboard",
+    saveProfileBtn: "Save Profile",
+    resetBtn: "Reset",
+    photoLabel: "Profile Photo",
+
+    // Patient Management
+    patientSearchTitle: "Find Patient",
+    patientNameLabel: "Patient Name",
+    patientPhoneLabel: "Phone Number",
+    findPatientBtn: "Find/Create Patient",
+    patientInfoTitle: "Patient Information",
+    patientHistoryTitle: "Medical History",
+    newScanTitle: "New Medical Scan",
+    symptomsLabel: "Symptoms/Description",
+    uploadImageLabel: "Upload Scan Image",
+    uploadText: "Click to upload scan image",
+    uploadDesc: "Supported formats: JPG, PNG",
+    imagePreviewTitle: "Image Preview",
+    saveRecordBtn: "Save Patient Record",
+
+    // Dashboard
+    lastActionText: "Last action:",
+    featuresTitle: "Features",
+    featuresDesc: "Smart scanning for rural healthcare",
+    scanFeeText: "Scan Fee",
+    feeAmount: "Normal ₹30 • Priority ₹150",
+    feature1Title: "Easy Scanning",
+    feature1Desc: "ASHA captures image using smartphone + lens attachment",
+    feature2Title: "AI Analysis",
+    feature2Desc: "On-device AI gives preliminary result & urgency flag",
+    feature3Title: "Instant Feedback",
+    feature3Desc: "ASHA receives doctor advice and communicates to patient",
+    feature4Title: "Priority Service",
+    feature4Desc: "Urgent cases get immediate doctor attention",
+
+    // Disease Dashboard
+    diseaseStatsTitle: "Disease Dashboard",
+    diseaseStatsDesc: "Regional disease prevalence statistics",
+
+    footerText: "Prototype UI — adapt this HTML/CSS for Canva or PowerPoint export."
+  },
+  hi: {
+    // Header
+    brand: "आयुस्कैन",
+    tagline: "गाँव → आशा → स्कैन → डॉक्टर क्लाउड",
+
+    // Navigation
+    navProfile: "प्रोफाइल",
+    navDashboard: "डैशबोर्ड",
+    navLogout: "लॉग आउट",
+
+    // Login
+    loginTitle: "लॉगिन – मोबाइल ओटीपी",
+    loginDesc: "अपना मोबाइल नंबर दर्ज करें। हम एक बार का पिन भेजेंगे (डेमो के लिए अनुकरण)।",
+    mobileLabel: "मोबाइल नंबर",
+    otpLabel: "ओटीपी दर्ज करें",
+    sendOtpBtn: "ओटीपी भेजें",
+    verifyOtpBtn: "ओटीपी सत्यापित करें",
+    newUserText: "नए यहाँ हैं?",
+    createAccountLink: "खाता बनाएं",
+
+    // Signup
+    signupTitle: "आशा खाता बनाएं",
+    signupDesc: "पंजीकरण के लिए विवरण भरें।",
+    nameLabel: "पूरा नाम",
+    ashaIdLabel: "आशा कार्यकर्ता आईडी",
+    educationLabel: "शैक्षिक योग्यता",
+    yearsLabel: "सेवा के वर्ष",
+    villageLabel: "गाँव / पीएचसी सौंपा गया",
+    passwordLabel: "पासवर्ड",
+    confirmPasswordLabel: "पासवर्ड की पुष्टि करें",
+    createAccountBtn: "खाता बनाएं",
+    backToLoginBtn: "लॉगिन पर वापस जाएं",
+
+    // Profile
+    goToDashboardBtn: "डैशबोर्ड पर जाएं",
+    saveProfileBtn: "प्रोफाइल सहेजें",
+    resetBtn: "रीसेट",
+    photoLabel: "प्रोफाइल फोटो",
+
+    // Patient Management
+    patientSearchTitle: "रोगी ढूंढें",
+    patientNameLabel: "रोगी का नाम",
+    patientPhoneLabel: "फोन नंबर",
+    findPatientBtn: "रोगी ढूंढें/बनाएँ",
+    patientInfoTitle: "रोगी की जानकारी",
+    patientHistoryTitle: "चिकित्सा इतिहास",
+    newScanTitle: "नई मेडिकल स्कैन",
+    symptomsLabel: "लक्षण/विवरण",
+    uploadImageLabel: "स्कैन छवि अपलोड करें",
+    uploadText: "स्कैन छवि अपलोड करने के लिए क्लिक करें",
+    uploadDesc: "समर्थित प्रारूप: JPG, PNG",
+    imagePreviewTitle: "छवि पूर्वावलोकन",
+    saveRecordBtn: "रोगी रिकॉर्ड सहेजें",
+
+    // Dashboard
+    lastActionText: "अंतिम कार्रवाई:",
+    featuresTitle: "विशेषताएं",
+    featuresDesc: "ग्रामीण स्वास्थ्य सेवा के लिए स्मार्ट स्कैनिंग",
+    scanFeeText: "स्कैन शुल्क",
+    feeAmount: "सामान्य ₹30 • प्राथमिकता ₹150",
+    feature1Title: "आसान स्कैनिंग",
+    feature1Desc: "आशा स्मार्टफोन + लेंस का उपयोग कर छवि कैप्चर करती है",
+    feature2Title: "एआई विश्लेषण",
+    feature2Desc: "डिवाइस पर एआई प्रारंभिक परिणाम और तात्कालिकता ध्वज देता है",
+    feature3Title: "तत्काल प्रतिक्रिया",
+    feature3Desc: "आशा को डॉक्टर की सलाह मिलती है और रोगी को संप्रेषित करती है",
+    feature4Title: "प्राथमिकता सेवा",
+    feature4Desc: "तत्काल मामलों को तुरंत डॉक्टर की सहायता मिलती है",
+
+    // Disease Dashboard
+    diseaseStatsTitle: "रोग डैशबोर्ड",
+    diseaseStatsDesc: "क्षेत्रीय रोग व्यापकता सांख्यिकी",
+
+    footerText: "प्रोटोटाइप UI — कैनवा या PowerPoint निर्यात के लिए इस HTML/CSS को अनुकूलित करें।"
+  },
+  kn: {
+    // Header
+    brand: "ಆಯುಸ್ಕ್ಯಾನ್",
+    tagline: "ಗ್ರಾಮ → ಆಶಾ → ಸ್ಕ್ಯಾನ್ → ಡಾಕ್ಟರ್ ಕ್ಲೌಡ್",
+
+    // Navigation
+    navProfile: "ಪ್ರೊಫೈಲ್",
+    navDashboard: "ಡ್ಯಾಶ್ಬೋರ್ಡ್",
+    navLogout: "ಲಾಗ್ ಔಟ್",
+
+    // Login
+    loginTitle: "ಲಾಗಿನ್ – ಮೊಬೈಲ್ OTP",
+    loginDesc: "ನಿಮ್ಮ ಮೊಬೈಲ್ ಸಂಖ್ಯೆಯನ್ನು ನಮೂದಿಸಿ. ನಾವು ಒಂದು-ಬಾರಿ ಪಿನ್ ಕಳುಹಿಸುತ್ತೇವೆ (ಡೆಮೊಗಾಗಿ ಅನುಕರಣೆ).",
+    mobileLabel: "ಮೊಬೈಲ್ ಸಂಖ್ಯೆ",
+    otpLabel: "OTP ನಮೂದಿಸಿ",
+    sendOtpBtn: "OTP ಕಳುಹಿಸಿ",
+    verifyOtpBtn: "OTP ಪರಿಶೀಲಿಸಿ",
+    newUserText: "ಹೊಸಬರೇ?",
+    createAccountLink: "ಖಾತೆ ರಚಿಸಿ",
+
+    // Signup
+    signupTitle: "ಆಶಾ ಖಾತೆ ರಚಿಸಿ",
+    signupDesc: "ನೋಂದಣಿಗಾಗಿ ವಿವರಗಳನ್ನು ಭರ್ತಿ ಮಾಡಿ.",
+    nameLabel: "ಪೂರ್ಣ ಹೆಸರು",
+    ashaIdLabel: "ಆಶಾ ಕಾರ್ಮಿಕ ID",
+    educationLabel: "ಶಿಕ್ಷಣ ಅರ್ಹತೆ",
+    yearsLabel: "ಸೇವೆಯ ವರ್ಷಗಳು",
+    villageLabel: "ಗ್ರಾಮ / PHC ನಿಯೋಜಿಸಲಾಗಿದೆ",
+    passwordLabel: "ಪಾಸ್ವರ್ಡ್",
+    confirmPasswordLabel: "ಪಾಸ್ವರ್ಡ್ ದೃಢೀಕರಿಸಿ",
+    createAccountBtn: "ಖಾತೆ ರಚಿಸಿ",
+    backToLoginBtn: "ಲಾಗಿನ್ಗೆ ಹಿಂತಿರುಗಿ",
+
+    // Profile
+    goToDashboardBtn: "ಡ್ಯಾಶ್ಬೋರ್ಡ್ಗೆ ಹೋಗಿ",
+    saveProfileBtn: "ಪ್ರೊಫೈಲ್ ಉಳಿಸಿ",
+    resetBtn: "ರೀಸೆಟ್",
+    photoLabel: "ಪ್ರೊಫೈಲ್ ಫೋಟೋ",
+
+    // Patient Management
+    patientSearchTitle: "ರೋಗಿಯನ್ನು ಹುಡುಕಿ",
+    patientNameLabel: "ರೋಗಿಯ ಹೆಸರು",
+    patientPhoneLabel: "ಫೋನ್ ನಂಬರ",
+    findPatientBtn: "ರೋಗಿಯನ್ನು ಹುಡುಕಿ/ರಚಿಸಿ",
+    patientInfoTitle: "ರೋಗಿಯ ಮಾಹಿತಿ",
+    patientHistoryTitle: "ವೈದ್ಯಕೀಯ ಇತಿಹಾಸ",
+    newScanTitle: "ಹೊಸ ವೈದ್ಯಕೀಯ ಸ್ಕ್ಯಾನ್",
+    symptomsLabel: "ಲಕ್ಷಣಗಳು/ವಿವರಣೆ",
+    uploadImageLabel: "ಸ್ಕ್ಯಾನ್ ಚಿತ್ರ ಅಪ್ಲೋಡ್ ಮಾಡಿ",
+    uploadText: "ಸ್ಕ್ಯಾನ್ ಚಿತ್ರ ಅಪ್ಲೋಡ್ ಮಾಡಲು ಕ್ಲಿಕ್ ಮಾಡಿ",
+    uploadDesc: "ಬೆಂಬಲಿತ ರೂಪಗಳು: JPG, PNG",
+    imagePreviewTitle: "ಚಿತ್ರ ಪೂರ್ವವೀಕ್ಷಣೆ",
+    saveRecordBtn: "ರೋಗಿ ರೆಕಾರ್ಡ್ ಸೇವ್ ಮಾಡಿ",
+
+    // Dashboard
+    lastActionText: "ಕೊನೆಯ ಕ್ರಿಯೆ:",
+    featuresTitle: "ವೈಶಿಷ್ಟ್ಯಗಳು",
+    featuresDesc: "ಗ್ರಾಮೀಣ ಆರೋಗ್ಯ ಸಂರಕ್ಷಣೆಗೆ ಸ್ಮಾರ್ಟ್ ಸ್ಕ್ಯಾನಿಂಗ್",
+    scanFeeText: "ಸ್ಕ್ಯಾನ್ ಶುಲ್ಕ",
+    feeAmount: "ಸಾಮಾನ್ಯ ₹30 • ಪ್ರಾಥಮಿಕತೆ ₹150",
+    feature1Title: "ಸುಲಭ ಸ್ಕ್ಯಾನಿಂಗ್",
+    feature1Desc: "ಆಶಾ ಸ್ಮಾರ್ಟ್ಫೋನ್ + ಲೆನ್ಸ್ ಬಳಸಿ ಚಿತ್ರವನ್ನು ಕ್ಯಾಪ್ಚರ್ ಮಾಡುತ್ತಾರೆ",
+    feature2Title: "AI ವಿಶ್ಲೇಷಣೆ",
+    feature2Desc: "ಡಿವೈಸ್ನಲ್ಲಿರುವ AI ಪ್ರಾಥಮಿಕ ಫಲಿತಾಂಶ ಮತ್ತು ತುರ್ತು ಫ್ಲ್ಯಾಗ್ ನೀಡುತ್ತದೆ",
+    feature3Title: "ತ್ವರಿತ ಪ್ರತಿಕ್ರಿಯೆ",
+    feature3Desc: "ಆಶಾಗೆ ಡಾಕ್ಟರ್ ಸಲಹೆ ಸಿಕ್ಕು ರೋಗಿಗೆ ತಿಳಿಸುತ್ತಾರೆ",
+    feature4Title: "ಪ್ರಾಥಮಿಕತೆ ಸೇವೆ",
+    feature4Desc: "ತುರ್ತು ಪ್ರಕರಣಗಳಿಗೆ ತಕ್ಷಣ ಡಾಕ್ಟರ್ ಗಮನ ಸಿಗುತ್ತದೆ",
+
+    // Disease Dashboard
+    diseaseStatsTitle: "ರೋಗ ಡ್ಯಾಶ್ಬೋರ್ಡ್",
+    diseaseStatsDesc: "ಪ್ರಾದೇಶಿಕ ರೋಗ ಹರಡುವಿಕೆ ಅಂಕಿಅಂಶಗಳು",
+
+    footerText: "ಪ್ರೋಟೋಟೈಪ್ UI — ಕ್ಯಾನ್ವಾ ಅಥವಾ PowerPoint ರಫ್ತುಗಾಗಿ ಈ HTML/CSS ಅನ್ನು ಅಳವಡಿಸಿಕೊಳ್ಳಿ."
+  }
+};
+
+// Current language
+let currentLanguage = 'en';
+
+// Language functions
+function setLanguage(lang) {
+  currentLanguage = lang;
+  localStorage.setItem('ayuscan_language', lang);
+  updateLanguageUI();
+  translatePage();
+}
+
+function updateLanguageUI() {
+  const langTexts = {
+    en: 'English',
+    hi: 'हिन्दी',
+    kn: 'ಕನ್ನಡ'
+  };
+  document.getElementById('currentLangText').textContent = langTexts[currentLanguage];
+}
+
+function translatePage() {
+  const elements = document.querySelectorAll('[data-key]');
+  elements.forEach(element => {
+    const key = element.getAttribute('data-key');
+    if (translations[currentLanguage] && translations[currentLanguage][key]) {
+      if (element.tagName === 'INPUT' && element.hasAttribute('placeholder')) {
+        element.placeholder = translations[currentLanguage][key];
+      } else {
+        element.textContent = translations[currentLanguage][key];
+      }
+    }
+  });
+}
+
+// Language selector toggle
+document.getElementById('currentLanguage').addEventListener('click', function() {
+  document.getElementById('languageDropdown').classList.toggle('show');
+});
+
+// Language option selection
+document.querySelectorAll('.language-option').forEach(option => {
+  option.addEventListener('click', function() {
+    const lang = this.getAttribute('data-lang');
+    setLanguage(lang);
+    document.getElementById('languageDropdown').classList.remove('show');
+  });
+});
+
+// Close dropdown when clicking outside
+document.addEventListener('click', function(event) {
+  const languageSelector = document.querySelector('.language-selector');
+  if (!languageSelector.contains(event.target)) {
+    document.getElementById('languageDropdown').classList.remove('show');
+  }
+});
+
+// ---------- Patient Management Functions ----------
+let currentPatient = null;
+let currentScanImage = null;
+function findPatient() {
+  const name = document.getElementById('patientName').value.trim();
+  const phone = document.getElementById('patientPhone').value.trim();
+
+  // Validate phone if provided (digits, optional leading +, and dashes only)
+  const phoneRegex = /^[6-9]\d{9}$/;
+  if (phone && !phoneRegex.test(phone)) {
+    alert('Please enter a valid phone number (digits, optional + and - only).');
+    return;
+  }
+
+  if (!name && !phone) {
+    alert('Please enter patient name or phone number');
+    return;
+  }
+
+  // Try to add/find patient in MongoDB
+  fetch('/add_patient', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({
+      name: name,
+      phone: phone,
+      village: (loadUsers()[getCurrentUser()] || {}).village || null
+    })
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.error) {
+      throw new Error(data.error);
+    }
+
+    // Show popup message
+    alert(data.message);
+
+    if (data.user) {
+      // Use the userInfoCard as the single source of patient info and disease history
+      const user = data.user;
+      currentPatient = user;
+      displayUserInfo(user);
+
+      // Display disease history inside the userInfoCard only
+      if (user.diseases && user.diseases.length > 0) {
+        displayDiseaseHistory(user.diseases);
+      } else {
+        // clear disease list if none
+        const diseaseList = document.getElementById('diseaseList');
+        if (diseaseList) diseaseList.innerHTML = '<p class="muted">No disease records found.</p>';
+      }
+
+      // Ensure the separate patientInfo card is hidden to avoid duplicate info
+      const patientInfoEl = document.getElementById('patientInfo');
+      if (patientInfoEl) patientInfoEl.classList.add('hidden');
+
+      // Show the main userInfoCard with AI detection button
+      document.getElementById('userInfoCard').style.display = 'block';
+    } else {
+      // Hide user info if there's no user data
+      document.getElementById('userInfoCard').style.display = 'none';
+      currentPatient = null;
+    }
+    appendLog(`Patient ${data.success ? 'added to' : 'found in'} database: ${name}`);
+  })
+  .catch(error => {
+    // Offline: fall back to the locally synced village roster
+    const cached = findInRoster(name, phone);
+    if (cached) {
+      currentPatient = cached;
+      displayUserInfo(cached);
+      displayDiseaseHistory(cached.diseases);
+      document.getElementById('userInfoCard').style.display = 'block';
+      appendLog(`Patient found in offline roster: ${cached.username}`);
+      return;
+    }
+    console.error('Error with patient database:', error);
+    appendLog(`Error with patient database: ${error.message}`);
+    alert('Error: ' + error.message);
+  });
+}
+
+// ---------- Offline village roster ----------
+// Snapshot on first download, then only rows changed or deleted since `change_token`.
+const LS_ROSTER = 'ayuscan_roster_v1';
+
+function loadRoster(){
+  try { return JSON.parse(localStorage.getItem(LS_ROSTER) || 'null'); }
+  catch(e){ return null; }
+}
+
+async function syncRoster(){
+  const cur = getCurrentUser();
+  if(!cur) return;
+  const stored = loadRoster();
+  const roster = (stored && stored.mobile === cur) ? stored : { mobile: cur, token: null, patients: {} };
+  try {
+    const result = await fetchJSON('/roster', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ mobile: cur, since: roster.token })
+    });
+    if(!result.success) return;
+    if(result.full) roster.patients = {};
+    for(const row of result.patients) roster.patients[row[0]] = row;
+    // Patients deleted or merged into another record since the last sync
+    for(const id of result.deleted || []) delete roster.patients[id];
+    roster.token = result.change_token;
+    localStorage.setItem(LS_ROSTER, JSON.stringify(roster));
+    appendLog(`Roster synced: ${result.patients.length} ${result.full ? 'patients' : 'updates'}`);
+  } catch(error) {
+    appendLog('Roster sync skipped (offline)');
+  }
+}
+
+function findInRoster(name, phone){
+  const roster = loadRoster();
+  if(!roster) return null;
+  const wantName = (name || '').toLowerCase();
+  // Stored phones are digits only (user_schema.normalize_phone)
+  const wantPhone = (phone || '').replace(/\D/g, '');
+  for(const row of Object.values(roster.patients)){
+    const [id, username, rowPhone, updated, detections] = row;
+    if(wantName && (username || '').toLowerCase() !== wantName) continue;
+    if(wantPhone && rowPhone !== wantPhone) continue;
+    return {
+      username, phone: rowPhone,
+      diseases: detections.map(([dname, detected]) => ({ name: dname, detected_at: detected ? new Date(detected).toISOString() : null }))
+    };
+  }
+  return null;
+}
+
+function displayUserInfo(patient) {
+  const userInfo = document.getElementById('userInfo');
+  userInfo.innerHTML = `
+    <div class="info-item"><strong>Name:</strong> ${patient.username || patient.name}</div>
+    <div class="info-item"><strong>Phone:</strong> ${patient.phone}</div>
+    <div class="info-item"><strong>Status:</strong> ${patient.diseases && patient.diseases.length > 0 ? 'Has medical history' : 'No medical history'}</div>
+  `;
+}
+
+function displayDiseaseHistory(diseases) {
+  const diseaseList = document.getElementById('diseaseList');
+  if (!diseases || diseases.length === 0) {
+    diseaseList.innerHTML = '<p class="muted">No disease records found. Use AI Detection to add medical records.</p>';
+    return;
+  }
+
+  const historyHtml = diseases.map(disease => `
+    <div class="history-item">
+      <div><strong>Disease:</strong> ${disease.name}</div>
+      <div><strong>Detected:</strong> ${new Date(disease.detected_at).toLocaleDateString()}</div>
+    </div>
+  `).join('');
+
+  diseaseList.innerHTML = historyHtml;
+}
+
+// Add some CSS styles for better display
+const style = document.createElement('style');
+style.textContent = `
+  .info-item {
+    margin: 8px 0;
+    padding: 8px;
+    background: #f8f9fa;
+    border-radius: 6px;
+  }
+  .history-item {
+    margin: 10px 0;
+    padding: 12px;
+    background: #f0f7f7;
+    border-radius: 8px;
+    border-left: 4px solid #0ea5a1;
+  }
+  .muted {
+    color: #6c757d;
+    font-style: italic;
+  }
+`;
+document.head.appendChild(style);
+
+function goToDiseaseDection() {
+  if (!currentPatient) {
+    alert('Please find or create a patient first');
+    return;
+  }
+
+  // Store a normalized patient object in localStorage for the detection page
+  const normalized = {
+    name: currentPatient.username || currentPatient.name || currentPatient.username,
+    phone: currentPatient.phone || currentPatient.phone
+  };
+  localStorage.setItem('currentPatient', JSON.stringify(normalized));
+  window.location.href = '/detection';
+}
+
+function displayPatientInfo(patient) {
+  const patientInfo = document.getElementById('patientInfo');
+  const patientDetails = document.getElementById('patientDetails');
+
+  patientDetails.innerHTML = `
+    <div><strong>Name:</strong> ${patient.name}</div>
+    <div><strong>Phone:</strong> ${patient.phone}</div>
+    <div><strong>Total Visits:</strong> ${patient.history ? patient.history.length : 0}</div>
+    <div><strong>Last Visit:</strong> ${patient.history && patient.history.length > 0 ? 
+      new Date(patient.history[patient.history.length-1].date).toLocaleDateString() : 'Never'}</div>
+  `;
+
+  patientInfo.classList.remove('hidden');
+}
+
+function displayPatientHistory(patient) {
+  const patientHistory = document.getElementById('patientHistory');
+  const historyList = document.getElementById('historyList');
+
+  if (!patient.history || patient.history.length === 0) {
+    historyList.innerHTML = '<div class="muted">No medical history found</div>';
+  } else {
+    historyList.innerHTML = patient.history.map(record => `
+      <div class="history-item">
+        <div><strong>Date:</strong> ${new Date(record.date).toLocaleDateString()}</div>
+        <div><strong>Symptoms:</strong> ${record.symptoms}</div>
+        <div><strong>Image:</strong> ${record.image ? 'Yes' : 'No'}</div>
+        ${record.aiAnalysis ? `<div><strong>AI Analysis:</strong> ${record.aiAnalysis}</div>` : ''}
+      </div>
+    `).join('');
+  }
+
+  patientHistory.classList.remove('hidden');
+}
+
+function showNewScanSection() {
+  document.getElementById('newScanSection').classList.remove('hidden');
+}
+
+// upload.js falls back to the original file when resizing fails; do the same
+// if it did not load at all (e.g. an offline copy of an older page)
+function resizeForUpload(file, purpose) {
+  if (typeof window.prepareUpload !== 'function') return Promise.resolve({ file, originalBytes: file.size });
+  return window.prepareUpload(file, purpose);
+}
+
+async function handleImageUpload(event) {
+  const original = event.target.files[0];
+  if (!original) return;
+  // Keep only the downscaled copy in memory (see upload.js)
+  const { file } = await resizeForUpload(original, 'scan');
+
+  const reader = new FileReader();
+  reader.onload = function(e) {
+    currentScanImage = e.target.result;
+    const preview = document.getElementById('imagePreview');
+    preview.innerHTML = `<img src="${currentScanImage}" alt="Scan preview" style="max-width:100%;max-height:100%;border-radius:8px" />`;
+    preview.classList.remove('hidden');
+    appendLog('Scan image uploaded');
+  };
+  reader.readAsDataURL(file);
+}
+
+function savePatientRecord() {
+  if (!currentPatient) {
+    alert('No patient selected');
+    return;
+  }
+
+  const symptoms = document.getElementById('symptoms').value.trim();
+  if (!symptoms) {
+    alert('Please describe symptoms');
+    return;
+  }
+
+  // Simulate AI analysis
+  const conditions = ['Fungal Infection', 'Bacterial Infection', 'Viral Rash', 'Allergic Reaction', 'Normal Skin'];
+  const confidence = Math.floor(70 + Math.random() * 25);
+  const aiAnalysis = `${conditions[Math.floor(Math.random() * conditions.length)]} (${confidence}% confidence)`;
+
+  // Add the disease record to MongoDB
+  fetch('/add_disease', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({
+      username: currentPatient.name,
+      disease_name: aiAnalysis
+    })
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.error) {
+      throw new Error(data.error);
+    }
+
+    // Reset form
+    document.getElementById('symptoms').value = '';
+    document.getElementById('scanImage').value = '';
+    document.getElementById('imagePreview').classList.add('hidden');
+    currentScanImage = null;
+
+    appendLog(`New record saved for ${currentPatient.name}. AI Analysis: ${aiAnalysis}`);
+    alert('Patient record saved successfully!');
+  })
+  .catch(error => {
+    alert('Error saving patient record: ' + error.message);
+  });
+}
+
+// ---------- Simple client-side auth & storage ----------
+// Users are stored in localStorage as {mobile: {...profile..., password}}
+const LS_USERS = 'ayuscan_users_v1';
+const LS_CURRENT = 'ayuscan_current_user_v1';
+
+// Utility helpers
+function qs(id){ return document.getElementById(id) }
+
+// JSON API call. Large responses arrive gzip/br-compressed (decoded by the
+// browser); the server can also answer in MessagePack/CBOR, so ask for JSON.
+async function fetchJSON(url, options = {}){
+  const headers = Object.assign({ 'Accept': 'application/json' }, options.headers || {});
+  const response = await fetch(url, Object.assign({}, options, { headers }));
+  return response.json();
+}
+function showView(viewId){
+  // hide all view-* elements
+  const views = document.querySelectorAll('[id^="view-"], #view-dashboard, #view-profile');
+  views.forEach(v => v.classList.add('hidden'));
+  // show requested view
+  qs(viewId === 'dashboard' ? 'view-dashboard' : (viewId === 'profile' ? 'view-profile' : ('view-' + viewId))).classList.remove('hidden');
+
+  // toggle nav
+  const nav = qs('navBar');
+  if(viewId === 'login' || viewId === 'signup') nav.classList.add('hidden'); else nav.classList.remove('hidden');
+}
+
+function loadUsers(){
+  try { return JSON.parse(localStorage.getItem(LS_USERS) || '{}'); }
+  catch(e){ return {}; }
+}
+function saveUsers(u){ localStorage.setItem(LS_USERS, JSON.stringify(u)); }
+
+function setCurrentUser(mobile){
+  localStorage.setItem(LS_CURRENT, mobile);
+  renderTopRight();
+}
+function getCurrentUser(){
+  return localStorage.getItem(LS_CURRENT);
+}
+function clearCurrentUser(){
+  localStorage.removeItem(LS_CURRENT);
+  renderTopRight();
+}
+
+// Navigation helper
+function goTo(view){
+  if(view === 'login') {
+    showView('login');
+  } else if(view === 'signup') {
+    showView('signup');
+  } else if(view === 'dashboard') {
+    populateDashboard();
+    showView('dashboard');
+  } else if(view === 'profile') {
+    populateProfile();
+    showView('profile');
+  }
+}
+
+// initial startup view
+(function init(){
+  // Set language from storage or default to English
+  const savedLang = localStorage.getItem('ayuscan_language');
+  if (savedLang) {
+    setLanguage(savedLang);
+  } else {
+    setLanguage('en');
+  }
+
+  // if logged in -> dashboard else login
+  if(getCurrentUser()){
+    goTo('dashboard');
+  } else {
+    goTo('login');
+  }
+})();
+
+// Top-right header area
+function renderTopRight(){
+  const top = qs('topRight');
+  const cur = getCurrentUser();
+  top.innerHTML = '';
+  if(cur){
+    const users = loadUsers();
+    const u = users[cur];
+    const span = document.createElement('div');
+    span.style.display = 'flex'; span.style.gap = '12px'; span.style.alignItems = 'center';
+    const small = document.createElement('div');
+    small.innerHTML = `<div style="font-weight:700">${u.name}</div><div class="muted">ASHA ID: ${u.ashaId}</div>`;
+    span.appendChild(small);
+    top.appendChild(span);
+  } else {
+    top.innerHTML = '<div class="muted">Not signed in</div>';
+  }
+}
+
+// ---------- Signup ----------
+async function createAccount(){
+  const name = qs('suName').value.trim();
+  const ashaId = qs('suAshaId').value.trim();
+  const mobile = qs('suMobile').value.trim();
+  const education = qs('suEducation').value.trim();
+  const years = qs('suYears').value.trim();
+  const village = qs('suVillage').value.trim();
+  const pw = qs('suPassword').value;
+  const pw2 = qs('suPassword2').value;
+
+  // Phone number validation (digits, optional leading +, and dashes only)
+  const phoneRegex = /^[6-9]\d{9}$/;
+  if(mobile && !phoneRegex.test(mobile)) return alert('Please enter a valid phone number (digits, optional + and - only).');
+
+  if(!name || !mobile || !ashaId || !pw) return alert('Please fill name, ASHA ID, mobile and password.');
+
+  if(pw !== pw2) return alert('Passwords do not match.');
+
+  // Register with backend API
+  try {
+    const response = await fetch('/register_asha_worker', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ name, ashaId, mobile, education, years: parseInt(years) || 0, village, password: pw })
+    });
+
+    const result = await response.json();
+    alert(result.message || (result.success ? 'Account created successfully!' : 'Failed to create account'));
+
+    if(result.success) {
+      // Store in localStorage for session management
+      const userData = { name: result.worker.name, ashaId: result.worker.asha_id, mobile: result.worker.mobile, 
+                        education: result.worker.education, years: result.worker.years, village: result.worker.village, photo: result.worker.photo_url || '' };
+      const users = loadUsers();
+      users[mobile] = userData;
+      saveUsers(users);
+
+      // prefill login mobile
+      qs('loginMobile').value = mobile;
+      goTo('login');
+    }
+  } catch(error) {
+    alert('Error creating account: ' + error.message);
+  }
+}
+
+// ---------- Login via OTP (simulated) ----------
+let currentOtp = null;
+async function sendOtp(){
+  const mobile = qs('loginMobile').value.trim();
+  if(!mobile) return alert('Enter mobile number.');
+
+  // Check if worker exists in database
+  try {
+    const response = await fetch('/get_asha_worker', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ mobile })
+    });
+
+    const result = await response.json();
+    if(!result.success) {
+      alert('No account found for this mobile. Create account first.');
+      return;
+    }
+
+    // simulate OTP generation and "send"
+    currentOtp = String(Math.floor(1000 + Math.random()*9000));
+    console.log('Simulated OTP for demo:', currentOtp);
+    alert('Simulated OTP (for demo): ' + currentOtp);
+
+    // show OTP input
+    qs('otpSection').classList.remove('hidden');
+    qs('sendOtpBtn').classList.add('hidden');
+    qs('verifyOtpBtn').classList.remove('hidden');
+  } catch(error) {
+    alert('Error checking account: ' + error.message);
+  }
+}
+
+async function verifyOtp(){
+  const entered = qs('loginOtp').value.trim();
+  if(!entered) return alert('Enter OTP.');
+  if(entered !== currentOtp) return alert('Invalid OTP. Try again.');
+
+  // Login via API
+  const mobile = qs('loginMobile').value.trim();
+  try {
+    const response = await fetch('/login_asha_worker', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ mobile, otp: entered })
+    });
+
+    const result = await response.json();
+    if(result.success && result.worker) {
+      // Store in localStorage for session management
+      const userData = { name: result.worker.name, ashaId: result.worker.asha_id, mobile: result.worker.mobile, 
+                        education: result.worker.education, years: result.worker.years, village: result.worker.village, photo: result.worker.photo_url || '' };
+      const users = loadUsers();
+      users[mobile] = userData;
+      saveUsers(users);
+
+      setCurrentUser(mobile);
+      currentOtp = null;
+      qs('loginOtp').value = '';
+      qs('loginMobile').value = '';
+      qs('otpSection').classList.add('hidden');
+      qs('sendOtpBtn').classList.remove('hidden');
+      qs('verifyOtpBtn').classList.add('hidden');
+      goTo('dashboard');
+      appendLog('Logged in as ' + mobile);
+    } else {
+      alert(result.message || 'Login failed');
+    }
+  } catch(error) {
+    alert('Login error: ' + error.message);
+  }
+}
+
+function logout(){
+  clearCurrentUser();
+  goTo('login');
+}
+
+// ---------- Profile handling ----------
+function populateProfile(){
+  const cur = getCurrentUser();
+  if(!cur) { goTo('login'); return; }
+  const users = loadUsers();
+  const u = users[cur];
+  qs('profileName').textContent = u.name || 'ASHA Worker';
+  qs('profileAshaId').textContent = 'ID: ' + (u.ashaId || '-');
+
+  qs('pfName').value = u.name || '';
+  qs('pfAshaId').value = u.ashaId || '';
+  qs('pfMobile').value = u.mobile || '';
+  qs('pfEducation').value = u.education || '';
+  qs('pfYears').value = u.years || '';
+  qs('pfVillage').value = u.village || '';
+
+  if(u.photo){
+    qs('photoPreview').innerHTML = `<img src="${u.photo}" alt="photo" style="width:160px;border-radius:8px" />`;
+    qs('profileAvatar').textContent = '';
+    qs('dashAvatar').style.backgroundImage = `url(${u.photo})`;
+    qs('dashAvatar').textContent = '';
+  } else {
+    qs('photoPreview').innerHTML = '';
+    qs('profileAvatar').textContent = (u.name||'A').charAt(0).toUpperCase();
+    qs('dashAvatar').textContent = (u.name||'A').charAt(0).toUpperCase();
+  }
+  renderTopRight();
+}
+
+async function saveProfile(){
+  const cur = getCurrentUser();
+  if(!cur) return alert('No user logged in');
+
+  const name = qs('pfName').value.trim();
+  const ashaId = qs('pfAshaId').value.trim();
+  const mobile = qs('pfMobile').value.trim();
+  const education = qs('pfEducation').value.trim();
+  const years = qs('pfYears').value.trim();
+  const village = qs('pfVillage').value.trim();
+
+  // Update in database
+  try {
+    const response = await fetch('/update_asha_worker', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ mobile: cur, name, asha_id: ashaId, mobile, education, years: parseInt(years) || 0, village })
+    });
+
+    const result = await response.json();
+    if(result.success) {
+      // Update localStorage for session management
+      const users = loadUsers();
+      users[cur] = { name, ashaId, mobile, education, years: parseInt(years) || 0, village, photo: users[cur]?.photo || '' };
+      saveUsers(users);
+
+      alert('Profile saved.');
+      populateProfile();
+    } else {
+      alert(result.message || 'Failed to save profile');
+    }
+  } catch(error) {
+    alert('Error saving profile: ' + error.message);
+  }
+}
+
+function resetProfile(){
+  populateProfile();
+}
+
+async function loadProfilePhoto(e){
+  const original = e.target.files[0];
+  if(!original) return;
+  const cur = getCurrentUser();
+  if(!cur) return;
+  // The server keeps a small thumbnail, so only upload that much
+  const { file, originalBytes } = await resizeForUpload(original, 'profile');
+
+  // Upload the file; the server stores a resized copy and returns its URL,
+  // so only the short URL is kept in localStorage and the worker record.
+  const formData = new FormData();
+  formData.append('mobile', cur);
+  formData.append('photo', file);
+  formData.append('original_bytes', originalBytes);
+  try {
+    const response = await fetch('/upload_asha_worker_photo', { method: 'POST', body: formData });
+    const result = await response.json();
+    if(!result.success || !result.worker) {
+      alert(result.message || result.error || 'Failed to upload photo');
+      return;
+    }
+    const users = loadUsers();
+    users[cur].photo = result.worker.photo_url || '';
+    saveUsers(users);
+    populateProfile();
+  } catch(error) {
+    alert('Error uploading photo: ' + error.message);
+  }
+}
+
+// ---------- Dashboard population ----------
+function populateDashboard(){
+  const cur = getCurrentUser();
+  if(!cur) { goTo('login'); return; }
+  const users = loadUsers();
+  const u = users[cur];
+  qs('dashName').textContent = u.name || 'ASHA Worker';
+  qs('dashMobile').textContent = '+91 ' + (u.mobile || '-');
+  if(u.photo){
+    qs('dashAvatar').style.backgroundImage = `url(${u.photo})`;
+    qs('dashAvatar').textContent = '';
+  } else {
+    qs('dashAvatar').style.backgroundImage = '';
+    qs('dashAvatar').textContent = (u.name||'A').charAt(0).toUpperCase();
+  }
+  renderTopRight();
+  syncRoster();
+
+  // Load disease statistics when dashboard is shown
+  loadDiseaseStatistics();
+}
+
+// ---------- Disease Statistics ----------
+async function loadDiseaseStatistics() {
+  try {
+    const result = await fetchJSON('/get_disease_statistics');
+
+    if (result.error) {
+      throw new Error(result.error);
+    }
+
+    if (result.success && result.statistics) {
+      const stats = result.statistics;
+
+      // Update summary cards
+      document.getElementById('totalPatients').textContent = stats.total_patients || 0;
+      document.getElementById('totalDetections').textContent = stats.total_detections || 0;
+      document.getElementById('uniqueDiseases').textContent = stats.unique_diseases || 0;
+
+      // Build disease list
+      const diseaseList = document.getElementById('diseaseStatsList');
+      const diseaseCounts = stats.disease_counts || {};
+
+      if (Object.keys(diseaseCounts).length === 0) {
+        diseaseList.innerHTML = `
+          <div style="text-align:center;padding:20px;color:var(--muted)">
+            <div style="font-size:48px">📊</div>
+            <div>No disease data available yet</div>
+          </div>
+        `;
+        return;
+      }
+
+      // Create disease items with color coding
+      let html = '<div style="display:grid;gap:8px">';
+
+      for (const [disease, count] of Object.entries(diseaseCounts)) {
+        // Determine color based on count
+        let colorClass = 'disease-low';
+        let bgColor = '#f0fdf4';
+        let textColor = '#15803d';
+        let borderColor = '#86efac';
+
+        if (count >= 50) {
+          colorClass = 'disease-critical';
+          bgColor = '#fef2f2';
+          textColor = '#991b1b';
+          borderColor = '#fca5a5';
+        } else if (count >= 30) {
+          colorClass = 'disease-high';
+          bgColor = '#fff7ed';
+          textColor = '#c2410c';
+          borderColor = '#fdba74';
+        } else if (count >= 15) {
+          colorClass = 'disease-medium';
+          bgColor = '#fef9c3';
+          textColor = '#b45309';
+          borderColor = '#fde047';
+        }
+
+        html += `
+          <div class="${colorClass}" style="
+            display:flex;
+            justify-content:space-between;
+            align-items:center;
+            padding:12px 16px;
+            background:${bgColor};
+            border-left:4px solid ${borderColor};
+            border-radius:8px;
+            transition:all 0.2s ease;
+          ">
+            <div style="flex:1">
+              <div style="font-weight:600;color:${textColor}">${disease}</div>
+              <div class="muted" style="font-size:12px;margin-top:2px">
+                ${count >= 50 ? '🚨 Critical Alert' : 
+                  count >= 30 ? '⚠️ High Prevalence' : 
+                  count >= 15 ? '⚡ Moderate Cases' : 
+                  '✓ Low Cases'}
+              </div>
+            </div>
+            <div style="
+              font-size:24px;
+              font-weight:700;
+              color:${textColor};
+              min-width:60px;
+              text-align:right;
+            ">${count}</div>
+          </div>
+        `;
+      }
+
+      html += '</div>';
+      diseaseList.innerHTML = html;
+
+      appendLog(`Disease statistics loaded: ${stats.unique_diseases} unique diseases, ${stats.total_detections} total cases`);
+    }
+  } catch (error) {
+    console.error('Error loading disease statistics:', error);
+    document.getElementById('diseaseStatsList').innerHTML = `
+      <div style="text-align:center;padding:20px;color:#dc2626">
+        <div style="font-size:48px">⚠️</div>
+        <div>Error loading statistics: ${error.message}</div>
+      </div>
+    `;
+  }
+}
+
+// ---------- Log functionality ----------
+const logEl = qs('log');
+
+function appendLog(text) {
+  const t = document.createElement('div');
+  t.textContent = new Date().toLocaleTimeString() + ' — ' + text;
+  if(logEl) logEl.prepend(t);
+}
+
+// Cache the app shell for offline use and upload queued analyses (sw.js)
+if ('serviceWorker' in navigator) {
+  navigator.serviceWorker.register('/sw.js').catch(err => console.warn('Service worker not registered', err));
+}
+
+// init small startup log
+appendLog('AyuScan UI ready');
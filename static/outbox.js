@@ -0,0 +1,186 @@
+// Offline outbox for /predict, shared by the detection page and the service worker.
+//
+// Every analysis is first written to IndexedDB: the photos (as Blobs), the
+// form fields (patient, category, language, ASHA worker) and an
+// Idempotency-Key. Only then is it uploaded. If the network is down, or the
+// server answers 429/5xx, the entry stays queued and is retried with
+// exponential backoff. Retries are triggered by a timer, the `online` event
+// and Background Sync in the service worker. Results are stored back on the
+// entry and announced to open pages, so they appear as they arrive.
+//
+// The page and the service worker may both try the same entry at once. The
+// shared Idempotency-Key makes the server run it only once and hand the same
+// result to both.
+
+(function (scope) {
+  const DB_NAME = 'appayu';
+  const STORE = 'outbox';
+  const MAX_ATTEMPTS = 8;
+  const BASE_DELAY_MS = 5000;
+  const MAX_DELAY_MS = 10 * 60 * 1000;
+  // Finished entries stay visible for a day, then are dropped
+  const KEEP_DONE_MS = 24 * 3600 * 1000;
+  let dbPromise = null;
+  let flushing = null;
+
+  function openDb() {
+    if (!dbPromise) {
+      dbPromise = new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NAME, 1);
+        req.onupgradeneeded = () => {
+          const store = req.result.createObjectStore(STORE, { keyPath: 'id' });
+          store.createIndex('createdAt', 'createdAt');
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+      });
+    }
+    return dbPromise;
+  }
+
+  async function tx(mode, fn) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const t = db.transaction(STORE, mode);
+      const result = fn(t.objectStore(STORE));
+      t.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+      t.onerror = () => reject(t.error);
+    });
+  }
+
+  function newKey() {
+    return (scope.crypto && crypto.randomUUID)
+      ? crypto.randomUUID()
+      : Date.now().toString(36) + Math.random().toString(36).slice(2);
+  }
+
+  function backoff(attempts, retryAfterSeconds) {
+    if (retryAfterSeconds) return retryAfterSeconds * 1000;
+    const delay = Math.min(MAX_DELAY_MS, BASE_DELAY_MS * 2 ** (attempts - 1));
+    return delay / 2 + Math.random() * delay / 2;
+  }
+
+  function notify(entry) {
+    const message = { type: 'outbox-updated', id: entry.id, status: entry.status };
+    if (scope.clients && scope.clients.matchAll) {
+      // Service worker: tell every open page
+      scope.clients.matchAll({ includeUncontrolled: true }).then(list => list.forEach(c => c.postMessage(message)));
+    } else if (scope.dispatchEvent) {
+      scope.dispatchEvent(new CustomEvent('outbox-updated', { detail: message }));
+    }
+  }
+
+  // Queue an analysis. `fields` are the /predict form fields, `files` Blobs/Files.
+  async function add(fields, files) {
+    const entry = {
+      id: newKey(),
+      createdAt: Date.now(),
+      status: 'pending',
+      attempts: 0,
+      nextAttemptAt: 0,
+      fields,
+      files: files.map(file => ({ blob: file, name: file.name || 'photo.jpg' })),
+      result: null,
+      error: null
+    };
+    await tx('readwrite', store => store.put(entry));
+    notify(entry);
+    return entry;
+  }
+
+  async function save(entry) {
+    await tx('readwrite', store => store.put(entry));
+    notify(entry);
+    return entry;
+  }
+
+  // One upload attempt; returns the updated entry.
+  async function upload(entry) {
+    const formData = new FormData();
+    entry.files.forEach(file => formData.append('file', file.blob, file.name));
+    Object.entries(entry.fields).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') formData.append(key, value);
+    });
+
+    entry.attempts += 1;
+    let response, body;
+    try {
+      response = await fetch('/predict', {
+        method: 'POST',
+        body: formData,
+        headers: { 'Idempotency-Key': entry.id }
+      });
+      body = await response.text();
+    } catch (networkError) {
+      // Offline or the connection dropped: keep it queued
+      entry.nextAttemptAt = Date.now() + backoff(entry.attempts);
+      entry.error = 'Waiting for network';
+      return save(entry);
+    }
+
+    // Proxies answer 413/502 etc. with HTML, so the status decides what
+    // happens next and the body is only used if it is JSON
+    let data;
+    try {
+      data = JSON.parse(body);
+    } catch (parseError) {
+      data = null;
+    }
+    if (!data || typeof data !== 'object') data = { error: `Server error ${response.status}` };
+
+    const retryable = response.status === 429 || response.status >= 500;
+    if (response.ok) {
+      entry.status = 'done';
+      entry.result = data;
+      entry.error = null;
+      entry.files = [];  // the photos are no longer needed
+      entry.finishedAt = Date.now();
+    } else if (retryable && entry.attempts < MAX_ATTEMPTS) {
+      const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+      entry.nextAttemptAt = Date.now() + backoff(entry.attempts, response.status === 429 ? retryAfter : 0);
+      entry.error = data.error || `Server error ${response.status}`;
+    } else {
+      entry.status = 'failed';
+      entry.result = data;
+      entry.error = data.error || `Server error ${response.status}`;
+      entry.files = [];
+      entry.finishedAt = Date.now();
+    }
+    return save(entry);
+  }
+
+  async function list() {
+    const entries = await tx('readonly', store => store.index('createdAt').getAll());
+    return entries || [];
+  }
+
+  async function remove(id) {
+    await tx('readwrite', store => store.delete(id));
+  }
+
+  // Upload every due entry in order; stops at the first network failure.
+  function flush(force) {
+    if (flushing) return flushing;
+    flushing = (async () => {
+      const now = Date.now();
+      for (const entry of await list()) {
+        if (entry.status !== 'pending') {
+          if (entry.finishedAt && now - entry.finishedAt > KEEP_DONE_MS) await remove(entry.id);
+          continue;
+        }
+        if (!force && entry.nextAttemptAt > now) continue;
+        const updated = await upload(entry);
+        if (updated.status === 'pending' && updated.error === 'Waiting for network') break;
+      }
+    })().finally(() => { flushing = null; });
+    return flushing;
+  }
+
+  // Earliest time a pending entry is due, or null.
+  async function nextDue() {
+    const due = (await list()).filter(e => e.status === 'pending').map(e => e.nextAttemptAt);
+    return due.length ? Math.min(...due) : null;
+  }
+
+  scope.Outbox = { add, upload, flush, list, remove, nextDue };
+})(self);
@@ -0,0 +1,91 @@
+// Service worker: offline app shell and background upload of the /predict outbox.
+//
+// Served at /sw.js so its scope covers the whole app. Pages (/, /home,
+// /detection) are network-first with the cached copy as fallback. On
+// install, the assets they reference are precached. Those assets are
+// fingerprinted under /assets/, so they are served cache-first. Queued
+// analyses (outbox.js) are uploaded on Background Sync, or when a page asks.
+
+importScripts('/static/outbox.js');
+
+// Bump to drop shells cached by older releases when the new worker activates
+const CACHE = 'appayu-shell-v2';
+const PAGES = ['/', '/home', '/detection'];
+const OFFLINE_GET = ['/upload_config'];
+
+async function precache() {
+  const cache = await caches.open(CACHE);
+  const assets = new Set(['/static/upload.js', '/static/outbox.js']);
+  for (const page of PAGES) {
+    try {
+      const response = await fetch(page, { cache: 'no-cache' });
+      if (!response.ok) continue;
+      const html = await response.clone().text();
+      await cache.put(page, response);
+      for (const match of html.matchAll(/(?:src|href)="(\/(?:assets|static)\/[^"]+)"/g)) assets.add(match[1]);
+    } catch (err) {
+      // Installing offline: the pages get cached on the next visit
+    }
+  }
+  await Promise.all([...assets].map(url => cache.add(url).catch(() => null)));
+}
+
+self.addEventListener('install', event => {
+  event.waitUntil(precache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    for (const key of await caches.keys()) {
+      if (key !== CACHE) await caches.delete(key);
+    }
+    await self.clients.claim();
+  })());
+});
+
+async function networkFirst(request) {
+  const cache = await caches.open(CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok) cache.put(request, response.clone());
+    return response;
+  } catch (err) {
+    const cached = await cache.match(request, { ignoreSearch: true });
+    if (cached) return cached;
+    throw err;
+  }
+}
+
+async function cacheFirst(request) {
+  const cache = await caches.open(CACHE);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.ok) cache.put(request, response.clone());
+  return response;
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+  if (request.mode === 'navigate' || PAGES.includes(url.pathname) || OFFLINE_GET.includes(url.pathname)) {
+    event.respondWith(networkFirst(request));
+  } else if (url.pathname.startsWith('/assets/')) {
+    event.respondWith(cacheFirst(request));
+  } else if (url.pathname.startsWith('/static/') && !url.pathname.startsWith('/static/uploads/')) {
+    event.respondWith(networkFirst(request));
+  }
+});
+
+self.addEventListener('sync', event => {
+  if (event.tag !== 'outbox') return;
+  // Rejecting makes the browser schedule another sync with its own backoff
+  event.waitUntil(Outbox.flush(true).then(Outbox.nextDue).then(due => {
+    if (due !== null) throw new Error('Outbox still has queued analyses');
+  }));
+});
+
+self.addEventListener('message', event => {
+  if (event.data && event.data.type === 'flush-outbox') event.waitUntil(Outbox.flush(event.data.force));
+});
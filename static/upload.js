@@ -0,0 +1,89 @@
+// Resize and re-encode photos in the browser before uploading them.
+//
+// The server advertises the largest useful size, quality and formats at
+// /upload_config. A 4-8MB camera photo then leaves the phone as a few
+// hundred KB of JPEG/WebP instead of crossing a slow link only to be
+// re-encoded by the server. Anything that fails here falls back to the
+// original file, so uploads never break because of resizing.
+
+(function () {
+  const DEFAULT_CONFIG = { max_side: 1600, profile_max_side: 256, quality: 0.85, formats: ['image/jpeg'] };
+  const EXTENSIONS = { 'image/webp': '.webp', 'image/jpeg': '.jpg' };
+  let configPromise = null;
+
+  function loadUploadConfig() {
+    if (!configPromise) {
+      configPromise = fetch('/upload_config')
+        .then(response => response.ok ? response.json() : DEFAULT_CONFIG)
+        .catch(() => DEFAULT_CONFIG);
+    }
+    return configPromise;
+  }
+
+  function canEncode(type) {
+    const canvas = document.createElement('canvas');
+    canvas.width = canvas.height = 1;
+    return canvas.toDataURL(type).startsWith('data:' + type);
+  }
+
+  async function decode(file) {
+    if (window.createImageBitmap) {
+      try {
+        // Honour EXIF rotation; the re-encoded file carries no EXIF
+        return await createImageBitmap(file, { imageOrientation: 'from-image' });
+      } catch (err) {
+        // Fall through to an <img> element
+      }
+    }
+    const url = URL.createObjectURL(file);
+    try {
+      const img = new Image();
+      img.src = url;
+      await img.decode();
+      return img;
+    } finally {
+      URL.revokeObjectURL(url);
+    }
+  }
+
+  async function encode(source, width, height, type, quality) {
+    if (window.OffscreenCanvas) {
+      const canvas = new OffscreenCanvas(width, height);
+      canvas.getContext('2d').drawImage(source, 0, 0, width, height);
+      return canvas.convertToBlob({ type, quality });
+    }
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    canvas.getContext('2d').drawImage(source, 0, 0, width, height);
+    return new Promise(resolve => canvas.toBlob(resolve, type, quality));
+  }
+
+  // Returns {file, originalBytes}. `purpose` is 'scan' or 'profile'.
+  async function prepareUpload(file, purpose) {
+    const result = { file, originalBytes: file.size };
+    if (!file.type || !file.type.startsWith('image/')) return result;
+    try {
+      const config = await loadUploadConfig();
+      const maxSide = purpose === 'profile' ? config.profile_max_side : config.max_side;
+      const type = (config.formats || []).find(canEncode) || 'image/jpeg';
+      const image = await decode(file);
+      const width = image.width || image.naturalWidth;
+      const height = image.height || image.naturalHeight;
+      const scale = Math.min(1, maxSide / Math.max(width, height));
+      const blob = await encode(image, Math.max(1, Math.round(width * scale)), Math.max(1, Math.round(height * scale)), type, config.quality);
+      if (image.close) image.close();
+      // Small photos can grow when re-encoded; keep whichever is smaller
+      if (!blob || blob.size >= file.size) return result;
+      const name = file.name.replace(/\.[^.]*$/, '') + EXTENSIONS[type];
+      result.file = new File([blob], name, { type });
+      return result;
+    } catch (err) {
+      console.warn('Photo resize failed, uploading original', err);
+      return result;
+    }
+  }
+
+  window.loadUploadConfig = loadUploadConfig;
+  window.prepareUpload = prepareUpload;
+})();
@@ -0,0 +1,187 @@
+"""JSON-mode Gemini output: per-category response schemas and a strict validator.
+
+With GEMINI_JSON_MODE on (the default) the model is called with
+`response_mime_type="application/json"` and a response schema for the
+category. The reply is then a single JSON object with the keys the prompt
+names, and `parse` only has to `json.loads` it and check each field. A reply
+that is empty, is not JSON or does not match the schema is rejected. It is
+never patched up with placeholder values, so a bad answer is not stored as a
+diagnosis.
+
+Every parse is counted by outcome, and the tokens of the call are counted
+with it, so tokens spent on unusable replies show up on /metrics:
+
+    appayu_gemini_parse_total{category="skin",outcome="ok"}
+    appayu_gemini_parse_total{category="skin",outcome="invalid_json"}
+    appayu_gemini_tokens_total{kind="output",outcome="ok"}
+
+GEMINI_JSON_MODE=0 goes back to asking for JSON in the prompt only. In that
+mode, the first JSON object in the reply (e.g. inside a markdown fence) is
+taken and validated the same way.
+"""
+import json
+import os
+
+import metrics
+from knowledge_base import kb_enabled
+
+JSON_MODE = os.environ.get("GEMINI_JSON_MODE", "1") != "0"
+
+SEVERITIES = ("Mild", "Moderate", "Severe")
+# "Visual characteristics" keys asked for per category
+VISUAL_KEYS = {
+    "eye": ("redness", "discharge", "swelling", "other"),
+    "oral": ("color", "texture", "location", "size"),
+    "skin": ("color", "texture"),
+    "other": ("color", "texture", "location", "other"),
+}
+# Keys knowledge-base mode lets the model leave out (filled in by knowledge_base.enrich)
+KB_OPTIONAL = ("Description", "Severity level", "List of recommended medicines")
+
+OUTCOMES = ("ok", "empty", "invalid_json", "schema_error")
+
+PARSE_RESULTS = metrics.register(metrics.Counter(
+    "appayu_gemini_parse_total", "Gemini replies by category and parse outcome", ("category", "outcome")
+))
+TOKENS = metrics.register(metrics.Counter(
+    "appayu_gemini_tokens_total", "Gemini prompt and output tokens by parse outcome", ("kind", "outcome")
+))
+
+
+class InvalidAnalysis(ValueError):
+    """The model's reply could not be used; `outcome` is the parse outcome label."""
+
+    def __init__(self, outcome, message):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def _category(category):
+    return category if category in VISUAL_KEYS else "other"
+
+
+def _required(category):
+    required = ["Disease name", "Confidence level", "Description", "Severity level",
+                "List of recommended medicines", "Visual characteristics"]
+    if kb_enabled(category):
+        required = [key for key in required if key not in KB_OPTIONAL]
+    return required
+
+
+def response_schema(category):
+    """Gemini response schema (OpenAPI subset) for one category."""
+    category = _category(category)
+    string = {"type": "string"}
+    return {
+        "type": "object",
+        "properties": {
+            "Disease name": string,
+            "Confidence level": {"type": "integer", "description": "0-100"},
+            "Description": string,
+            "Severity level": {"type": "string", "enum": list(SEVERITIES)},
+            "List of recommended medicines": {"type": "array", "items": string},
+            "Visual characteristics": {
+                "type": "object",
+                "properties": {key: string for key in VISUAL_KEYS[category]},
+            },
+        },
+        "required": _required(category),
+    }
+
+
+_SCHEMAS = {category: response_schema(category) for category in VISUAL_KEYS}
+
+
+def generation_config(category):
+    """Extra GenerationConfig fields for the category (empty when JSON mode is off)."""
+    if not JSON_MODE:
+        return {}
+    return {"response_mime_type": "application/json", "response_schema": _SCHEMAS[_category(category)]}
+
+
+def _string(analysis, key):
+    value = analysis[key]
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidAnalysis("schema_error", f"{key!r} must be a non-empty string")
+    return value.strip()
+
+
+def validate(analysis, category):
+    """Check a decoded reply against the category's schema.
+
+    Returns a cleaned copy with only the known keys: strings stripped,
+    confidence as an int in 0-100 and severity in its canonical case.
+    Raises InvalidAnalysis("schema_error", ...) on the first violation.
+    """
+    if not isinstance(analysis, dict):
+        raise InvalidAnalysis("schema_error", "reply is not a JSON object")
+    category = _category(category)
+    missing = [key for key in _required(category) if key not in analysis]
+    if missing:
+        raise InvalidAnalysis("schema_error", f"missing keys: {', '.join(missing)}")
+
+    cleaned = {"Disease name": _string(analysis, "Disease name")}
+
+    confidence = analysis["Confidence level"]
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 100:
+        raise InvalidAnalysis("schema_error", "'Confidence level' must be a number between 0 and 100")
+    cleaned["Confidence level"] = int(round(confidence))
+
+    if "Description" in analysis:
+        cleaned["Description"] = _string(analysis, "Description")
+
+    if "Severity level" in analysis:
+        severity = _string(analysis, "Severity level").capitalize()
+        if severity not in SEVERITIES:
+            raise InvalidAnalysis("schema_error", f"'Severity level' must be one of {', '.join(SEVERITIES)}")
+        cleaned["Severity level"] = severity
+
+    if "List of recommended medicines" in analysis:
+        medicines = analysis["List of recommended medicines"]
+        if not isinstance(medicines, list) or not all(isinstance(m, str) for m in medicines):
+            raise InvalidAnalysis("schema_error", "'List of recommended medicines' must be a list of strings")
+        cleaned["List of recommended medicines"] = [m.strip() for m in medicines if m.strip()]
+
+    if "Visual characteristics" in analysis:
+        visual = analysis["Visual characteristics"]
+        if not isinstance(visual, dict):
+            raise InvalidAnalysis("schema_error", "'Visual characteristics' must be an object")
+        cleaned["Visual characteristics"] = {
+            key: visual[key].strip() for key in VISUAL_KEYS[category] if isinstance(visual.get(key), str)
+        }
+    return cleaned
+
+
+def _decode(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        if JSON_MODE:
+            raise InvalidAnalysis("invalid_json", "reply is not valid JSON")
+    # Prompt-only mode: take the first object, e.g. inside ```json fences
+    start = text.find("{")
+    if start < 0:
+        raise InvalidAnalysis("invalid_json", "no JSON object in reply")
+    try:
+        return json.JSONDecoder().raw_decode(text, start)[0]
+    except ValueError:
+        raise InvalidAnalysis("invalid_json", "reply is not valid JSON")
+
+
+def parse(text, category):
+    """Decode and validate the model's reply text; raises InvalidAnalysis."""
+    if not text or not text.strip():
+        raise InvalidAnalysis("empty", "no text in reply")
+    return validate(_decode(text), category)
+
+
+def record_parse(response, category, outcome):
+    """Count one parse outcome and the tokens the call used."""
+    PARSE_RESULTS.inc(_category(category), outcome)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    TOKENS.inc("prompt", outcome, amount=prompt_tokens)
+    TOKENS.inc("output", outcome, amount=output_tokens)
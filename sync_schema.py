@@ -0,0 +1,192 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from user_schema import users, normalize_phone, build_patient, resolve_usernames, ensure_client_id_index
+from disease_schema import build_disease_record
+from metrics import timed
+import outbreak
+
+# Offline sync: the field app queues patient creations and detections while
+# out of signal and posts them to /sync in one batch. Each mutation carries a
+# client-generated `client_id` so replaying a batch (e.g. after a dropped
+# response) never applies the same mutation twice.
+#
+# Mutation format:
+#   {"client_id": "...", "type": "add_patient", "data": {"name": ..., "phone": ..., "village": ...}}
+#   {"client_id": "...", "type": "add_disease",
+#    "data": {"username": ..., "disease_name": ..., "asha_worker_info": {...}, "detected_at": "<iso>",
+#             "category": "skin"|"eye"|"oral" (optional)}}
+
+MAX_SYNC_MUTATIONS = 500
+MUTATION_TYPES = ("add_patient", "add_disease")
+
+
+def make_change_token(when=None):
+    """Opaque change token handed to clients: server time in epoch milliseconds."""
+    when = when or datetime.utcnow()
+    return str(int((when - datetime(1970, 1, 1)).total_seconds() * 1000))
+
+
+def parse_change_token(token):
+    """Inverse of make_change_token. Returns None for a missing/invalid token."""
+    try:
+        return datetime.utcfromtimestamp(int(token) / 1000.0)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _outcome(mutation, status, message):
+    return {
+        "client_id": mutation.get("client_id") if isinstance(mutation, dict) else None,
+        "status": status,
+        "message": message
+    }
+
+
+def _validate(mutation):
+    """Return an error message for a malformed mutation, or None."""
+    if not isinstance(mutation, dict):
+        return "Mutation must be an object"
+    if not mutation.get("client_id"):
+        return "client_id is required"
+    if mutation.get("type") not in MUTATION_TYPES:
+        return f"Unknown mutation type '{mutation.get('type')}'"
+    data = mutation.get("data")
+    if not isinstance(data, dict):
+        return "data must be an object"
+    if mutation["type"] == "add_patient" and (not data.get("name") or not data.get("phone")):
+        return "Both name and phone are required"
+    if mutation["type"] == "add_disease":
+        if not data.get("username") or not data.get("disease_name"):
+            return "Username and disease name are required"
+        if data.get("detected_at"):
+            try:
+                datetime.fromisoformat(str(data["detected_at"]).replace("Z", "+00:00"))
+            except ValueError:
+                return "detected_at must be an ISO-8601 timestamp"
+    return None
+
+
+def _run_bulk(requests):
+    """Run an unordered bulk_write, returning (result, {request_index: errmsg})."""
+    if not requests:
+        return None, {}
+    try:
+        return users.bulk_write(requests, ordered=False), {}
+    except BulkWriteError as bwe:
+        errors = {e["index"]: e.get("errmsg", "Write failed") for e in bwe.details.get("writeErrors", [])}
+        return None, errors
+
+
+@timed("db.apply_sync_batch")
+def apply_sync_batch(mutations):
+    """Apply a batch of offline mutations with unordered bulk writes.
+
+    Patients are written before detections so a detection can refer to a
+    patient created earlier in the same batch. Within each group the writes are
+    unordered, so one failing mutation does not block the rest.
+
+    Returns:
+        dict: `success`, per-mutation `results` (in request order) and a
+        `change_token` to resume from.
+    """
+    now = datetime.utcnow()
+    results = [None] * len(mutations)
+    patient_ops, patient_idx = [], []
+    disease_ops, disease_idx = [], []
+    records = {}
+
+    ensure_client_id_index()
+    errors = [_validate(mutation) for mutation in mutations]
+    # Names merged into another patient (patient_linkage.py) map to the survivor
+    resolved = resolve_usernames(
+        mutation["data"].get("username") or mutation["data"].get("name")
+        for mutation, error in zip(mutations, errors) if error is None
+    )
+
+    for i, mutation in enumerate(mutations):
+        error = errors[i]
+        if error:
+            results[i] = _outcome(mutation, "rejected", error)
+            continue
+
+        data = mutation["data"]
+        if mutation["type"] == "add_patient":
+            # Username is the patient identity (see add_user): an existing
+            # patient is left untouched, so replays are naturally idempotent.
+            patient = build_patient(data["name"], normalize_phone(data["phone"]), data.get("village"))
+            patient["updated_at"] = now
+            patient_ops.append(UpdateOne(
+                {"username": resolved[data["name"]]},
+                {"$setOnInsert": patient},
+                upsert=True
+            ))
+            patient_idx.append(i)
+        else:
+            detected_at = None
+            if data.get("detected_at"):
+                detected_at = datetime.fromisoformat(str(data["detected_at"]).replace("Z", "+00:00"))
+                if detected_at.tzinfo is not None:
+                    # add_disease stores naive local time; match it
+                    detected_at = detected_at.astimezone().replace(tzinfo=None)
+            record = build_disease_record(
+                data["disease_name"], data.get("asha_worker_info"), detected_at, data.get("category")
+            )
+            record["client_id"] = mutation["client_id"]
+            records[i] = record
+            # The $ne guard makes re-sending the same client_id a no-op
+            disease_ops.append(UpdateOne(
+                {"username": resolved[data["username"]], "diseases.client_id": {"$ne": mutation["client_id"]}},
+                {"$push": {"diseases": record}, "$set": {"updated_at": now}}
+            ))
+            disease_idx.append(i)
+
+    # Detections that were already applied by an earlier sync
+    already_applied = set()
+    if disease_idx:
+        client_ids = [mutations[i]["client_id"] for i in disease_idx]
+        for doc in users.find({"diseases.client_id": {"$in": client_ids}}, {"diseases.client_id": 1}):
+            already_applied.update(d.get("client_id") for d in doc.get("diseases", []) if isinstance(d, dict))
+
+    patient_result, patient_errors = _run_bulk(patient_ops)
+    upserted = set((patient_result.upserted_ids or {}).keys()) if patient_result else set()
+    for op_index, i in enumerate(patient_idx):
+        if op_index in patient_errors:
+            results[i] = _outcome(mutations[i], "error", patient_errors[op_index])
+        elif patient_result is None or op_index in upserted:
+            # On a partial bulk failure upserted_ids is not reported; treat
+            # non-failing ops as applied (replay is harmless).
+            results[i] = _outcome(mutations[i], "applied", "New patient added")
+        else:
+            results[i] = _outcome(mutations[i], "duplicate", "Patient already exists")
+
+    pending = [(op, i) for op, i in zip(disease_ops, disease_idx)
+               if mutations[i]["client_id"] not in already_applied]
+    for i in disease_idx:
+        if mutations[i]["client_id"] in already_applied:
+            results[i] = _outcome(mutations[i], "duplicate", "Detection already synced")
+
+    _, disease_errors = _run_bulk([op for op, _ in pending])
+    recorded = []
+    if pending:
+        # Confirm which detections landed; the rest had no matching patient
+        pending_ids = [mutations[i]["client_id"] for _, i in pending]
+        landed = set()
+        for doc in users.find({"diseases.client_id": {"$in": pending_ids}}, {"diseases.client_id": 1}):
+            landed.update(d.get("client_id") for d in doc.get("diseases", []) if isinstance(d, dict))
+        for op_index, (_, i) in enumerate(pending):
+            if op_index in disease_errors:
+                results[i] = _outcome(mutations[i], "error", disease_errors[op_index])
+            elif mutations[i]["client_id"] in landed:
+                results[i] = _outcome(mutations[i], "applied", "Detection recorded")
+                recorded.append((resolved[mutations[i]["data"]["username"]], records[i]["condition_id"], records[i]["detected_at"]))
+            else:
+                results[i] = _outcome(mutations[i], "rejected", "User not found")
+
+    outbreak.observe_detections(recorded)
+
+    return {
+        "success": all(r["status"] in ("applied", "duplicate") for r in results),
+        "results": results,
+        "change_token": make_change_token(now)
+    }
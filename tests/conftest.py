@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "backend")]
+
+
+@pytest.fixture
+def mongo():
+    """An in-memory MongoDB database (tests that need one skip without mongomock)."""
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def no_outbreaks(monkeypatch):
+    """Record what write paths feed the outbreak detector instead of feeding it."""
+    import outbreak
+
+    observed = []
+    monkeypatch.setattr(outbreak, "observe_detections", observed.extend)
+    return observed
@@ -0,0 +1,135 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from archive import Archive
+
+OLD, OLDER, RECENT = '20250110093000', '20250115120000', '29990101000000'
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    for kind in ('submissions', 'photos', 'reports'):
+        (tmp_path / kind).mkdir()
+    add(tmp_path, OLD, photos=['a.jpg'], reports=['a.pdf'])
+    add(tmp_path, OLDER, photos=['b.jpg', 'gone.jpg'])
+    add(tmp_path, RECENT, photos=['c.jpg'])
+    return tmp_path
+
+
+def add(root, submission_id, photos=(), reports=()):
+    submission = {'submissionId': submission_id, 'chiefComplaint': 'rash',
+                  'uploadedPhotos': list(photos), 'uploadedReports': list(reports)}
+    (root / 'submissions' / f'submission_{submission_id}.json').write_text(json.dumps(submission))
+    for kind, names in (('photos', photos), ('reports', reports)):
+        for name in names:
+            if name != 'gone.jpg':
+                (root / kind / name).write_bytes(f'{kind}:{name}'.encode())
+
+
+def live(root):
+    return sorted(p.name for kind in ('submissions', 'photos', 'reports') for p in (root / kind).iterdir())
+
+
+def segment(root, month='2025-01'):
+    return root / 'archive' / 'segments' / f'{month}.zip'
+
+
+def test_compact_moves_old_submissions_and_their_files(uploads):
+    archive = Archive(str(uploads))
+    report = archive.compact(older_than_days=30)
+
+    assert (report['submissions'], report['files'], report['segments']) == (2, 3, ['2025-01'])
+    assert live(uploads) == ['c.jpg', f'submission_{RECENT}.json']
+    assert archive.read_submission(OLD)['uploadedPhotos'] == ['a.jpg']
+    assert archive.read_file('photos', 'b.jpg') == b'photos:b.jpg'
+    assert archive.read_file('reports', 'a.pdf') == b'reports:a.pdf'
+    assert archive.read_submission(RECENT) is None
+    assert [s['submissionId'] for s in archive.iter_submissions()] == [OLD, OLDER]
+    with zipfile.ZipFile(segment(uploads)) as zf:
+        assert zf.getinfo('photos/a.jpg').compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo(f'submissions/submission_{OLD}.json').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_dry_run_changes_nothing(uploads):
+    before = live(uploads)
+    report = Archive(str(uploads)).compact(older_than_days=30, dry_run=True)
+
+    assert report['submissions'] == 2
+    assert live(uploads) == before
+    assert not segment(uploads).exists()
+
+
+def test_crash_while_writing_leaves_segment_and_originals(uploads, monkeypatch):
+    Archive(str(uploads)).compact(older_than_days=30)
+    add(uploads, '20250120080000', photos=['d.jpg', 'e.jpg'])
+    original = segment(uploads).read_bytes()
+    write = zipfile.ZipFile.write
+    calls = []
+
+    def crash_on_second(self, *args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OSError('disk full')
+        return write(self, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, 'write', crash_on_second)
+    archive = Archive(str(uploads))
+    with pytest.raises(OSError):
+        archive.compact(older_than_days=30)
+
+    assert segment(uploads).read_bytes() == original
+    assert not os.path.exists(str(segment(uploads)) + '.tmp')
+    assert 'd.jpg' in live(uploads) and 'submission_20250120080000.json' in live(uploads)
+    assert Archive(str(uploads)).archived_count() == 2
+
+    monkeypatch.setattr(zipfile.ZipFile, 'write', write)
+    assert Archive(str(uploads)).compact(older_than_days=30)['submissions'] == 1
+    assert Archive(str(uploads)).archived_count() == 3
+
+
+def test_crash_before_index_write_is_repeatable(uploads, monkeypatch):
+    def crash(self):
+        raise OSError('power cut')
+
+    monkeypatch.setattr(Archive, '_write_index', crash)
+    with pytest.raises(OSError):
+        Archive(str(uploads)).compact(older_than_days=30)
+    # The new segment is in place, but nothing was deleted or indexed
+    assert segment(uploads).exists()
+    assert len(live(uploads)) == 7
+    monkeypatch.undo()
+
+    archive = Archive(str(uploads))
+    archive.compact(older_than_days=30)
+
+    with zipfile.ZipFile(segment(uploads)) as zf:
+        names = zf.namelist()
+    assert len(names) == len(set(names)) == 5
+    assert archive.archived_count() == 2
+    assert live(uploads) == ['c.jpg', f'submission_{RECENT}.json']
+
+
+def test_stale_tmp_from_interrupted_run_is_discarded(uploads):
+    os.makedirs(segment(uploads).parent)
+    (segment(uploads).parent / '2025-01.zip.tmp').write_bytes(b'half written')
+
+    Archive(str(uploads)).compact(older_than_days=30)
+
+    assert zipfile.is_zipfile(segment(uploads))
+    assert not os.path.exists(str(segment(uploads)) + '.tmp')
+
+
+def test_reader_sees_segments_compacted_by_another_process(uploads):
+    reader = Archive(str(uploads))
+    Archive(str(uploads)).compact(older_than_days=30)
+    assert reader.read_submission(OLD)['submissionId'] == OLD
+
+    add(uploads, '20250120080000', photos=['d.jpg'])
+    Archive(str(uploads)).compact(older_than_days=30)
+
+    # The segment was replaced, so the cached handle must not be reused
+    assert reader.read_file('photos', 'd.jpg') == b'photos:d.jpg'
+    assert reader.archived_count() == 3
@@ -0,0 +1,130 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, jsonify, request
+
+import idempotency
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(idempotency, "store", idempotency.IdempotencyStore())
+    app = Flask(__name__)
+    app.calls = []
+    app.release = threading.Event()
+    app.release.set()
+
+    @app.route("/write", methods=["POST"])
+    @idempotency.idempotent
+    def write():
+        app.calls.append(request.get_data())
+        app.release.wait(5)
+        status = int(request.args.get("status", 200))
+        return jsonify({"call": len(app.calls)}), status
+
+    @app.route("/upload", methods=["POST"])
+    @idempotency.idempotent
+    def upload():
+        app.calls.append(request.files["file"].read())
+        return jsonify({"call": len(app.calls), "override": request.form.get("quality_override")})
+
+    return app
+
+
+def post(client, body, key="k1", path="/write"):
+    return client.post(path, data=body, headers={"Idempotency-Key": key}, content_type="application/json")
+
+
+def test_retry_replays_first_response(app):
+    client = app.test_client()
+    first = post(client, b'{"a": 1}')
+    second = post(client, b'{"a": 1}')
+
+    assert first.get_json() == second.get_json() == {"call": 1}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(app.calls) == 1
+
+
+def test_requests_without_key_always_run(app):
+    client = app.test_client()
+    client.post("/write", data=b"{}")
+    client.post("/write", data=b"{}")
+
+    assert len(app.calls) == 2
+
+
+def test_key_reused_with_different_body_is_rejected(app):
+    client = app.test_client()
+    post(client, b'{"a": 1}')
+    response = post(client, b'{"a": 2}')
+
+    assert response.status_code == 422
+    assert len(app.calls) == 1
+
+
+def test_overlong_key_is_rejected(app):
+    response = post(app.test_client(), b"{}", key="k" * (idempotency.MAX_KEY_LENGTH + 1))
+
+    assert response.status_code == 400
+    assert app.calls == []
+
+
+@pytest.mark.parametrize("status", [422, 429, 503])
+def test_error_responses_are_not_kept(app, status):
+    client = app.test_client()
+    client.post(f"/write?status={status}", data=b"{}", headers={"Idempotency-Key": "k1"},
+                content_type="application/json")
+    retry = post(client, b"{}")
+
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    assert len(app.calls) == 2
+
+
+def test_concurrent_duplicates_run_once(app):
+    app.release.clear()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(post, app.test_client(), b'{"a": 1}') for _ in range(4)]
+        # Hold the leader inside the view while the duplicates arrive
+        while not app.calls:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        app.release.set()
+        responses = [f.result() for f in futures]
+
+    assert len(app.calls) == 1
+    assert {r.get_json()["call"] for r in responses} == {1}
+    assert sum(1 for r in responses if r.headers.get("Idempotent-Replayed")) == 3
+
+
+def test_multipart_retry_matches_despite_new_boundary(app):
+    client = app.test_client()
+
+    def upload(override=None):
+        data = {"file": (io.BytesIO(b"\xff\xd8photo"), "scan.jpg"), "patient_name": "Ramesh"}
+        if override:
+            data["quality_override"] = override
+        return client.post("/upload", data=data, headers={"Idempotency-Key": "k1"},
+                           content_type="multipart/form-data")
+
+    upload()
+    assert upload().headers["Idempotent-Replayed"] == "true"
+    # The uploaded file was rewound for the view after being hashed
+    assert app.calls == [b"\xff\xd8photo"]
+    assert upload(override="1").status_code == 422
+
+
+def test_waiter_gets_leader_result_without_storing_errors():
+    store = idempotency.IdempotencyStore()
+    outcome, flight = store.begin(("predict", "k"), "fp")
+    assert outcome == "lead"
+    assert store.begin(("predict", "k"), "fp")[0] == "wait"
+    assert store.begin(("predict", "k"), "other")[0] == "mismatch"
+
+    store.finish(("predict", "k"), flight, (422, b"{}", "application/json"))
+
+    assert flight.done.is_set() and flight.response[0] == 422
+    assert store.begin(("predict", "k"), "other")[0] == "lead"
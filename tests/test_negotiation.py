@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify
+
+import negotiation
+
+BIG = {"patients": [{"name": f"Patient {i}", "village": "Hosur"} for i in range(200)]}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/big")
+    def big():
+        return jsonify(BIG)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"success": True})
+
+    @app.route("/stream")
+    def stream():
+        return Response((json.dumps(BIG) for _ in range(1)), mimetype="application/json")
+
+    @app.route("/encoded")
+    def encoded():
+        response = Response(gzip.compress(json.dumps(BIG).encode()), mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    negotiation.init_app(app)
+    return app.test_client()
+
+
+def test_large_json_is_gzipped(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data)) == BIG
+    assert set(response.vary) >= {"Accept", "Accept-Encoding"}
+
+
+def test_brotli_preferred_when_available(client):
+    pytest.importorskip("brotli")
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, deflate, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+
+
+def test_small_and_unaccepted_bodies_are_not_compressed(client):
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "Content-Encoding" not in client.get("/big").headers
+    assert "Content-Encoding" not in client.get("/big", headers={"Accept-Encoding": "gzip;q=0"}).headers
+
+
+def test_streamed_and_already_encoded_responses_are_left_alone(client):
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in streamed.headers
+    assert json.loads(streamed.data) == BIG
+
+    encoded = client.get("/encoded", headers={"Accept-Encoding": "br, gzip"})
+    assert encoded.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(encoded.data)) == BIG
+
+
+@pytest.mark.parametrize("accept", [None, "*/*", "application/json, application/msgpack"])
+def test_json_wins_unless_binary_is_preferred(client, accept):
+    headers = {"Accept": accept} if accept else {}
+    response = client.get("/small", headers=headers)
+
+    assert response.mimetype == "application/json"
+
+
+def test_msgpack_when_preferred(client):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.get("/small", headers={"Accept": "application/msgpack, application/json;q=0.5"})
+
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.data) == {"success": True}
+
+
+def test_cbor_when_requested(client):
+    cbor2 = pytest.importorskip("cbor2")
+    response = client.get("/small", headers={"Accept": "application/cbor"})
+
+    assert response.mimetype == "application/cbor"
+    assert cbor2.loads(response.data) == {"success": True}
+
+
+def test_negotiate_asgi_matches_flask():
+    pytest.importorskip("starlette")
+    from starlette.datastructures import Headers
+    from starlette.responses import JSONResponse
+
+    response = negotiation.negotiate_asgi(JSONResponse(BIG), Headers({"accept-encoding": "gzip"}))
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert json.loads(gzip.decompress(response.body)) == BIG
@@ -0,0 +1,117 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbreak
+from cache import TTLCache
+from outbreak import BASELINE_DAYS, SPAN_DAYS, WINDOW_DAYS, MIN_CASES, Series, OutbreakDetector
+
+START = datetime(2026, 3, 1).toordinal()
+
+
+def reference(counts, head):
+    """Window count, baseline sum and sum of squares straight from daily counts."""
+    window = sum(counts.get(d, 0) for d in range(head - WINDOW_DAYS + 1, head + 1))
+    baseline = [counts.get(d, 0) for d in range(head - SPAN_DAYS + 1, head - WINDOW_DAYS + 1)]
+    return window, sum(baseline), sum(c * c for c in baseline)
+
+
+def test_ring_buffer_matches_recount():
+    rng = random.Random(7)
+    series, counts, head = Series(START), {}, START
+    for _ in range(2000):
+        if rng.random() < 0.15:
+            head += rng.choice([1, 1, 2, 5, SPAN_DAYS + 3])
+            series.advance(head)
+        else:
+            # Mostly today, sometimes a late detection from the last weeks
+            day = head - rng.choice([0, 0, 0, 1, 3, WINDOW_DAYS, SPAN_DAYS - 1, SPAN_DAYS + 2])
+            count = rng.randint(2, 4) if rng.random() < 0.1 else 1
+            series.add(day, count)
+            counts[day] = counts.get(day, 0) + count
+        assert series.head == head
+        assert (series.window, series.base_sum, series.base_sq) == reference(counts, head)
+
+
+def test_score_uses_poisson_floor_for_empty_baseline():
+    series = Series(START)
+    series.add(START, 2)
+
+    window, expected, threshold = series.score()
+    assert (window, expected) == (2, 0.0)
+    # spread floors at sqrt(1e-9), so the threshold is ~0 and MIN_CASES decides
+    assert threshold == pytest.approx(0.0, abs=1e-3)
+
+
+def test_alert_raised_above_baseline_and_cleared_when_window_passes():
+    detector = OutbreakDetector()
+    day0 = datetime(2026, 3, 1)
+    # One case a day through the baseline
+    for i in range(BASELINE_DAYS):
+        detector.add("Hosur", 12, day0 + timedelta(days=i))
+    assert detector.alerts == {}
+
+    spike = day0 + timedelta(days=BASELINE_DAYS + 1)
+    detector.add("Hosur", 12, spike, count=30)
+    alert = detector.alerts[("Hosur", 12)]
+    assert alert["cases"] >= 30 and alert["cases"] > alert["threshold"]
+
+    detector.add("Hosur", 12, spike + timedelta(days=WINDOW_DAYS + 1))
+    assert ("Hosur", 12) not in detector.alerts
+
+
+def test_small_counts_never_alert():
+    detector = OutbreakDetector()
+    detector.add("Hosur", 12, datetime(2026, 3, 1), count=MIN_CASES - 1)
+
+    assert detector.alerts == {}
+
+
+@pytest.fixture
+def fresh(monkeypatch, mongo):
+    monkeypatch.setattr(outbreak, "detector", OutbreakDetector())
+    monkeypatch.setattr(outbreak, "users", mongo.users)
+    monkeypatch.setattr(outbreak, "_villages", TTLCache())
+    monkeypatch.setattr(outbreak, "_warm_done", threading.Event())
+    mongo.users.insert_one({"username": "Ramesh", "village": "Hosur", "diseases": []})
+    return outbreak.detector
+
+
+def window_count(detector):
+    return sum(series.window for series in detector.series.values())
+
+
+def test_observations_before_cutoff_are_skipped_until_warmed(fresh, monkeypatch):
+    cutoff = datetime.now()
+    monkeypatch.setattr(outbreak, "_warm_cutoff", cutoff)
+
+    outbreak.observe_detections([("Ramesh", 12, cutoff - timedelta(minutes=5)), ("Ramesh", 12, cutoff)])
+    assert window_count(fresh) == 1
+
+    outbreak._warm_done.set()
+    outbreak.observe_detections([("Ramesh", 12, cutoff - timedelta(minutes=5))])
+    assert window_count(fresh) == 2
+
+
+def test_unknown_conditions_and_patients_are_ignored(fresh, monkeypatch):
+    monkeypatch.setattr(outbreak, "_warm_cutoff", datetime(2000, 1, 1))
+    outbreak._warm_done.set()
+
+    outbreak.observe_detections([("Ramesh", outbreak.UNKNOWN_ID, datetime.now()), ("Nobody", 12, datetime.now())])
+    assert fresh.series == {}
+
+
+def test_load_history_counts_only_before_until(fresh, mongo):
+    until = datetime(2026, 3, 10, 12, 0)
+    mongo.users.insert_one({"username": "Suresh", "village": "Hosur", "diseases": [
+        {"condition_id": 12, "detected_at": until - timedelta(days=1)},
+        {"condition_id": 12, "detected_at": until - timedelta(hours=1)},
+        {"condition_id": 12, "detected_at": until + timedelta(minutes=1)},
+        {"condition_id": 12, "detected_at": until - timedelta(days=SPAN_DAYS + 1)},
+        {"condition_id": outbreak.UNKNOWN_ID, "detected_at": until - timedelta(hours=2)},
+    ]})
+
+    assert outbreak.load_history(mongo.users, until=until) == 2
+    assert window_count(fresh) == 2
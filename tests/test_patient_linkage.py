@@ -0,0 +1,102 @@
+import io
+from datetime import datetime
+
+import pytest
+
+import patient_linkage
+from patient_linkage import find_duplicates, name_score, name_tokens
+
+
+def patient(n, username, phone="9876543210", village="hosur", detections=0, created=None):
+    return {"_id": f"id{n}", "username": username, "tokens": name_tokens(username), "phone": phone,
+            "village": village, "created": created or datetime(2026, 1, 1 + n), "detections": detections}
+
+
+def clusters(report):
+    return [sorted([c["survivor"]["username"]] + [d["username"] for d in c["duplicates"]]) for c in report]
+
+
+@pytest.mark.parametrize("a, b, compatible", [
+    ("Lakshmi Devi", "Laxmi Devi", True),
+    ("Smt. Geeta", "geeta bai", True),
+    ("R Kumar", "Rajesh Kumar", True),
+    ("Rajesh Kumar", "Ramesh Kumar", False),
+    ("Mohan", "Mohini", False),
+    ("Ramesh Kumar", "Ramesh Singh", False),
+])
+def test_name_compatibility(a, b, compatible):
+    assert (name_score(name_tokens(a), name_tokens(b)) > 0) is compatible
+
+
+def test_initial_does_not_chain_different_people():
+    records = [patient(0, "Rajesh Kumar"), patient(1, "R Kumar"), patient(2, "Ramesh Kumar")]
+
+    report, _ = find_duplicates(records)
+
+    # "R Kumar" links to both, but Rajesh and Ramesh never share a cluster
+    assert len(report) == 1
+    assert clusters(report)[0] in (["R Kumar", "Rajesh Kumar"], ["R Kumar", "Ramesh Kumar"])
+
+
+def test_cluster_joins_only_when_every_pair_matches():
+    records = [patient(0, "Ramesh Kumar"), patient(1, "Ramesh K"), patient(2, "ramesh"),
+               patient(3, "Suresh", phone="9000000000")]
+
+    report, _ = find_duplicates(records)
+
+    assert clusters(report) == [["Ramesh K", "Ramesh Kumar", "ramesh"]]
+    cluster = report[0]
+    assert len(cluster["pairs"]) == 3
+    assert cluster["score"] == min(p["score"] for p in cluster["pairs"])
+    assert cluster["approved"] is False
+
+
+def test_survivor_has_most_detections_then_oldest():
+    records = [patient(0, "Ramesh"), patient(1, "Ramesh Kumar", detections=3), patient(2, "Ramesh K", detections=3)]
+
+    report, _ = find_duplicates(records)
+
+    assert report[0]["survivor"]["username"] == "Ramesh Kumar"
+
+
+def test_conflicting_phone_keeps_namesakes_apart():
+    records = [patient(0, "Ramesh Kumar"), patient(1, "Ramesh Kumar", phone="9000000000")]
+
+    report, compared = find_duplicates(records)
+
+    assert compared == 1
+    assert report == []
+
+
+def test_large_blocks_are_compared_in_a_window(monkeypatch):
+    monkeypatch.setattr(patient_linkage, "FULL_BLOCK_SIZE", 5)
+    monkeypatch.setattr(patient_linkage, "WINDOW", 3)
+    records = [patient(n, f"Ravi {chr(97 + n)}", phone="") for n in range(12)]
+
+    pairs = list(patient_linkage.candidate_pairs(records))
+
+    assert len(pairs) == len(set(pairs))
+    assert len(pairs) < 12 * 11 // 2
+    assert all(abs(a - b) <= 2 for a, b in pairs)
+
+
+def test_merge_moves_detections_and_leaves_alias(mongo):
+    survivor = mongo.users.insert_one({"username": "Ramesh Kumar", "phone": "9876543210", "diseases": [
+        {"name": "Scabies", "client_id": "a"}]}).inserted_id
+    duplicate = mongo.users.insert_one({"username": "Ramesh K", "phone": "9876543210", "diseases": [
+        {"name": "Scabies", "client_id": "a"}, {"name": "Impetigo", "client_id": "b"}]}).inserted_id
+    cluster = {"survivor": {"id": str(survivor), "username": "Ramesh Kumar"},
+               "duplicates": [{"id": str(duplicate), "username": "Ramesh K"}]}
+    backup = io.StringIO()
+
+    moved = patient_linkage.merge_cluster(cluster, backup, mongo.users, mongo.tombstones)
+
+    assert moved == 1
+    merged = mongo.users.find_one({"_id": survivor})
+    assert [d["client_id"] for d in merged["diseases"]] == ["a", "b"]
+    assert merged["aliases"] == ["Ramesh K"]
+    assert mongo.users.find_one({"_id": duplicate}) is None
+    assert mongo.tombstones.count_documents({}) == 1
+    assert "Ramesh K" in backup.getvalue()
+    # A rerun after the merge finished changes nothing
+    assert patient_linkage.merge_cluster(cluster, io.StringIO(), mongo.users, mongo.tombstones) == 0
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+
+import pytest
+
+from scheduler import FairScheduler, QueueFull, classify
+
+
+@pytest.mark.parametrize("urgency, extra_info, expected", [
+    (None, None, "routine"),
+    ("BULK", "fever", "bulk"),
+    ("", "High fever since two days", "urgent"),
+    ("", "two burns on the arm", "urgent"),
+    ("", "burning sensation", "routine"),
+    ("", "lives near the campus", "routine"),
+    ("", "pus draining", "urgent"),
+    ("", "rash  spreading   fast", "urgent"),
+    ("sometime", "itchy", "routine"),
+])
+def test_classify(urgency, extra_info, expected):
+    assert classify(urgency, extra_info) == expected
+
+
+def busy(**kwargs):
+    """A scheduler whose only slot is taken, plus the order of later grants."""
+    scheduler = FairScheduler(capacity=1, queue_max=100, urgent_reserve=0, weights=kwargs.pop("weights", {}), **kwargs)
+    assert scheduler.submit("routine", "holder", 1, lambda: None).granted
+    return scheduler, []
+
+
+def enqueue(scheduler, order, priority, worker, label=None, cost=1):
+    label = label or worker
+    return scheduler.submit(priority, worker, cost, lambda: order.append(label))
+
+
+def drain(scheduler):
+    while scheduler.running:
+        scheduler.release()
+
+
+def test_flooding_worker_does_not_delay_others_by_more_than_one_turn():
+    scheduler, order = busy()
+    for i in range(5):
+        enqueue(scheduler, order, "routine", "A", f"A{i}")
+    enqueue(scheduler, order, "routine", "B", "B0")
+    enqueue(scheduler, order, "routine", "C", "C0")
+    drain(scheduler)
+
+    assert order == ["A0", "B0", "C0", "A1", "A2", "A3", "A4"]
+
+
+def test_weights_give_proportional_turns():
+    scheduler, order = busy(weights={"A": 2})
+    for _ in range(4):
+        enqueue(scheduler, order, "routine", "A")
+        enqueue(scheduler, order, "routine", "B")
+    drain(scheduler)
+
+    assert "".join(order[:6]) == "ABAABA"
+
+
+def test_higher_classes_go_first():
+    scheduler, order = busy(bulk_share=0)
+    enqueue(scheduler, order, "bulk", "A", "bulk")
+    enqueue(scheduler, order, "routine", "A", "routine")
+    enqueue(scheduler, order, "urgent", "A", "urgent")
+    drain(scheduler)
+
+    assert order == ["urgent", "routine", "bulk"]
+
+
+def test_bulk_gets_its_share_under_steady_routine_load():
+    scheduler, order = busy(bulk_share=0.25)
+    for i in range(10):
+        enqueue(scheduler, order, "routine", f"W{i}", "r")
+    for i in range(3):
+        enqueue(scheduler, order, "bulk", "camp", "b")
+    drain(scheduler)
+
+    assert "".join(order) == "rrrbrrrbrrrbr"
+
+
+def test_full_queue_keeps_a_reserve_for_urgent():
+    scheduler = FairScheduler(capacity=1, queue_max=2, urgent_reserve=1, weights={})
+    scheduler.submit("routine", "A", 1, lambda: None)
+    scheduler.submit("routine", "A", 1, lambda: None)
+    scheduler.submit("routine", "B", 1, lambda: None)
+
+    with pytest.raises(QueueFull) as excinfo:
+        scheduler.submit("routine", "C", 1, lambda: None)
+    assert excinfo.value.reason == "full" and excinfo.value.retry_after >= 1
+    assert not scheduler.submit("urgent", "C", 1, lambda: None).granted
+    with pytest.raises(QueueFull):
+        scheduler.submit("urgent", "D", 1, lambda: None)
+
+
+def test_cancelled_ticket_is_skipped():
+    scheduler, order = busy()
+    ticket = enqueue(scheduler, order, "routine", "A")
+    enqueue(scheduler, order, "routine", "B")
+
+    assert scheduler.cancel(ticket)
+    drain(scheduler)
+    assert order == ["B"]
+    assert scheduler.waiting == {"urgent": 0, "routine": 0, "bulk": 0}
+
+
+def test_cancel_after_grant_is_refused():
+    scheduler, order = busy()
+    ticket = enqueue(scheduler, order, "routine", "A")
+    scheduler.release()
+
+    assert ticket.granted and not scheduler.cancel(ticket)
+
+
+def test_slot_times_out_and_leaves_the_queue():
+    scheduler, _ = busy()
+
+    with pytest.raises(QueueFull) as excinfo:
+        with scheduler.slot("routine", "A", timeout=0.05):
+            pass
+    assert excinfo.value.reason == "timeout"
+    assert sum(scheduler.waiting.values()) == 0
+    assert scheduler.running == 1
+
+
+def test_slot_waits_for_release_and_frees_it_afterwards():
+    scheduler, _ = busy()
+    entered = threading.Event()
+
+    def analyse():
+        with scheduler.slot("routine", "A", timeout=5):
+            entered.set()
+
+    worker = threading.Thread(target=analyse)
+    worker.start()
+    assert not entered.wait(0.05)
+    scheduler.release()
+    worker.join(5)
+
+    assert entered.is_set()
+    assert scheduler.running == 0
+
+
+def test_async_slot_cancelled_while_waiting_gives_nothing_away():
+    scheduler, _ = busy()
+
+    async def main():
+        async def analyse():
+            async with scheduler.slot_async("routine", "A", timeout=5):
+                pass
+
+        task = asyncio.create_task(analyse())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert sum(scheduler.waiting.values()) == 0
+    scheduler.release()
+    assert scheduler.running == 0
@@ -0,0 +1,106 @@
+import pytest
+
+from search_index import MAX_PREFIX_TERMS, SearchIndex, ReportExtractor, load_submissions, tokenize
+
+
+def submission(doc_id, **fields):
+    return dict({'submissionId': doc_id, 'fullName': f'Patient {doc_id}'}, **fields)
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add(submission('s1', chiefComplaint='vomiting and fever since two days'))
+    index.add(submission('s2', chiefComplaint='itchy rash', additionalNotes='mild vomiting after meals'))
+    index.add(submission('s3', chiefComplaint='cough', additionalNotes='fever at night'))
+    index.add(submission('s4', chiefComplaint='vomit in the morning'))
+    return index
+
+
+def ids(results):
+    return [r['submissionId'] for r in results]
+
+
+def test_tokenize_keeps_any_script_and_digits():
+    assert tokenize('Fever, 3 days; बुखार। a') == ['fever', '3', 'days', 'बुखार']
+
+
+def test_field_weight_decides_ranking(index):
+    total, results = index.search('vomiting')
+
+    # A chief complaint outranks a note; "vomit" is shorter than the prefix, so s4 is not a match
+    assert total == 2
+    assert ids(results) == ['s1', 's2']
+    assert results[0]['matchedFields'] == ['chiefComplaint']
+    assert results[1]['matchedFields'] == ['additionalNotes']
+
+
+def test_last_word_matches_as_prefix_below_exact(index):
+    total, results = index.search('vomit')
+
+    assert total == 3
+    # "vomit" itself is exact in s4; s1 and s2 only match through the prefix
+    assert ids(results)[0] == 's4'
+    assert set(ids(results)) == {'s1', 's2', 's4'}
+
+
+def test_every_word_must_match(index):
+    assert ids(index.search('fever vomiting')[1]) == ['s1']
+    assert index.search('fever cough rash') == (0, [])
+
+
+def test_only_last_or_starred_words_expand(index):
+    assert index.search('vom fever')[0] == 0
+    assert ids(index.search('vom* fever')[1]) == ['s1']
+
+
+def test_rare_terms_weigh_more(index):
+    # "fever" is in two submissions, "cough" in one: a cough hit outscores a fever hit in the same field weight
+    index.add(submission('s5', additionalNotes='cough'))
+    fever = dict((r['submissionId'], r['score']) for r in index.search('fever')[1])
+    cough = dict((r['submissionId'], r['score']) for r in index.search('cough')[1])
+
+    assert cough['s5'] > fever['s3']
+
+
+def test_reindexing_replaces_old_postings(index):
+    index.add(submission('s1', chiefComplaint='headache'), report_text='vomiting noted in report')
+
+    _, results = index.search('vomiting')
+    assert sorted(ids(results)) == ['s1', 's2']
+    assert dict((r['submissionId'], r['matchedFields']) for r in results)['s1'] == ['reports']
+    assert index.search('fever')[0] == 1
+    assert 'since' not in index.vocabulary
+    assert index.total_length == sum(index.doc_length.values())
+
+
+def test_prefix_expansion_is_capped():
+    index = SearchIndex()
+    for n in range(MAX_PREFIX_TERMS + 10):
+        index.add(submission(f's{n}', chiefComplaint=f'ab{n:03d}'))
+
+    assert index.search('ab')[0] == MAX_PREFIX_TERMS
+
+
+def test_paging(index):
+    total, first = index.search('fever vomit*', per_page=1)
+    _, second = index.search('fever vomit*', page=2, per_page=1)
+
+    assert total == 1 and len(first) == 1 and second == []
+
+
+def test_load_submissions_uses_cached_report_text(tmp_path):
+    submissions, text = tmp_path / 'submissions', tmp_path / 'reports_text'
+    submissions.mkdir()
+    text.mkdir()
+    (submissions / 's1.json').write_text('{"submissionId": "s1", "uploadedReports": ["r1.pdf"]}')
+    (submissions / 'broken.json').write_text('{')
+    (text / 'r1.pdf.txt').write_text('haemoglobin low')
+    index = SearchIndex()
+    extractor = ReportExtractor(index, str(tmp_path / 'reports'), str(text))
+
+    loaded = load_submissions(index, extractor, str(submissions), archived=[submission('a1', chiefComplaint='rash')])
+
+    assert loaded == 2
+    assert ids(index.search('haemoglobin')[1]) == ['s1']
+    assert ids(index.search('rash')[1]) == ['a1']
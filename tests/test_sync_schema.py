@@ -0,0 +1,95 @@
+import pytest
+
+import sync_schema
+import user_schema
+
+
+@pytest.fixture
+def users(mongo, monkeypatch, no_outbreaks):
+    monkeypatch.setattr(sync_schema, "users", mongo.users)
+    monkeypatch.setattr(user_schema, "users", mongo.users)
+    return mongo.users
+
+
+def patient(client_id, name="Ramesh", phone="98765-43210", village="Hosur"):
+    return {"client_id": client_id, "type": "add_patient", "data": {"name": name, "phone": phone, "village": village}}
+
+
+def detection(client_id, username="Ramesh", disease="Scabies", **extra):
+    return {"client_id": client_id, "type": "add_disease",
+            "data": dict({"username": username, "disease_name": disease}, **extra)}
+
+
+def statuses(result):
+    return [r["status"] for r in result["results"]]
+
+
+def test_patient_then_detection_in_one_batch(users):
+    result = sync_schema.apply_sync_batch([patient("p1"), detection("d1")])
+
+    assert statuses(result) == ["applied", "applied"]
+    assert result["success"]
+    stored = users.find_one({"username": "Ramesh"})
+    assert stored["phone"] == "9876543210"
+    assert [d["client_id"] for d in stored["diseases"]] == ["d1"]
+
+
+def test_replayed_batch_is_reported_as_duplicate(users):
+    batch = [patient("p1"), detection("d1")]
+    sync_schema.apply_sync_batch(batch)
+    result = sync_schema.apply_sync_batch(batch)
+
+    assert statuses(result) == ["duplicate", "duplicate"]
+    assert result["success"]
+    assert len(users.find_one({"username": "Ramesh"})["diseases"]) == 1
+
+
+def test_detection_for_unknown_patient_is_rejected(users):
+    result = sync_schema.apply_sync_batch([detection("d1", username="Nobody")])
+
+    assert statuses(result) == ["rejected"]
+    assert result["results"][0]["message"] == "User not found"
+    assert not result["success"]
+
+
+@pytest.mark.parametrize("mutation, message", [
+    ("not a dict", "Mutation must be an object"),
+    ({"type": "add_patient", "data": {}}, "client_id is required"),
+    ({"client_id": "x", "type": "delete_everything", "data": {}}, "Unknown mutation type 'delete_everything'"),
+    ({"client_id": "x", "type": "add_patient", "data": ["Ramesh"]}, "data must be an object"),
+    ({"client_id": "x", "type": "add_patient", "data": {"name": "Ramesh"}}, "Both name and phone are required"),
+    (detection("x", detected_at="yesterday"), "detected_at must be an ISO-8601 timestamp"),
+])
+def test_malformed_mutations_are_rejected_individually(users, mutation, message):
+    result = sync_schema.apply_sync_batch([mutation, patient("p1")])
+
+    assert result["results"][0] == {
+        "client_id": mutation.get("client_id") if isinstance(mutation, dict) else None,
+        "status": "rejected",
+        "message": message,
+    }
+    assert result["results"][1]["status"] == "applied"
+
+
+def test_detection_for_merged_username_goes_to_survivor(users):
+    users.insert_one({"username": "Ramesh Kumar", "aliases": ["Ramesh K"], "diseases": []})
+
+    result = sync_schema.apply_sync_batch([detection("d1", username="Ramesh K")])
+
+    assert statuses(result) == ["applied"]
+    assert len(users.find_one({"username": "Ramesh Kumar"})["diseases"]) == 1
+    assert users.find_one({"username": "Ramesh K"}) is None
+
+
+def test_only_newly_applied_detections_feed_outbreaks(users, no_outbreaks):
+    sync_schema.apply_sync_batch([patient("p1"), detection("d1")])
+    sync_schema.apply_sync_batch([detection("d1"), detection("d2", disease="Impetigo")])
+
+    assert [username for username, _, _ in no_outbreaks] == ["Ramesh", "Ramesh"]
+
+
+def test_change_token_round_trip():
+    token = sync_schema.make_change_token()
+
+    assert sync_schema.make_change_token(sync_schema.parse_change_token(token)) == token
+    assert sync_schema.parse_change_token("garbage") is None
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import user_schema
+import write_behind
+from disease_schema import build_disease_record
+
+
+@pytest.fixture
+def users(mongo, monkeypatch):
+    monkeypatch.setattr(user_schema, "users", mongo.users)
+    mongo.users.insert_one({"username": "Ramesh", "village": "Hosur", "diseases": []})
+    return mongo.users
+
+
+@pytest.fixture
+def queue(tmp_path, users):
+    return write_behind.WriteBehindQueue(str(tmp_path / "queue.sqlite3"), users, batch_size=10)
+
+
+def record(client_id, name="Scabies"):
+    detection = build_disease_record(name, detected_at=datetime(2026, 3, 1, 10, 0))
+    detection["client_id"] = client_id
+    return detection
+
+
+def stored_ids(users, username="Ramesh"):
+    return [d["client_id"] for d in users.find_one({"username": username})["diseases"]]
+
+
+def test_flush_writes_and_empties_the_journal(queue, users, no_outbreaks):
+    queue.enqueue("Ramesh", record("a"))
+    queue.enqueue("Ramesh", record("b"))
+
+    assert queue.stats()["depth"] == 2
+    assert queue.flush_once() == 2
+    assert stored_ids(users) == ["a", "b"]
+    assert queue.stats() == {"depth": 0, "lag_seconds": 0.0}
+    assert len(no_outbreaks) == 2
+
+
+def test_replayed_row_is_applied_once_and_not_recounted(queue, users, no_outbreaks):
+    # A crash after MongoDB acknowledged the batch leaves the row in the journal
+    queue.enqueue("Ramesh", record("a"))
+    queue.flush_once()
+    queue.enqueue("Ramesh", record("a"))
+    queue.flush_once()
+
+    assert stored_ids(users) == ["a"]
+    assert len(no_outbreaks) == 1
+
+
+def test_rows_for_merged_usernames_go_to_the_survivor(queue, users, no_outbreaks):
+    users.insert_one({"username": "Suresh Kumar", "aliases": ["Suresh K"], "diseases": []})
+    queue.enqueue("Suresh K", record("a"))
+    queue.flush_once()
+
+    assert stored_ids(users, "Suresh Kumar") == ["a"]
+    assert no_outbreaks[0][0] == "Suresh Kumar"
+
+
+def test_unknown_patient_rows_are_dropped(queue, users, no_outbreaks):
+    queue.enqueue("Nobody", record("a"))
+
+    assert queue.flush_once() == 1
+    assert queue.stats()["depth"] == 0
+    assert no_outbreaks == []
+
+
+def test_unreachable_database_keeps_rows_and_backs_off(queue, monkeypatch, no_outbreaks):
+    def unreachable(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    monkeypatch.setattr(write_behind, "resolve_usernames", unreachable)
+    queue.enqueue("Ramesh", record("a"))
+
+    assert queue.flush_once() == 0
+    assert queue.stats()["depth"] == 1
+    # Rescheduled into the future, so nothing is due right now
+    assert queue._due() == []
+
+
+class TestRecordDetection:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch, queue, users):
+        monkeypatch.setattr(write_behind, "WRITE_BEHIND_ENABLED", True)
+        monkeypatch.setattr(write_behind, "queue", queue)
+        monkeypatch.setattr(write_behind, "_check_users", users)
+        monkeypatch.setattr(queue, "start", lambda: None)
+
+    def test_known_patient_is_queued(self, queue):
+        result = write_behind.record_detection("Ramesh", "Scabies")
+
+        assert result["success"] and result["queued"]
+        assert queue.stats()["depth"] == 1
+
+    def test_alias_counts_as_known(self, queue, users):
+        users.insert_one({"username": "Suresh Kumar", "aliases": ["Suresh K"], "diseases": []})
+
+        assert write_behind.record_detection("Suresh K", "Scabies")["success"]
+
+    def test_unknown_patient_is_not_queued(self, queue):
+        result = write_behind.record_detection("Nobody", "Scabies")
+
+        assert result == {"success": False, "message": "User not found"}
+        assert queue.stats()["depth"] == 0
+
+    def test_unverified_when_database_is_down(self, queue, monkeypatch):
+        class Down:
+            def find_one(self, *args, **kwargs):
+                raise ServerSelectionTimeoutError("no servers")
+
+        monkeypatch.setattr(write_behind, "_check_users", Down())
+        result = write_behind.record_detection("Ramesh", "Scabies")
+
+        assert result["queued"] and result["verified"] is False and not result["success"]
+        assert queue.stats()["depth"] == 1
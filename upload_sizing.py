@@ -0,0 +1,65 @@
+"""Client-side downscaling parameters for photo uploads.
+
+Camera photos are 4-8MB, but the model never needs more than
+UPLOAD_MAX_SIDE pixels on the longest side. Profile photos are stored at
+PHOTO_MAX_SIZE anyway. `GET /upload_config` advertises those limits, together
+with the encoding quality and the formats the server can decode. The pages
+(`static/upload.js`) then resize and re-encode each photo in the browser
+before the multipart upload.
+
+The client sends the original size in an `original_bytes` form field. The
+bytes before and after are counted per endpoint:
+
+    appayu_upload_bytes_total{endpoint="predict",kind="original"}
+    appayu_upload_bytes_total{endpoint="predict",kind="sent"}
+
+so the bytes saved on the uplink are the difference of the two.
+"""
+import os
+
+from PIL import features
+
+import metrics
+from asha_worker_schema import PHOTO_MAX_SIZE
+
+UPLOAD_MAX_SIDE = int(os.environ.get("UPLOAD_MAX_SIDE", "1600"))
+UPLOAD_QUALITY = float(os.environ.get("UPLOAD_QUALITY", "0.85"))
+# In order of preference; the browser uses the first one it can encode
+UPLOAD_FORMATS = ["image/webp", "image/jpeg"] if features.check("webp") else ["image/jpeg"]
+
+UPLOAD_BYTES = metrics.register(metrics.Counter(
+    "appayu_upload_bytes_total", "Photo bytes before client-side downscaling (original) and as uploaded (sent)",
+    ("endpoint", "kind")
+))
+
+
+def upload_config():
+    return {
+        "max_side": UPLOAD_MAX_SIDE,
+        "profile_max_side": PHOTO_MAX_SIZE,
+        "quality": UPLOAD_QUALITY,
+        "formats": UPLOAD_FORMATS,
+    }
+
+
+def record_upload(endpoint, sent_bytes, original_bytes=None):
+    """Count one upload; `original_bytes` is the client's figure before resizing."""
+    try:
+        original = int(original_bytes)
+    except (TypeError, ValueError):
+        original = 0
+    # Clients that do not resize (or report nonsense) count as saving nothing
+    if original < sent_bytes:
+        original = sent_bytes
+    UPLOAD_BYTES.inc(endpoint, "original", amount=original)
+    UPLOAD_BYTES.inc(endpoint, "sent", amount=sent_bytes)
+
+
+def init_app(app):
+    from flask import jsonify
+
+    @app.route("/upload_config")
+    def get_upload_config():
+        response = jsonify(upload_config())
+        response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
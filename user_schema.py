@@ -1,13 +1,20 @@
 from pymongo import MongoClient
 from datetime import datetime
+import os
 import re
+from metrics import timed
 
 # Connect to local MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+db = client[os.environ.get("MONGO_DB", "hospital_db")]
 
 users = db["users"]
 diseases = db["diseases"]
+# Deletion markers for removed/merged patients, so roster deltas can drop them
+tombstones = db["patient_tombstones"]
+
+_alias_index_ready = False
+_client_id_index_ready = False
 
 
 def normalize_phone(phone: str) -> str:
@@ -21,7 +28,65 @@ def normalize_phone(phone: str) -> str:
     return digits
 
 
-def add_user(username, phone):
+def build_patient(username, phone, village=None):
+    """Build a new patient document (phone is expected to be normalized).
+
+    `village` links the patient to a village roster; `updated_at` must be bumped
+    on every write so roster deltas can pick the change up.
+    """
+    now = datetime.utcnow()
+    return {
+        "username": username,
+        "phone": phone,
+        "village": village,
+        "diseases": [],   # empty array initially
+        "created": now,
+        "updated_at": now
+    }
+
+
+def record_tombstone(patient, merged_into=None, collection=tombstones):
+    """Mark a patient document as deleted (idempotent per patient)."""
+    collection.update_one({"_id": patient["_id"]}, {"$set": {
+        "username": patient.get("username"),
+        "village": patient.get("village"),
+        "merged_into": merged_into,
+        "deleted_at": datetime.utcnow()
+    }}, upsert=True)
+
+
+def resolve_usernames(usernames, collection=None):
+    """Map usernames merged away by patient_linkage onto the surviving patient.
+
+    Returns a dict with an entry for every name: the survivor's username for
+    an alias, the name itself otherwise. One indexed query per call.
+    """
+    global _alias_index_ready
+    collection = users if collection is None else collection
+    names = {name for name in usernames if name}
+    resolved = {name: name for name in names}
+    if not names:
+        return resolved
+    if not _alias_index_ready:
+        collection.create_index("aliases", sparse=True)
+        _alias_index_ready = True
+    for doc in collection.find({"aliases": {"$in": list(names)}}, {"username": 1, "aliases": 1}):
+        for alias in doc.get("aliases", []):
+            if alias in resolved:
+                resolved[alias] = doc["username"]
+    return resolved
+
+
+def ensure_client_id_index(collection=None):
+    """Create the sparse `diseases.client_id` index that detection dedup queries use."""
+    global _client_id_index_ready
+    if not _client_id_index_ready:
+        (users if collection is None else collection).create_index("diseases.client_id", sparse=True)
+        _client_id_index_ready = True
+
+
+@timed("db.add_user")
+def add_user(username, phone, village=None):
     """Add a new user.
 
     Behavior:
@@ -36,6 +101,9 @@ def add_user(username, phone):
 
     # Prefer matching by username first (username is considered the primary identifier here)
     existing_user_name = users.find_one({"username": username})
+    if existing_user_name is None:
+        # A name merged into another patient must not come back as a new record
+        existing_user_name = users.find_one({"aliases": username})
     if existing_user_name:
         return {
             "success": False,
@@ -51,12 +119,7 @@ def add_user(username, phone):
     # in the message if the phone is already present under another name.
     existing_user_phone = users.find_one({"phone": phone})
 
-    patient = {
-        "username": username,
-        "phone": phone,
-        "diseases": [],   # empty array initially
-        "created": datetime.utcnow()
-    }
+    patient = build_patient(username, phone, village)
     users.insert_one(patient)
 
     if existing_user_phone:
@@ -0,0 +1,296 @@
+"""Durable write-behind queue for disease detections.
+
+`/predict` and `/add_disease` append detections to a local SQLite journal
+(WAL mode, fsync on commit) and return immediately; a background thread
+drains the journal into MongoDB with unordered `bulk_write` calls. A slow or
+briefly unavailable mongod therefore no longer adds to request latency or
+fails an analysis that already succeeded.
+
+Rows are deleted only after MongoDB acknowledged the batch, so a crash or
+restart at any point replays the remaining rows on the next start. Each
+detection carries a `client_id` and is pushed with a `diseases.client_id $ne`
+guard (the same idempotency scheme as /sync), so a replayed row is applied at
+most once. Failed batches are retried with exponential backoff.
+
+Queue depth and the age of the oldest pending row (the lag) are exported on
+/metrics. WRITE_BEHIND=0 writes synchronously instead.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import metrics
+import outbreak
+from disease_registry import condition_id, UNKNOWN_ID
+from disease_schema import MONGO_URI, MONGO_DB, users, build_disease_record, add_disease
+from user_schema import resolve_usernames, ensure_client_id_index
+
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND", "1") != "0"
+QUEUE_PATH = os.environ.get(
+    "WRITE_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "write_queue.sqlite3")
+)
+FLUSH_BATCH_SIZE = int(os.environ.get("WRITE_QUEUE_BATCH", "200"))
+FLUSH_INTERVAL = float(os.environ.get("WRITE_QUEUE_INTERVAL", "1.0"))
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+# Budget for the patient check in record_detection. It runs on the request
+# path, so it gets its own client that gives up quickly instead of the
+# 30 s default server selection; on timeout the detection is queued unverified.
+CHECK_TIMEOUT_MS = int(os.environ.get("WRITE_QUEUE_CHECK_TIMEOUT_MS", "500"))
+
+_check_users = MongoClient(
+    MONGO_URI,
+    serverSelectionTimeoutMS=CHECK_TIMEOUT_MS,
+    connectTimeoutMS=CHECK_TIMEOUT_MS,
+    socketTimeoutMS=CHECK_TIMEOUT_MS,
+)[MONGO_DB]["users"]
+
+QUEUE_DEPTH = metrics.register(metrics.Gauge(
+    "appayu_write_queue_depth", "Detections waiting in the write-behind queue"
+))
+QUEUE_LAG = metrics.register(metrics.Gauge(
+    "appayu_write_queue_lag_seconds", "Age of the oldest detection waiting in the write-behind queue"
+))
+QUEUE_FLUSHED = metrics.register(metrics.Counter(
+    "appayu_write_queue_flushed_total", "Queued detections by flush outcome", ("outcome",)
+))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    record TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+)
+"""
+
+
+class WriteBehindQueue:
+    """SQLite-backed detection journal plus the thread that drains it."""
+
+    def __init__(self, path, collection, batch_size=FLUSH_BATCH_SIZE, interval=FLUSH_INTERVAL):
+        self.path = path
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # fsync every commit: an acknowledged detection survives a power cut
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, username, record):
+        payload = dict(record)
+        payload["detected_at"] = payload["detected_at"].isoformat()
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO detections (username, record, enqueued_at) VALUES (?, ?, ?)",
+                (username, json.dumps(payload), time.time())
+            )
+        self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            depth, oldest = self._db().execute(
+                "SELECT COUNT(*), MIN(enqueued_at) FROM detections"
+            ).fetchone()
+        lag = time.time() - oldest if oldest else 0.0
+        QUEUE_DEPTH.set(depth)
+        QUEUE_LAG.set(round(lag, 3))
+        return {"depth": depth, "lag_seconds": round(lag, 3)}
+
+    def _due(self):
+        with self._lock:
+            return self._db().execute(
+                "SELECT id, username, record, attempts FROM detections "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+
+    def _delete(self, ids):
+        with self._lock:
+            self._db().executemany("DELETE FROM detections WHERE id = ?", [(i,) for i in ids])
+
+    def _reschedule(self, rows, error):
+        updates = []
+        for row_id, _, _, attempts in rows:
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts)
+            updates.append((time.time() + delay * random.uniform(0.5, 1.0), str(error)[:500], row_id))
+        with self._lock:
+            self._db().executemany(
+                "UPDATE detections SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                updates
+            )
+
+    def flush_once(self):
+        """Write one batch of due rows to MongoDB.
+
+        Returns the number of rows handled, or 0 when MongoDB is unreachable.
+        """
+        rows = self._due()
+        if not rows:
+            return 0
+
+        requests, records = [], []
+        try:
+            ensure_client_id_index(self.collection)
+            # Detections for patients merged since they were queued go to the survivor
+            resolved = resolve_usernames([row[1] for row in rows], self.collection)
+            for _, username, raw, _ in rows:
+                record = json.loads(raw)
+                record["detected_at"] = datetime.fromisoformat(record["detected_at"])
+                records.append((resolved.get(username, username), record))
+            # Rows applied before a crash are replayed; they must not count twice
+            applied_before = self._applied(records)
+        except PyMongoError as e:
+            print(f"[warn] Write-behind flush failed, will retry: {e}")
+            self._reschedule(rows, e)
+            QUEUE_FLUSHED.inc("retry", amount=len(rows))
+            return 0
+        for username, record in records:
+            requests.append(UpdateOne(
+                {"username": username, "diseases.client_id": {"$ne": record["client_id"]}},
+                {"$push": {"diseases": record}, "$set": {"updated_at": datetime.utcnow()}}
+            ))
+
+        failed = {}
+        with metrics.stage("db.write_behind_flush"):
+            try:
+                result = self.collection.bulk_write(requests, ordered=False)
+                matched = result.matched_count
+            except BulkWriteError as bwe:
+                failed = {e["index"]: e.get("errmsg", "Write failed") for e in bwe.details.get("writeErrors", [])}
+                matched = bwe.details.get("nMatched", 0)
+            except PyMongoError as e:
+                # Server unreachable or similar: keep everything and back off
+                print(f"[warn] Write-behind flush failed, will retry: {e}")
+                self._reschedule(rows, e)
+                QUEUE_FLUSHED.inc("retry", amount=len(rows))
+                return 0
+
+        if failed:
+            self._reschedule([rows[i] for i in failed], "; ".join(set(failed.values())))
+            QUEUE_FLUSHED.inc("retry", amount=len(failed))
+        done = [row[0] for i, row in enumerate(rows) if i not in failed]
+        self._delete(done)
+        # Unmatched rows are unknown patients or replays of an applied row
+        QUEUE_FLUSHED.inc("written", amount=matched)
+        QUEUE_FLUSHED.inc("unmatched", amount=len(done) - matched)
+        try:
+            landed = self._applied(records)
+        except PyMongoError as e:
+            print(f"[warn] Could not confirm written detections for outbreak tracking: {e}")
+            landed = set()
+        # Only detections this flush applied feed the outbreak detector
+        outbreak.observe_detections([
+            (username, record.get("condition_id", UNKNOWN_ID), record["detected_at"])
+            for i, (username, record) in enumerate(records)
+            if i not in failed and record["client_id"] in landed and record["client_id"] not in applied_before
+        ])
+        return len(rows)
+
+    def _applied(self, records):
+        """client_ids among `records` that are already stored on their patient."""
+        client_ids = [record["client_id"] for _, record in records]
+        found = set()
+        cursor = self.collection.find(
+            {"username": {"$in": list({username for username, _ in records})},
+             "diseases.client_id": {"$in": client_ids}},
+            {"diseases.client_id": 1}
+        )
+        for doc in cursor:
+            found.update(d.get("client_id") for d in doc.get("diseases", []) if isinstance(d, dict))
+        return found.intersection(client_ids)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                # Drain full batches back to back, then wait for more
+                while self.flush_once() >= self.batch_size:
+                    pass
+                self.stats()
+            except Exception as e:
+                print(f"[error] Write-behind flusher error: {e}")
+                time.sleep(self.interval)
+
+    def start(self):
+        """Start the flusher thread once per process (drains leftovers from a previous run)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+
+queue = WriteBehindQueue(QUEUE_PATH, users)
+
+
+def record_detection(username, disease_name, asha_worker_info=None, category=None):
+    """Record a detection for `username`, durably queued for MongoDB.
+
+    Same arguments and result shape as disease_schema.add_disease, which it
+    calls directly when WRITE_BEHIND=0. The patient is looked up before
+    queueing, so an unknown username gets "User not found". If MongoDB does
+    not answer within CHECK_TIMEOUT_MS the detection is queued anyway, with `success` False and
+    `verified` False: it is stored once MongoDB is back, if the patient exists.
+    """
+    if not WRITE_BEHIND_ENABLED:
+        result = add_disease(username, disease_name, asha_worker_info, category)
+        if result.get("success"):
+            outbreak.observe_detections([(username, condition_id(disease_name, category), datetime.now())])
+        return result
+
+    try:
+        known = _check_users.find_one(
+            {"$or": [{"username": username}, {"aliases": username}]}, {"_id": 1}, max_time_ms=CHECK_TIMEOUT_MS
+        )
+    except PyMongoError:
+        verified = False
+    else:
+        if known is None:
+            return {"success": False, "message": "User not found"}
+        verified = True
+
+    record = build_disease_record(disease_name, asha_worker_info, category=category)
+    record["client_id"] = uuid.uuid4().hex
+    queue.start()
+    queue.enqueue(username, record)
+    if not verified:
+        return {"success": False, "queued": True, "verified": False,
+                "message": f"Queued disease '{disease_name}' for {username}; the patient is checked once the database is reachable"}
+    return {"success": True, "queued": True, "message": f"Queued disease '{disease_name}' for {username}"}
+
+
+def init_app(app):
+    """Start the flusher with the first request served (not in the reloader parent)."""
+    if not WRITE_BEHIND_ENABLED:
+        return
+
+    @app.before_request
+    def _start_flusher():
+        queue.start()